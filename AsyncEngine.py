@@ -0,0 +1,376 @@
+import aiohttp
+import asyncio
+import socket
+import threading
+import time
+from aiohttp.abc import AbstractResolver
+from DnsCache import dns_cache
+from HttpPool import PhaseTimer, PoolStats
+from Probe import HEAD_REFUSED, HEADERS, HostLimiter
+from ProbeCache import probe_cache, probe_key
+
+
+class CachedResolver(AbstractResolver):
+    """
+    aiohttp resolver backed by the process-wide DnsCache, so both engines share
+    the same cached hosts and counters. Fresh entries are answered on the loop;
+    anything else is resolved in a worker thread.
+    """
+
+    def __init__(self, cache=dns_cache):
+        """
+        Args:
+            cache (DnsCache): The cache to resolve through.
+        """
+        self.cache = cache
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        """
+        Resolves a host into aiohttp ResolveResult dicts.
+        Args:
+            host (str): Host name.
+            port (int): Port of the connection.
+            family (int): Address family wanted, or 0 for any.
+        """
+        addresses = self.cache.cached(host)
+        if addresses is None:
+            addresses = await asyncio.get_running_loop().run_in_executor(
+                None, self.cache.resolve, host)
+        results = [{"hostname": host, "host": address, "port": port,
+                    "family": address_family, "proto": 0, "flags": socket.AI_NUMERICHOST}
+                   for address_family, address in addresses
+                   if not family or address_family == family]
+        if not results:
+            raise OSError(f"No se encontraron direcciones para {host}")
+        return results
+
+    async def close(self):
+        """
+        Nothing to release: the cache outlives the session.
+        """
+
+
+class AsyncEngine:
+    """
+    Event-loop based check engine.
+    Runs the root check and the child-link fan-out of every due domain as
+    coroutines on a single asyncio loop hosted in one worker thread, instead of
+    one OS thread per domain. Due domains come from the shared Scheduler and
+    results are reported back to the MonitorEngine that owns the engine.
+    """
+
+    def __init__(self, monitor, settings):
+        """
+        Initializes the AsyncEngine class.
+        Args:
+            monitor (MonitorEngine): The engine that records and reports the results.
+            settings (Settings): Advanced settings (max_concurrency, per_host_max_in_flight,
+                cycle_deadline, pool_max_idle and child_probe).
+        """
+        self.monitor = monitor
+        self.max_concurrency = max(1, int(settings.get("max_concurrency")))
+        self.per_host_max_in_flight = settings.get("per_host_max_in_flight")
+        self.cycle_deadline = settings.get("cycle_deadline")
+        self.max_idle = settings.get("pool_max_idle")
+        self.child_probe = settings.get("child_probe")
+        self.pool_stats = PoolStats()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.semaphore = None
+        self.host_limiter = None
+
+    def start(self, scheduler):
+        """
+        Starts the event loop thread, which dispatches the domains due in the scheduler.
+        Args:
+            scheduler (Scheduler): Scheduler with the monitored domains.
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=asyncio.run,
+            args=(self.run(scheduler),),
+            daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """
+        Asks the event loop to cancel every domain coroutine and exit.
+        """
+        self.stop_event.set()
+
+    async def run(self, scheduler):
+        """
+        Main coroutine of the engine.
+        Starts a check coroutine for every domain the scheduler finds due, until
+        the engine is stopped.
+        Args:
+            scheduler (Scheduler): Scheduler with the monitored domains.
+        """
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.host_limiter = HostLimiter(
+            self.per_host_max_in_flight, asyncio.Semaphore)
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.host_limiter.max_in_flight,
+            keepalive_timeout=self.max_idle,
+            use_dns_cache=False,
+            resolver=CachedResolver())
+        async with aiohttp.ClientSession(
+                headers=HEADERS, connector=connector, trace_configs=[self.trace_config()]) as session:
+            tasks = set()
+            while not self.stop_event.is_set():
+                url, wait = scheduler.next_job()
+                if url is None:
+                    await asyncio.sleep(min(wait, 0.5))
+                    continue
+                task = asyncio.create_task(self.run_check(session, scheduler, url))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_check(self, session, scheduler, url):
+        """
+        Runs one scheduled check and hands the domain back to the scheduler.
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            scheduler (Scheduler): Scheduler with the monitored domains.
+            url (str): The domain to check.
+        """
+        try:
+            await self.check_domain(session, url, scheduler.intervals[url])
+        finally:
+            scheduler.done(url, self.monitor.next_interval(url))
+
+    def trace_config(self):
+        """
+        Builds the aiohttp tracing hooks that feed the connection pool counters
+        and the PhaseTimer passed as trace_request_ctx of each request.
+        aiohttp has no hook around the TLS handshake, so it is part of the
+        connect phase in this engine.
+        Returns:
+            aiohttp.TraceConfig: Hooks counting requests and new connections
+            and timing the DNS and connect phases.
+        """
+        async def on_request_start(session, context, params):
+            self.pool_stats.count_request()
+
+        async def on_dns_resolvehost_start(session, context, params):
+            context.dns_start = time.perf_counter()
+
+        async def on_dns_resolvehost_end(session, context, params):
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.add("dns", time.perf_counter() - context.dns_start)
+
+        async def on_connection_create_start(session, context, params):
+            context.connect_start = time.perf_counter()
+            timer = context.trace_request_ctx
+            context.dns_before = timer.dns if timer is not None else 0.0
+
+        async def on_connection_create_end(session, context, params):
+            self.pool_stats.count_new_connection()
+            timer = context.trace_request_ctx
+            if timer is not None:
+                # The DNS lookup happens inside the connection creation.
+                dns = timer.dns - context.dns_before
+                timer.add("connect", time.perf_counter() - context.connect_start - dns)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+    async def fetch(self, session, url, timeout, read_body, method="GET", headers=None,
+                    max_bytes=None, keep_body=True, scan=None):
+        """
+        Performs a request under the global concurrency cap.
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            url (str): The URL to request.
+            timeout (int): Total timeout in seconds.
+            read_body (bool): Whether the body of a 200 response must be read,
+                up to max_bytes and the read deadline.
+            method (str): HTTP method.
+            headers (dict): Extra request headers.
+            max_bytes (int): Maximum number of body bytes read, or None for no cap.
+            keep_body (bool): Whether to keep the body or only read it.
+            scan (LinkScan): Fed the body as it is read, instead of keeping it.
+                Its encoding is set from the response headers.
+        Returns:
+            tuple: (status, reason, elapsed_ms, chunks, response_headers, encoding,
+            phases, truncated)
+        """
+        async with self.semaphore:
+            timer = PhaseTimer()
+            async with session.request(
+                    method, url, headers=headers, allow_redirects=True, trace_request_ctx=timer,
+                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                timer.headers_received()
+                # Measured up to the response headers, like requests' elapsed.
+                tiempo_ms = int((timer.headers_at - timer.started) * 1000)
+                chunks = None
+                truncated = False
+                if read_body and response.status == 200:
+                    consume = None
+                    if scan is not None:
+                        scan.encoding = response.charset or "utf-8"
+                        consume = scan.feed
+                    chunks, truncated = await self.read_body(
+                        response, float("inf") if max_bytes is None else max_bytes,
+                        self.monitor.read_seconds(timeout), keep_body and scan is None, consume)
+                    timer.body_read(scan.seconds if scan is not None else 0.0)
+                return (response.status, response.reason, tiempo_ms, chunks,
+                        response.headers, response.charset or "utf-8", timer.as_dict(tls=False),
+                        truncated)
+
+    async def read_body(self, response, max_bytes, seconds, keep=True, consume=None):
+        """
+        Async counterpart of Probe.read_chunks. Here the deadline also cuts a
+        read in progress, so a stalled stream never outlives it.
+        Args:
+            response (aiohttp.ClientResponse): The response being read.
+            max_bytes (int): Maximum number of bytes to read.
+            seconds (float): Seconds allowed for reading the body.
+            keep (bool): Whether to keep the body or only read it.
+            consume (callable): Called with each chunk as soon as it is read.
+        Returns:
+            tuple: (chunks, truncated)
+        """
+        deadline = time.monotonic() + seconds
+        chunks = []
+        total = 0
+        reader = response.content.iter_chunked(65536).__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(
+                    reader.__anext__(), max(0, deadline - time.monotonic()))
+            except StopAsyncIteration:
+                return chunks, False
+            except asyncio.TimeoutError:
+                if time.monotonic() < deadline:
+                    raise
+                return chunks, True
+            if total + len(chunk) > max_bytes:
+                if total < max_bytes:
+                    chunk = chunk[:max_bytes - total]
+                    if keep:
+                        chunks.append(chunk)
+                    if consume is not None:
+                        consume(chunk)
+                return chunks, True
+            if keep:
+                chunks.append(chunk)
+            if consume is not None:
+                consume(chunk)
+            total += len(chunk)
+
+    async def probe_child(self, session, url, max_bytes=None):
+        """
+        Async counterpart of Probe.probe_child.
+        Sends a conditional HEAD, or a GET whose body is read and discarded up
+        to max_bytes and the read deadline. If HEAD is refused, a GET whose body
+        is never read.
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            url (str): The URL of the child page.
+            max_bytes (int): Maximum number of body bytes read in "get" mode.
+        Returns:
+            tuple: (status, reason, elapsed_ms, phases, truncated)
+        """
+        validators = self.monitor.validators
+        headers = validators.headers_for(url)
+        method = "HEAD" if self.child_probe == "head" else "GET"
+        status, reason, tiempo_ms, _, response_headers, _, phases, truncated = await self.fetch(
+            session, url, 10, method == "GET", method, headers, max_bytes, keep_body=False)
+        if method == "HEAD" and status in HEAD_REFUSED:
+            status, reason, tiempo_ms, _, response_headers, _, phases, truncated = await self.fetch(
+                session, url, 10, False, "GET", headers)
+        validators.update(url, status, response_headers)
+        return status, reason, tiempo_ms, phases, truncated
+
+    async def check_child(self, session, url, path):
+        """
+        Checks one internal path of a domain and reports the result.
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            url (str): The monitored domain.
+            path (str): The path of the child page.
+        Returns:
+            bool: True once the page has been checked.
+        """
+        child_url = url.rstrip('/') + path
+        try:
+            # Shared with the other domains linking to the same page.
+            result, ts = await probe_cache.probe_async(
+                probe_key(child_url), lambda: self.probe_limited(session, url, child_url), url)
+            self.monitor.show_child_result(url, path, *result, ts=ts)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.monitor.show_child_error(url, path, child_url, str(e) or type(e).__name__)
+        return True
+
+    async def probe_limited(self, session, url, child_url):
+        """
+        Probes a child page once the per-host limit allows it.
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            url (str): The monitored domain.
+            child_url (str): The URL of the child page.
+        Returns:
+            tuple: (status, reason, ms, phases, truncated).
+        """
+        async with self.host_limiter.get(child_url):
+            return await self.probe_child(session, child_url, self.monitor.max_bytes(url))
+
+    async def check_children(self, session, url, paths, tiempo):
+        """
+        Checks the child pages of a domain concurrently within the cycle deadline.
+        Checks still pending when the deadline expires are cancelled and retried
+        on the next cycle.
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            url (str): The monitored domain.
+            paths (list): The paths of the child pages.
+            tiempo (int): The time interval for monitoring the domain.
+        Returns:
+            int: Number of paths checked before the deadline.
+        """
+        if not paths:
+            return 0
+        tasks = [asyncio.create_task(self.check_child(session, url, path)) for path in paths]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=min(self.cycle_deadline, tiempo))
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        return sum(1 for task in done
+                   if not task.cancelled() and task.exception() is None and task.result())
+
+    async def check_domain(self, session, url, tiempo):
+        """
+        Checks a domain once: its root page and then its known child pages.
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            url (str): The domain to check.
+            tiempo (int): The time interval for monitoring the domain.
+        """
+        try:
+            scan = self.monitor.link_cache.scan(url)
+            status, reason, tiempo_ms, _, _, _, phases, truncated = await self.fetch(
+                session, url, tiempo, True, max_bytes=self.monitor.max_bytes(url), scan=scan)
+            self.monitor.show_root_result(url, status, reason, tiempo_ms, phases, truncated)
+
+            if status == 200:
+                root_paths = self.monitor.link_cache.finish(scan)
+                discovery = self.monitor.discovery
+                paths = discovery.child_paths(url, root_paths, self.monitor.stop_event)
+                discovery.advance(url, await self.check_children(session, url, paths, tiempo))
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.monitor.show_root_error(url, str(e) or type(e).__name__)
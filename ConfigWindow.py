@@ -3,6 +3,7 @@ import os
 import json
 
 from tkinter import messagebox
+from Scheduler import adaptive_defaults
 from utils import Tooltip, IconManager
 
 CONFIG_FILE = "config.json"
@@ -23,7 +24,7 @@ class ConfigWindow:
         """
         self.master = tk.Toplevel(master)
         self.master.title("Configuración de Sitios")
-        self.master.geometry("500x400")
+        self.master.geometry("700x400")
         self.master.iconbitmap(IconManager.resource_path("favicon.ico"))
         self.master.resizable(False, False)
         self.data = []
@@ -64,21 +65,25 @@ class ConfigWindow:
             "Arial", 10, "bold")).grid(row=0, column=0, padx=5)
         tk.Label(self.table_frame, text="Tiempo (s)", font=(
             "Arial", 10, "bold")).grid(row=0, column=1, padx=5)
+        tk.Label(self.table_frame, text="Adaptativo", font=(
+            "Arial", 10, "bold")).grid(row=0, column=2, padx=5)
 
         for i, row in enumerate(self.data):
             tk.Label(self.table_frame, text=row["dominio"], anchor="w", width=30).grid(
                 row=i, column=0, padx=5, sticky="w")
             tk.Label(self.table_frame, text=row["tiempo"], anchor="center", width=10).grid(
                 row=i, column=1, padx=5)
+            tk.Label(self.table_frame, text=self.describe_adaptive(row), anchor="center", width=22).grid(
+                row=i, column=2, padx=5)
 
             edit_button = tk.Button(
                 self.table_frame, text="✏️", command=lambda idx=i: self.edit_entry(idx))
-            edit_button.grid(row=i, column=2, padx=5)
+            edit_button.grid(row=i, column=3, padx=5)
             Tooltip(edit_button, "Actualizar dominio")
 
             delete_button = tk.Button(
                 self.table_frame, text="🗑️", command=lambda idx=i: self.delete_entry(idx))
-            delete_button.grid(row=i, column=3, padx=5)
+            delete_button.grid(row=i, column=4, padx=5)
             Tooltip(delete_button, "Eliminar dominio")
 
         # Section for add new domain
@@ -100,6 +105,84 @@ class ConfigWindow:
             self.form_frame, text="Guardar", command=self.add_entry)
         add_button.grid(row=0, column=4, padx=5)
 
+        self.new_adaptive = self.create_adaptive_fields(self.form_frame, {})
+        self.new_adaptive["frame"].grid(row=1, column=0, columnspan=5, pady=5)
+
+    def describe_adaptive(self, row):
+        """
+        Describes the adaptive interval of a domain for the table.
+        Args:
+            row (dict): The domain entry.
+        Returns:
+            str: "No", or the maximum and after-failure intervals.
+        """
+        if not row.get("adaptativo"):
+            return "No"
+        tiempo_max, tiempo_fallo = adaptive_defaults(int(row["tiempo"]))
+        return f"hasta {row.get('tiempo_max', tiempo_max)} s, fallo {row.get('tiempo_fallo', tiempo_fallo)} s"
+
+    def create_adaptive_fields(self, parent, row):
+        """
+        Creates the inputs of the adaptive interval policy.
+        Stable domains are checked less often, up to the maximum interval, and
+        failing ones are rechecked after the failure interval.
+        Args:
+            parent (tk.Widget): The container of the inputs.
+            row (dict): The domain entry whose values are shown, or {} for a new one.
+        Returns:
+            dict: The frame and the variable and entries with the values.
+        """
+        frame = tk.Frame(parent)
+        enabled = tk.BooleanVar(value=bool(row.get("adaptativo")))
+        check = tk.Checkbutton(frame, text="Adaptativo", variable=enabled)
+        check.pack(side=tk.LEFT)
+        Tooltip(check, "Revisa menos los sitios estables y antes los que fallan")
+
+        tk.Label(frame, text="Máx (s):").pack(side=tk.LEFT, padx=(5, 0))
+        max_entry = tk.Entry(frame, width=6)
+        max_entry.insert(0, str(row.get("tiempo_max", "")))
+        max_entry.pack(side=tk.LEFT)
+
+        tk.Label(frame, text="Fallo (s):").pack(side=tk.LEFT, padx=(5, 0))
+        retry_entry = tk.Entry(frame, width=5)
+        retry_entry.insert(0, str(row.get("tiempo_fallo", "")))
+        retry_entry.pack(side=tk.LEFT)
+
+        return {"frame": frame, "enabled": enabled, "max": max_entry, "retry": retry_entry}
+
+    def build_entry(self, dominio, tiempo, adaptive):
+        """
+        Builds a domain entry, adding the adaptive interval policy when enabled.
+        Empty limits take the defaults of the base interval.
+        Args:
+            dominio (str): The domain.
+            tiempo (int): The base interval in seconds.
+            adaptive (dict): The inputs created by create_adaptive_fields.
+        Returns:
+            dict: The entry, or None if the adaptive limits are invalid.
+        """
+        entry = {"dominio": dominio, "tiempo": tiempo}
+        if not adaptive["enabled"].get():
+            return entry
+
+        tiempo_max, tiempo_fallo = adaptive_defaults(tiempo)
+        max_text = adaptive["max"].get().strip() or str(tiempo_max)
+        retry_text = adaptive["retry"].get().strip() or str(tiempo_fallo)
+        if not max_text.isdigit() or not retry_text.isdigit():
+            messagebox.showerror("Error", "Tiempos adaptativos inválidos.")
+            return None
+        if int(max_text) < tiempo:
+            messagebox.showerror(
+                "Error", f"El tiempo máximo no puede ser menor que el tiempo ({tiempo} s).")
+            return None
+        if not 0 < int(retry_text) <= tiempo:
+            messagebox.showerror(
+                "Error", f"El tiempo de fallo debe estar entre 1 y {tiempo} s.")
+            return None
+
+        entry.update({"adaptativo": True, "tiempo_max": int(max_text), "tiempo_fallo": int(retry_text)})
+        return entry
+
     def add_entry(self):
         """
         Adds a new domain entry to the configuration file.
@@ -121,7 +204,11 @@ class ConfigWindow:
                 "Duplicado", "Este dominio ya está en la lista.")
             return
 
-        self.data.append({"dominio": dominio, "tiempo": int(tiempo)})
+        entry = self.build_entry(dominio, int(tiempo), self.new_adaptive)
+        if entry is None:
+            return
+
+        self.data.append(entry)
         with open(CONFIG_FILE, "w") as f:
             json.dump(self.data, f, indent=4)
         self.refresh_table()
@@ -151,8 +238,9 @@ class ConfigWindow:
         for widget in self.table_frame.grid_slaves(row=index):
             widget.destroy()
 
-        dominio_actual = self.data[index]["dominio"]
-        tiempo_actual = self.data[index]["tiempo"]
+        row = self.data[index]
+        dominio_actual = row["dominio"]
+        tiempo_actual = row["tiempo"]
 
         dominio_entry = tk.Entry(self.table_frame, width=30)
         dominio_entry.insert(0, dominio_actual)
@@ -162,17 +250,20 @@ class ConfigWindow:
         tiempo_entry.insert(0, str(tiempo_actual))
         tiempo_entry.grid(row=index, column=1, padx=5)
 
+        adaptive = self.create_adaptive_fields(self.table_frame, row)
+        adaptive["frame"].grid(row=index, column=2, padx=5)
+
         save_button = tk.Button(self.table_frame, text="💾", command=lambda: self.save_edit(
-            index, dominio_entry.get(), tiempo_entry.get()))
-        save_button.grid(row=index, column=2, padx=5)
+            index, dominio_entry.get(), tiempo_entry.get(), adaptive))
+        save_button.grid(row=index, column=3, padx=5)
         Tooltip(save_button, "Guardar")
 
         cancel_button = tk.Button(
             self.table_frame, text="❌", command=self.refresh_table)
-        cancel_button.grid(row=index, column=3, padx=5)
+        cancel_button.grid(row=index, column=4, padx=5)
         Tooltip(cancel_button, "Cancelar")
 
-    def save_edit(self, index, dominio, tiempo):
+    def save_edit(self, index, dominio, tiempo, adaptive):
         """
         Saves the edited domain entry to the configuration file.
         This method validates the input and checks for duplicates before saving.
@@ -180,6 +271,7 @@ class ConfigWindow:
             index (int): The index of the domain entry to edit.
             dominio (str): The new domain value.
             tiempo (str): The new time value.
+            adaptive (dict): The adaptive interval inputs of the row.
         """
         dominio = dominio.strip()
         tiempo = tiempo.strip()
@@ -195,7 +287,15 @@ class ConfigWindow:
                     "Duplicado", "Ya existe otro dominio con ese nombre.")
                 return
 
-        self.data[index] = {"dominio": dominio, "tiempo": int(tiempo)}
+        entry = self.build_entry(dominio, int(tiempo), adaptive)
+        if entry is None:
+            return
+
+        # Keep the options that are only set in config.json, such as bytes_max.
+        for key, value in self.data[index].items():
+            if key not in ("dominio", "tiempo", "adaptativo", "tiempo_max", "tiempo_fallo"):
+                entry.setdefault(key, value)
+        self.data[index] = entry
         with open(CONFIG_FILE, "w") as f:
             json.dump(self.data, f, indent=4)
         self.refresh_table()
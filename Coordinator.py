@@ -0,0 +1,341 @@
+import hmac
+import ipaddress
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from Probe import describe_status, now
+from Scheduler import merge_schedulers
+from ShardPool import RESULTS, partition
+
+# Largest request body accepted from a worker, in bytes.
+MAX_BODY = 64 * 1024 * 1024
+
+
+def parse_address(address):
+    """
+    Parses a listening address.
+    Args:
+        address (str): "host:port"; ":port" listens on every interface.
+    Returns:
+        tuple: (host, port).
+    """
+    host, _, port = address.rpartition(":")
+    return host.strip("[]"), int(port)
+
+
+def is_loopback(host):
+    """
+    Whether a listening host only accepts connections from this machine.
+    Args:
+        host (str): Host of a listening address; empty for every interface.
+    """
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def is_failure(name, args):
+    """
+    Whether a result record reports a failed check.
+    Args:
+        name (str): The engine method of the record.
+        args (list): Its arguments.
+    """
+    if name in ("show_root_error", "show_child_error"):
+        return True
+    if name == "show_root_result":
+        return describe_status(args[1], args[2], args[5])[1] == "red"
+    if name == "show_child_result":
+        return describe_status(args[2], args[3], args[6])[1] == "red"
+    return False
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface of the Coordinator.
+    POST /sync exchanges records and assignments with a worker; GET /status
+    returns the state of the workers.
+    """
+
+    def do_GET(self):
+        """
+        Returns the state of the workers.
+        """
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        if not self.authorized():
+            self.send_error(401)
+            return
+        self.reply(self.server.coordinator.snapshot())
+
+    def do_POST(self):
+        """
+        Handles the sync of a worker.
+        """
+        if self.path != "/sync":
+            self.send_error(404)
+            return
+        if not self.authorized():
+            self.send_error(401)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self.send_error(413)
+            return
+        try:
+            body = json.loads(self.rfile.read(length))
+            worker = str(body["worker"])
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+        self.reply(self.server.coordinator.sync(
+            worker, body.get("version"), body.get("records") or [], body.get("stats"),
+            bool(body.get("leaving"))))
+
+    def authorized(self):
+        """
+        Checks the shared token of the cluster, when one is set.
+        """
+        token = self.server.coordinator.token
+        return not token or hmac.compare_digest(
+            self.headers.get("X-Monitor-Token", ""), token)
+
+    def reply(self, data):
+        """
+        Sends a JSON response.
+        Args:
+            data (dict): The response body.
+        """
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        """
+        Requests are not logged; every worker syncs every few seconds.
+        """
+
+
+class Coordinator:
+    """
+    Hands out the domains of an engine to workers on other processes or hosts.
+    The domains are split into shards, sites kept together, and each shard is
+    owned by one worker. Workers call /sync every sync_interval seconds: they
+    push their result records, which are replayed on the engine as if the
+    checks had run locally, and get their shards back whenever the assignment
+    changes. A worker not heard from in worker_timeout seconds is dropped and
+    its shards go to the remaining ones; a new worker takes shards from the
+    busiest. The failures of each worker are counted for the status page;
+    since every domain is checked by a single worker, they do not tell by
+    themselves whether a site or the host of its worker failed.
+    """
+
+    def __init__(self, engine, address, shards=64, sync_interval=2, worker_timeout=15, token=""):
+        """
+        Initializes the Coordinator class.
+        Args:
+            engine (MonitorEngine): The engine the results are reported to.
+            address (str): Listening address, "host:port".
+            shards (int): Maximum number of shards the domains are split into.
+            sync_interval (float): Seconds between two syncs of a worker.
+            worker_timeout (float): Seconds without a sync before a worker is dropped.
+            token (str): Shared token workers must send; empty to accept any worker.
+        """
+        self.engine = engine
+        self.address = address
+        self.shards = partition(engine.domains, shards)
+        self.sync_interval = sync_interval
+        self.worker_timeout = worker_timeout
+        self.token = token
+        # Versions of a previous coordinator never match the ones of this one.
+        self.session = uuid.uuid4().hex[:8]
+        self.versions = 0
+        # shard index -> worker name
+        self.owners = {}
+        # worker name -> state
+        self.workers = {}
+        self.reassigned = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        """
+        Starts the HTTP server on a background thread.
+        Raises:
+            ValueError: If the address is reachable from other hosts and no
+                token is set, since anyone could then push results.
+        """
+        host, port = parse_address(self.address)
+        if not self.token and not is_loopback(host):
+            raise ValueError(
+                f"el coordinador no puede escuchar en {self.address} sin cluster_token: "
+                f"cualquiera en la red podría enviar resultados. Define cluster_token "
+                f"o escucha en 127.0.0.1")
+        self.server = ThreadingHTTPServer((host, port), CoordinatorHandler)
+        self.server.daemon_threads = True
+        self.server.coordinator = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """
+        Stops the HTTP server.
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def sync(self, name, version, records, stats, leaving=False):
+        """
+        Handles the sync of a worker.
+        Args:
+            name (str): Name of the worker.
+            version (str): Version of the assignment the worker runs.
+            records (list): (method, args) result records.
+            stats (dict): Counters of the engine of the worker.
+            leaving (bool): Whether the worker is stopping; its shards are
+                reassigned right away.
+        Returns:
+            dict: The current version of its assignment, its domains when the
+            version changed, and the sync interval.
+        """
+        failures = self.replay(name, records)
+        with self.lock:
+            worker = self.workers.get(name)
+            if worker is None:
+                print(f"[{now()}] Worker {name} conectado", flush=True)
+                worker = self.workers[name] = {
+                    "shards": [], "version": None, "records": 0, "failures": 0, "stats": None}
+            worker["last_seen"] = time.monotonic()
+            worker["records"] += len(records)
+            worker["failures"] += failures
+            worker["stats"] = stats
+            if leaving:
+                print(f"[{now()}] Worker {name} detenido, reasignando sus dominios", flush=True)
+                del self.workers[name]
+                self.rebalance()
+                return {"version": None, "domains": None, "interval": self.sync_interval}
+            self.rebalance()
+            domains = None
+            if version != worker["version"]:
+                domains = [domain for index in worker["shards"] for domain in self.shards[index]]
+            return {"version": worker["version"], "domains": domains,
+                    "interval": self.sync_interval}
+
+    def replay(self, name, records):
+        """
+        Replays the result records of a worker on the engine.
+        Args:
+            name (str): Name of the worker.
+            records (list): (method, args) result records.
+        Returns:
+            int: Number of failed checks among them.
+        """
+        failures = 0
+        for record in records:
+            try:
+                method, args = record
+                if method not in RESULTS:
+                    continue
+                failures += is_failure(method, args)
+                getattr(self.engine, method)(*args)
+            except Exception as e:
+                print(f"Error registrando resultado del worker {name}: {e}")
+        return failures
+
+    def rebalance(self):
+        """
+        Drops the workers that stopped syncing, gives their shards and the
+        unowned ones to the least busy workers, and moves shards from the
+        busiest workers to the idlest while it evens their domain counts.
+        Must be called with the lock held.
+        """
+        current = time.monotonic()
+        for name in [name for name, worker in self.workers.items()
+                     if current - worker["last_seen"] > self.worker_timeout]:
+            print(f"[{now()}] Worker {name} sin respuesta, reasignando sus dominios", flush=True)
+            del self.workers[name]
+        if not self.workers:
+            return
+
+        assignment = {name: [] for name in self.workers}
+        for index in range(len(self.shards)):
+            owner = self.owners.get(index)
+            if owner in assignment:
+                assignment[owner].append(index)
+
+        def load(name):
+            return sum(len(self.shards[index]) for index in assignment[name])
+
+        for index in range(len(self.shards)):
+            if self.owners.get(index) not in assignment:
+                if index in self.owners:
+                    self.reassigned += 1
+                assignment[min(assignment, key=load)].append(index)
+        while len(assignment) > 1:
+            busiest = max(assignment, key=load)
+            idlest = min(assignment, key=load)
+            movable = [index for index in assignment[busiest]
+                       if load(idlest) + len(self.shards[index]) < load(busiest)]
+            if not movable:
+                break
+            index = min(movable, key=lambda index: len(self.shards[index]))
+            assignment[busiest].remove(index)
+            assignment[idlest].append(index)
+
+        for name, indexes in assignment.items():
+            for index in indexes:
+                self.owners[index] = name
+            worker = self.workers[name]
+            if sorted(indexes) != worker["shards"] or worker["version"] is None:
+                self.versions += 1
+                worker["shards"] = sorted(indexes)
+                worker["version"] = f"{self.session}-{self.versions}"
+
+    def snapshot(self):
+        """
+        Returns the state of the cluster.
+        Returns:
+            dict: address, shards, unowned shards, reassignments, and per worker
+            its shards, domains, seconds since its last sync, records, failures
+            and failure ratio.
+        """
+        with self.lock:
+            current = time.monotonic()
+            workers = {
+                name: {
+                    "shards": len(worker["shards"]),
+                    "domains": sum(len(self.shards[index]) for index in worker["shards"]),
+                    "last_seen": round(current - worker["last_seen"], 1),
+                    "records": worker["records"],
+                    "failures": worker["failures"],
+                    "failure_ratio": round(worker["failures"] / worker["records"], 3)
+                    if worker["records"] else 0.0,
+                }
+                for name, worker in self.workers.items()
+            }
+            owned = {index for worker in self.workers.values() for index in worker["shards"]}
+            return {
+                "address": self.address,
+                "shards": len(self.shards),
+                "unowned": len(self.shards) - len(owned),
+                "reassigned": self.reassigned,
+                "workers": workers,
+            }
+
+    def scheduler(self):
+        """
+        Returns the scheduler metrics of the workers, combined.
+        """
+        with self.lock:
+            return merge_schedulers(
+                (worker["stats"] or {}).get("scheduler") for worker in self.workers.values())
@@ -0,0 +1,380 @@
+import requests
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+from HttpPool import session_pool
+from LinkParser import LinkScan, filter_hrefs
+from Probe import HEADERS, BodyReader, read_chunks
+
+# Sitemaps followed from a sitemap index, at most.
+MAX_SITEMAPS = 100
+
+
+def sitemap_locs(chunks):
+    """
+    Parses a sitemap or a sitemap index fed as a stream of byte chunks.
+    Each <url>/<sitemap> element is dropped once read, so memory does not grow
+    with the size of the document. Gzip-compressed sitemaps are inflated on the fly.
+    Args:
+        chunks (iterable): The body of the sitemap as byte chunks.
+    Yields:
+        tuple: (kind, loc), kind being "sitemap" for the entries of an index
+        and "url" for pages.
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    inflater = None
+    root = None
+    for chunk in chunks:
+        if inflater is None:
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b"\x1f\x8b" else False
+        parser.feed(inflater.decompress(chunk) if inflater else chunk)
+        for event, element in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "loc" and element.text:
+                kind = "sitemap" if root.tag.endswith("sitemapindex") else "url"
+                yield kind, element.text.strip()
+            elif tag in ("url", "sitemap"):
+                root.clear()
+
+
+def sitemap_paths(url, stop_event, max_bytes, read_seconds, timeout=10):
+    """
+    Reads the internal paths listed in the sitemap.xml of a domain, following
+    a sitemap index to its sitemaps. Each sitemap is read up to max_bytes and
+    the read deadline, like a page; the entries before the cut are kept.
+    Args:
+        url (str): The monitored domain.
+        stop_event (threading.Event): Set when the run is stopped.
+        max_bytes (int): Maximum number of bytes read per sitemap.
+        read_seconds (float): Seconds allowed for reading each sitemap.
+        timeout (float): Timeout of each request in seconds.
+    Yields:
+        str: Internal paths, possibly repeated.
+    """
+    pending = [url.rstrip('/') + "/sitemap.xml"]
+    fetched = 0
+    while pending and fetched < MAX_SITEMAPS and not stop_event.is_set():
+        sitemap_url = pending.pop(0)
+        fetched += 1
+        try:
+            response = session_pool.get(sitemap_url, timeout=timeout, headers=HEADERS, stream=True)
+            try:
+                if response.status_code != 200:
+                    continue
+                reader = BodyReader(response, max_bytes, read_seconds)
+                for kind, loc in sitemap_locs(reader):
+                    if stop_event.is_set():
+                        return
+                    if kind == "sitemap":
+                        pending.append(loc)
+                    else:
+                        yield from filter_hrefs([loc], url)
+                if reader.truncated:
+                    print(f"Sitemap {sitemap_url} truncado a {max_bytes} bytes o {read_seconds} s")
+            finally:
+                response.close()
+        except (requests.RequestException, ElementTree.ParseError) as e:
+            print(f"Error leyendo sitemap {sitemap_url}: {e}")
+
+
+def page_paths(url, path, max_bytes, read_seconds, timeout=10):
+    """
+    Downloads a page of a domain and returns the internal paths it links to.
+    Args:
+        url (str): The monitored domain.
+        path (str): The path of the page, "" for the root page.
+        max_bytes (int): Maximum number of bytes read.
+        read_seconds (float): Seconds allowed for reading the body.
+        timeout (float): Timeout of the request in seconds.
+    Returns:
+        list: The paths found; empty if the page is not an HTML page.
+    """
+    page_url = url.rstrip('/') + path
+    response = session_pool.get(page_url, timeout=timeout, headers=HEADERS, stream=True)
+    try:
+        if response.status_code != 200 or "html" not in response.headers.get("Content-Type", "html"):
+            return []
+        scan = LinkScan(url, response.encoding or "utf-8", page_url=page_url if path else None)
+        read_chunks(response, max_bytes, read_seconds, keep=False, consume=scan.feed)
+    finally:
+        response.close()
+    return scan.paths()
+
+
+def discover(url, depth, use_sitemap, max_pages, max_bytes, read_seconds, stop_event):
+    """
+    Crawls a domain breadth-first to find its internal pages.
+    The first level are the paths of the sitemap, when enabled, and the links
+    of the root page; every further level follows the links of the pages of
+    the previous one, up to depth levels in total.
+    Args:
+        url (str): The monitored domain.
+        depth (int): Link levels followed from the root page.
+        use_sitemap (bool): Whether to seed the crawl from sitemap.xml.
+        max_pages (int): Maximum number of paths returned.
+        max_bytes (int): Maximum number of bytes read per page.
+        read_seconds (float): Seconds allowed for reading each page.
+        stop_event (threading.Event): Set when the run is stopped.
+    Returns:
+        list: The paths found, in discovery order, or None if the crawl was stopped.
+    """
+    seen = set()
+    paths = []
+
+    def add(found, level):
+        for path in found:
+            if len(paths) >= max_pages:
+                return
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+                level.append(path)
+
+    level = []
+    if use_sitemap:
+        add(sitemap_paths(url, stop_event, max_bytes, read_seconds), level)
+    for current in range(depth):
+        next_level = []
+        # The root page is only read once, even when it links to itself.
+        pages = [""] if current == 0 else [path for path in level if path != "/"]
+        for path in pages:
+            if stop_event.is_set():
+                return None
+            if len(paths) >= max_pages:
+                break
+            try:
+                add(page_paths(url, path, max_bytes, read_seconds), next_level)
+            except requests.RequestException as e:
+                print(f"Error explorando {url.rstrip('/') + path}: {e}")
+        level = level + next_level if current == 0 else next_level
+    return None if stop_event.is_set() else paths
+
+
+class CrawlFrontier:
+    """
+    The known internal pages of one domain and the position of the next check.
+    Links of the root page are merged on every check; a full discovery
+    replaces the whole list. The checks go round the list, starting where the
+    previous cycle stopped, so a site larger than one cycle is covered over
+    several cycles instead of always checking the same first pages.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty CrawlFrontier.
+        """
+        self.paths = []
+        # The same strings as paths, for lookups; only the table is extra.
+        self.seen = set()
+        self.cursor = 0
+        self.discovered_at = None
+
+    def merge(self, paths):
+        """
+        Appends the paths that are not known yet.
+        Args:
+            paths (iterable): Paths found on the root page.
+        """
+        for path in paths:
+            if path not in self.seen:
+                self.seen.add(path)
+                self.paths.append(path)
+
+    def replace(self, paths):
+        """
+        Replaces the known pages with the result of a discovery, or with the
+        links of the root page. Nothing is rebuilt if they did not change.
+        Args:
+            paths (list): Paths found by the crawl.
+        Returns:
+            list: The known paths that are not in the new list.
+        """
+        if paths == self.paths:
+            return []
+        seen = set(paths)
+        dropped = [path for path in self.paths if path not in seen]
+        self.paths = list(paths)
+        self.seen = seen
+        self.cursor = self.cursor % len(self.paths) if self.paths else 0
+        return dropped
+
+    def batch(self):
+        """
+        Returns the known paths starting from the cursor.
+        """
+        return self.paths[self.cursor:] + self.paths[:self.cursor]
+
+    def advance(self, checked):
+        """
+        Moves the cursor past the paths checked in this cycle.
+        Args:
+            checked (int): Number of paths checked.
+        """
+        if self.paths:
+            self.cursor = (self.cursor + checked) % len(self.paths)
+
+
+class Discovery:
+    """
+    Keeps a CrawlFrontier per domain and refreshes it on its own schedule.
+    With the default depth of 1 and no sitemap, the frontier is simply the
+    links of the root page, as read on each check. Deeper crawls and sitemaps
+    run on a small background pool every discovery_interval seconds, apart
+    from the health checks, and their result is used by the checks that follow.
+    """
+
+    def __init__(self, settings, forget=None):
+        """
+        Initializes the Discovery class.
+        Args:
+            settings (Settings): Advanced settings (crawl_depth, use_sitemap,
+                discovery_interval, max_pages and discovery_workers).
+            forget (callable): Called with (url, paths) when pages of a domain
+                leave its frontier, so their history can be freed.
+        """
+        self.settings = settings
+        self.forget = forget
+        self.frontiers = {}
+        self.options = {}
+        self.running = set()
+        self.runs = 0
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(
+            max_workers=max(1, int(settings.get("discovery_workers"))),
+            thread_name_prefix="discovery")
+
+    def set_domain(self, url, depth=None, use_sitemap=None, max_bytes=None, read_seconds=10):
+        """
+        Sets the discovery options of a domain.
+        Args:
+            url (str): The monitored domain.
+            depth (int): Link levels to follow; crawl_depth when None.
+            use_sitemap (bool): Whether to read sitemap.xml; use_sitemap when None.
+            max_bytes (int): Maximum number of bytes read per page.
+            read_seconds (float): Seconds allowed for reading each page.
+        """
+        self.options[url] = {
+            "depth": max(1, int(self.settings.get("crawl_depth") if depth is None else depth)),
+            "sitemap": bool(self.settings.get("use_sitemap") if use_sitemap is None else use_sitemap),
+            "max_bytes": max_bytes,
+            "read_seconds": read_seconds,
+        }
+
+    def crawls(self, url):
+        """
+        Whether a domain needs background discovery, beyond its root links.
+        Args:
+            url (str): The monitored domain.
+        """
+        options = self.options.get(url)
+        return options is not None and (options["depth"] > 1 or options["sitemap"])
+
+    def child_paths(self, url, root_paths, stop_event):
+        """
+        Returns the paths to check in this cycle, starting a discovery if one is due.
+        Args:
+            url (str): The monitored domain.
+            root_paths (list): The paths linked from the root page.
+            stop_event (threading.Event): Set when the run is stopped.
+        Returns:
+            list: The known paths, starting where the previous cycle stopped.
+        """
+        crawls = self.crawls(url)
+        with self.lock:
+            frontier = self.frontiers.setdefault(url, CrawlFrontier())
+            dropped = None
+            if crawls:
+                frontier.merge(root_paths)
+            else:
+                dropped = frontier.replace(root_paths)
+            due = crawls and url not in self.running and (
+                frontier.discovered_at is None or
+                time.monotonic() - frontier.discovered_at >= self.settings.get("discovery_interval"))
+            if due:
+                self.running.add(url)
+            paths = frontier.batch()
+        if due:
+            self.pool.submit(self.run, url, stop_event)
+        if dropped and self.forget:
+            self.forget(url, dropped)
+        return paths
+
+    def advance(self, url, checked):
+        """
+        Records how many paths of the cycle were checked.
+        Args:
+            url (str): The monitored domain.
+            checked (int): Number of paths checked.
+        """
+        with self.lock:
+            frontier = self.frontiers.get(url)
+            if frontier is not None:
+                frontier.advance(checked)
+
+    def run(self, url, stop_event):
+        """
+        Crawls a domain and stores the result in its frontier.
+        Args:
+            url (str): The monitored domain.
+            stop_event (threading.Event): Set when the run is stopped.
+        """
+        try:
+            options = self.options[url]
+            paths = discover(url, options["depth"], options["sitemap"],
+                             int(self.settings.get("max_pages")), options["max_bytes"],
+                             options["read_seconds"], stop_event)
+            if paths is None:
+                return
+            with self.lock:
+                frontier = self.frontiers.setdefault(url, CrawlFrontier())
+                dropped = frontier.replace(paths)
+                frontier.discovered_at = time.monotonic()
+                self.runs += 1
+            if dropped and self.forget:
+                self.forget(url, dropped)
+        except Exception as e:
+            print(f"Error descubriendo páginas de {url}: {e}")
+        finally:
+            with self.lock:
+                self.running.discard(url)
+
+    def retain(self, urls):
+        """
+        Drops the frontiers of the domains that are no longer monitored.
+        Args:
+            urls (iterable): The URLs still being monitored.
+        """
+        urls = set(urls)
+        with self.lock:
+            for url in list(self.frontiers):
+                if url not in urls:
+                    del self.frontiers[url]
+            for url in list(self.options):
+                if url not in urls:
+                    del self.options[url]
+
+    def close(self):
+        """
+        Stops the background pool. Crawls in progress end at their stop event.
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self):
+        """
+        Returns the discovery counters.
+        Returns:
+            dict: domains, known pages, discoveries running and completed.
+        """
+        with self.lock:
+            return {
+                "domains": len(self.frontiers),
+                "pages": sum(len(frontier.paths) for frontier in self.frontiers.values()),
+                "running": len(self.running),
+                "runs": self.runs,
+            }
@@ -0,0 +1,227 @@
+import ipaddress
+import socket
+import threading
+import time
+
+
+def system_resolve(host):
+    """
+    Resolves a host name with the system resolver.
+    Args:
+        host (str): Host name.
+    Returns:
+        list: (family, address) tuples in the order returned by the resolver,
+        without duplicates.
+    """
+    addresses = []
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM):
+        if (family, sockaddr[0]) not in addresses:
+            addresses.append((family, sockaddr[0]))
+    return addresses
+
+
+def ip_literal(host):
+    """
+    Returns the address of a host that is already an IP address.
+    Args:
+        host (str): Host name or IP address, IPv6 optionally in brackets.
+    Returns:
+        list: A single (family, address) tuple, or None for a host name.
+    """
+    try:
+        address = ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return None
+    family = socket.AF_INET6 if address.version == 6 else socket.AF_INET
+    return [(family, str(address))]
+
+
+class DnsCache:
+    """
+    Process-wide cache of host name resolutions, shared by every probe.
+    Addresses are kept for ttl seconds and failed lookups for negative_ttl
+    seconds. Concurrent lookups of the same host wait for a single resolver
+    call. With pin enabled, a host keeps its last good addresses once it has
+    resolved: expired entries are still served and refreshed in the background,
+    so a slow or flaky local resolver never adds to the measured latency.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=30, pin=False, resolver=system_resolve,
+                 clock=time.monotonic):
+        """
+        Initializes an empty DnsCache.
+        Args:
+            ttl (float): Seconds the addresses of a host are reused.
+            negative_ttl (float): Seconds a failed lookup is remembered.
+            pin (bool): Keep serving the last good addresses after they expire.
+            resolver (callable): Function resolving a host to (family, address) tuples.
+            clock (callable): Monotonic clock, in seconds.
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.pin = pin
+        self.resolver = resolver
+        self.clock = clock
+        # host -> (addresses, error, expires)
+        self.entries = {}
+        self.pending = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.refresh_failures = 0
+
+    def configure(self, ttl, negative_ttl, pin):
+        """
+        Applies new cache settings. Cached entries are kept.
+        Args:
+            ttl (float): Seconds the addresses of a host are reused.
+            negative_ttl (float): Seconds a failed lookup is remembered.
+            pin (bool): Keep serving the last good addresses after they expire.
+        """
+        with self.lock:
+            self.ttl = ttl
+            self.negative_ttl = negative_ttl
+            self.pin = pin
+
+    def cached(self, host):
+        """
+        Returns the addresses of a host only if they are cached and fresh.
+        Never blocks on the resolver, so it is safe to call from an event loop.
+        Args:
+            host (str): Host name or IP address.
+        Returns:
+            list: (family, address) tuples, or None if resolve() is needed.
+        """
+        literal = ip_literal(host)
+        if literal:
+            return literal
+        with self.lock:
+            entry = self.entries.get(host.lower())
+            if entry is None or entry[0] is None or self.clock() >= entry[2]:
+                return None
+            self.hits += 1
+            return list(entry[0])
+
+    def resolve(self, host):
+        """
+        Returns the addresses of a host, resolving it if needed.
+        Args:
+            host (str): Host name or IP address.
+        Returns:
+            list: (family, address) tuples.
+        Raises:
+            socket.gaierror: If the host does not resolve, now or within negative_ttl.
+        """
+        literal = ip_literal(host)
+        if literal:
+            return literal
+        key = host.lower()
+        while True:
+            stale = None
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    addresses, error, expires = entry
+                    if self.clock() < expires:
+                        if error is not None:
+                            self.negative_hits += 1
+                            raise socket.gaierror(*error.args)
+                        self.hits += 1
+                        return list(addresses)
+                    if self.pin and addresses is not None:
+                        self.stale_hits += 1
+                        stale = addresses
+                        refresh = key not in self.refreshing
+                        self.refreshing.add(key)
+                if stale is None:
+                    event = self.pending.get(key)
+                    owner = event is None
+                    if owner:
+                        event = threading.Event()
+                        self.pending[key] = event
+                        self.misses += 1
+            if stale is not None:
+                if refresh:
+                    threading.Thread(target=self.refresh, args=(key,), daemon=True).start()
+                return list(stale)
+            if not owner:
+                # Another thread is resolving this host; use its result.
+                event.wait()
+                continue
+            try:
+                return self.lookup(key)
+            finally:
+                with self.lock:
+                    self.pending.pop(key, None)
+                event.set()
+
+    def lookup(self, key):
+        """
+        Calls the resolver and caches the addresses or the failure.
+        Args:
+            key (str): Lowercase host name.
+        Returns:
+            list: (family, address) tuples.
+        """
+        try:
+            addresses = self.resolver(key)
+        except socket.gaierror as e:
+            with self.lock:
+                self.entries[key] = (None, e, self.clock() + self.negative_ttl)
+            raise
+        with self.lock:
+            self.entries[key] = (addresses, None, self.clock() + self.ttl)
+        return list(addresses)
+
+    def refresh(self, key):
+        """
+        Resolves a pinned host again in the background.
+        On failure the pinned addresses are kept and retried after negative_ttl.
+        Args:
+            key (str): Lowercase host name.
+        """
+        try:
+            addresses = self.resolver(key)
+            expires = self.ttl
+        except OSError:
+            addresses = None
+            expires = self.negative_ttl
+        with self.lock:
+            self.refreshing.discard(key)
+            if addresses is None:
+                self.refresh_failures += 1
+                entry = self.entries.get(key)
+                if entry is not None:
+                    addresses = entry[0]
+            if addresses is not None:
+                self.entries[key] = (addresses, None, self.clock() + expires)
+
+    def clear(self):
+        """
+        Forgets every cached host.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def snapshot(self):
+        """
+        Returns the cache counters.
+        Returns:
+            dict: hosts, hits, misses, negative_hits, stale_hits and refresh_failures.
+        """
+        with self.lock:
+            return {
+                "hosts": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+                "stale_hits": self.stale_hits,
+                "refresh_failures": self.refresh_failures,
+            }
+
+
+# Shared by every probe of the process, whatever the engine.
+dns_cache = DnsCache()
@@ -1,81 +1,82 @@
-import json
-import requests
-import threading
+import bisect
 import tkinter as tk
-from bs4 import BeautifulSoup
-from tkinter import ttk
-from datetime import datetime
-from urllib.parse import urljoin, urlparse
+from ErrorWriter import ERROR_LOG
+from MonitorEngine import MonitorEngine
+from UpdateQueue import UpdateQueue
+from tkinter import messagebox, ttk
+
+
+def format_window(seconds):
+    """
+    Formats a statistics window for the detail pane, e.g. 300 -> "5 min".
+    Args:
+        seconds (int): Length of the window.
+    """
+    if seconds % 86400 == 0:
+        return f"{seconds // 86400} d"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} h"
+    return f"{seconds // 60} min"
+
+
+def format_ms(value):
+    """
+    Formats a latency for the detail pane.
+    Args:
+        value (int): Latency in milliseconds, or None.
+    """
+    return "N/A" if value is None else f"{value} ms"
 
 
 class DomainMonitor:
     """
     Class for monitoring domains in a Tkinter application.
-    This class provides a GUI for displaying monitored domains and their times.
+    This class provides a GUI for displaying monitored domains and their times;
+    the checks themselves are run by a MonitorEngine, which can also run headless.
     """
 
-    def __init__(self, parent, config_path="config.json", error_path="error.json"):
+    def __init__(self, parent, config_path="config.json", error_path=ERROR_LOG, settings=None, engine=None):
         """
         Initializes the DomainMonitor class.
         Args:
             parent (tk.Tk): The parent Tkinter window.
             config_path (str): Path to the configuration file containing monitored domains.
-            error_path (str): Path to the error file for logging errors.
+            error_path (str): Path to the line-delimited error log.
+            settings (Settings): Advanced settings; loaded from settings.json when omitted.
+            engine (MonitorEngine): Engine to display; created from the other arguments when omitted.
         """
         self.parent = parent
-        self.config_path = config_path
-        self.error_path = error_path
+        self.engine = engine or MonitorEngine(config_path, error_path, settings)
+        self.settings = self.engine.settings
+        self.store = self.engine.store
         self.tree = None
-        self.domains = self.load_domains()
         self.tree_items = {}
-        self.threads = []
-        self.stop_event = threading.Event()
-        self.stop_event.clear()
+        # (domain, path) -> item id, and the sorted paths of each domain
+        self.child_items = {}
+        self.child_paths = {}
+        # item id -> (domain, path), to find the URL of the selected row
+        self.item_keys = {}
+        self.detail = None
+        # Colors of every row and per-domain counters used for the parent status
+        self.root_colors = {}
+        self.child_colors = {}
+        self.child_counts = {}
+        self.updates = UpdateQueue()
+        self.engine.add_listener(self.queue_update)
         self.setup_tree()
-        self.start_monitoring_threads()
-
-    def load_domains(self):
-        """
-        Loads the monitored domains from the configuration file.
-        Returns:
-            list: A list of dictionaries containing domain information.
-        """
-        try:
-            with open(self.config_path, "r") as file:
-                return json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Error cargando dominios: {e}")
-            return []
-
-    def log_error(self, domain, status_code, reason):
-        """
-        Logs errors to the error file.
-        Args:
-            domain (str): The domain that caused the error.
-            status_code (int): The HTTP status code received.
-            reason (str): The reason for the error.
-        """
-        error_entry = {
-            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "dominio": domain,
-            "error": f"{status_code} - {reason}"
-        }
-
-        try:
-            with open(self.error_path, "r") as f:
-                errores = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            errores = []
-        errores.append(error_entry)
-
-        with open(self.error_path, "w") as f:
-            json.dump(errores, f, indent=4)
+        self.start_engine()
+        self.parent.after(self.settings.get("ui_tick_ms"), self.process_updates)
 
     def setup_tree(self):
         """
         Sets up the Treeview widget for displaying monitored domains.
         This method creates the Treeview widget and populates it with the monitored domains.
         """
+        # Latency and availability of the selected row
+        self.detail = ttk.Label(self.parent, anchor="w", justify=tk.LEFT,
+                                text="Selecciona una URL para ver su latencia.")
+        self.detail.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 10))
+
         container = ttk.Frame(self.parent)
         container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
@@ -85,7 +86,7 @@ class DomainMonitor:
 
         self.tree = ttk.Treeview(
             container,
-            columns=("estado", "fecha", "tiempo"),
+            columns=("estado", "fecha", "tiempo", "resumen"),
             show="tree headings",
             height=20,
             yscrollcommand=vsb.set,
@@ -93,197 +94,219 @@ class DomainMonitor:
 
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         vsb.config(command=self.tree.yview)
+        self.tree.bind("<<TreeviewSelect>>", lambda _: self.show_detail())
 
         total_width = 550
         self.tree.column("#0", width=int(
-            total_width * 0.40), anchor="w")  # URL
+            total_width * 0.35), anchor="w")  # URL
         self.tree.column("estado", width=int(
             total_width * 0.10), anchor="center")
         self.tree.column("fecha", width=int(
-            total_width * 0.40), anchor="center")
+            total_width * 0.32), anchor="center")
         self.tree.column("tiempo", width=int(
             total_width * 0.10), anchor="center")
+        self.tree.column("resumen", width=int(
+            total_width * 0.13), anchor="center")
 
         self.tree.heading("#0", text="URL")
         self.tree.heading("estado", text="Estado")
         self.tree.heading("fecha", text="Última actualización")
         self.tree.heading("tiempo", text="Tiempo de respuesta")
+        self.tree.heading("resumen", text="Resumen")
 
-        for domain in self.domains:
-            url = domain.get("dominio", "Desconocido")
-            tiempo = int(domain.get("tiempo", 300))
+        for url in self.engine.urls():
             item_id = self.tree.insert("", tk.END, text=url, values=(
-                "---", "---", "---"), tags=("black",))
+                "---", "---", "---", "---"), tags=("black",))
             self.tree_items[url] = item_id
+            self.item_keys[item_id] = (url, None)
 
         self.tree.tag_configure("green", foreground="green")
         self.tree.tag_configure("red", foreground="red")
         self.tree.tag_configure("yellow", foreground="orange")
         self.tree.tag_configure("black", foreground="black")
 
-    def update_parent_color(self, parent_id):
+    def start_engine(self):
+        """
+        Starts the engine, reporting a coordinator address it refuses to use.
+        """
+        try:
+            self.engine.start()
+        except ValueError as e:
+            messagebox.showerror("Error", f"No se pudo iniciar el monitoreo: {e}.")
+
+    def update_parent_color(self, url):
         """
-        Updates the color of the parent node based on its children.
+        Updates the color and the summary of the parent node from its child counters.
         Green: all children green
         Red: all children red or error
         Yellow: mixed colors
-        Black: no children or all loading
+        Black: all loading
+        Without children the node keeps the color of its own check.
 
         Args:
-            parent_id (str): The ID of the parent node in the Treeview.
+            url (str): The monitored domain.
         """
-        children = self.tree.get_children(parent_id)
-        colors = set()
-        for child in children:
-            tags = self.tree.item(child, "tags")
-            if tags:
-                colors.update(tags)
-
-        new_tag = "black"
+        counts = self.child_counts.get(url)
+        colors = {color for color, count in counts.items() if count} if counts else set()
+
+        new_tag = self.root_colors.get(url, "black")
         if colors:
-            if all(tag == "green" for tag in colors):
+            if colors == {"green"}:
                 new_tag = "green"
-            elif all(tag == "red" for tag in colors):
+            elif colors == {"red"}:
                 new_tag = "red"
-            elif "green" in colors and "red" in colors:
-                new_tag = "yellow"
-            elif all(tag == "black" for tag in colors):
+            elif colors == {"black"}:
                 new_tag = "black"
             else:
                 new_tag = "yellow"
 
+        parent_id = self.tree_items[url]
         self.tree.item(parent_id, tags=(new_tag,))
+        if counts:
+            self.tree.set(parent_id, "resumen",
+                          f"{counts['green']}/{sum(counts.values())} OK")
 
-    def start_monitoring_threads(self):
+    def count_child(self, url, path, color):
+        """
+        Keeps the per-domain counters of child colors up to date in O(1).
+        Args:
+            url (str): The monitored domain.
+            path (str): The path of the child page.
+            color (str): The new color of the child row.
         """
-        Starts monitoring threads for each domain.
-        This method creates a thread for each domain to monitor its status.
+        key = (url, path)
+        old = self.child_colors.get(key)
+        if old == color:
+            return
+        counts = self.child_counts.setdefault(url, {"green": 0, "red": 0, "black": 0})
+        if old is not None:
+            counts[old] -= 1
+        counts[color] = counts.get(color, 0) + 1
+        self.child_colors[key] = color
+
+    def close(self):
         """
-        self.stop_event.clear()
-        for domain in self.domains:
-            url = domain.get("dominio", "Desconocido")
-            tiempo = int(domain.get("tiempo", 300))
-            thread = threading.Thread(
-                target=self.monitor_domain,
-                args=(url, tiempo),
-                daemon=True
-            )
-            self.threads.append(thread)
-            thread.start()
+        Stops the engine and flushes the pending error log entries and results.
+        Called when the application exits.
+        """
+        self.engine.close()
 
-    def monitor_domain(self, url, tiempo):
+    def stats(self):
+        """
+        Returns the engine counters plus the UI update counters.
+        Returns:
+            dict: Engine name, checks done, checks per second, live threads,
+            connection pool, link cache and UI update counters.
         """
-        Monitors a domain and updates its status in the Treeview.
+        stats = self.engine.stats()
+        stats["ui_updates"] = self.updates.snapshot()
+        return stats
+
+    def queue_update(self, url, path, values, color):
+        """
+        Listener of the engine: queues a row update for the Tk thread.
+        Called from the worker threads; the Treeview is updated by process_updates.
         Args:
-            url (str): The domain to monitor.
-            tiempo (int): The time interval for monitoring the domain.
+            url (str): The monitored domain.
+            path (str): The path of the child page, or None for the domain itself.
+            values (tuple): Values for the estado, fecha and tiempo columns.
+            color (str): Color of the row.
+        """
+        self.updates.put((url, path), (values, color))
+
+    def process_updates(self):
+        """
+        Applies the queued row updates to the Treeview. Runs on the Tk thread
+        every ui_tick_ms milliseconds and applies at most ui_max_updates_per_tick
+        updates, leaving the rest for the next tick so the window stays responsive.
+        Each parent color and summary is recalculated once per tick.
+        """
+        touched = set()
+        selected = self.selected_key()
+        refresh_detail = False
+        for (url, path), (values, color) in self.updates.drain(
+                self.settings.get("ui_max_updates_per_tick")):
+            parent_id = self.tree_items.get(url)
+            if parent_id is None:
+                continue  # Domain removed by a reload
+            if path is None:
+                self.root_colors[url] = color
+                self.tree.item(parent_id, values=values, tags=(color,))
+            else:
+                self.set_child(url, path, values, color)
+                self.count_child(url, path, color)
+            touched.add(url)
+            refresh_detail = refresh_detail or (url, path) == selected
+
+        for url in touched:
+            self.update_parent_color(url)
+        if refresh_detail:
+            self.show_detail()
+
+        self.parent.after(self.settings.get("ui_tick_ms"), self.process_updates)
+
+    def set_child(self, url, path, values, color):
+        """
+        Updates the row of a child page, inserting it in order if it does not exist.
+        Rows are found through the (domain, path) index and new rows are inserted
+        directly at their sorted position, so no Treeview children are scanned or moved.
+        Must be called from the Tk thread.
+        Args:
+            url (str): The monitored domain.
+            path (str): The path of the child page.
+            values (tuple): Values for the estado, fecha and tiempo columns.
+            color (str): Tag used to color the row.
+        """
+        item = self.child_items.get((url, path))
+        if item is not None:
+            self.tree.item(item, values=values, tags=(color,))
+            return
+
+        paths = self.child_paths.setdefault(url, [])
+        index = bisect.bisect_left(paths, path)
+        paths.insert(index, path)
+        item = self.tree.insert(
+            self.tree_items[url], index, text=path, values=values, tags=(color,))
+        self.child_items[(url, path)] = item
+        self.item_keys[item] = (url, path)
+
+    def selected_key(self):
+        """
+        Returns the (domain, path) of the selected row, path being None for a domain.
+        Returns:
+            tuple: The key, or None if no row is selected.
+        """
+        selection = self.tree.selection()
+        return self.item_keys.get(selection[0]) if selection else None
+
+    def show_detail(self):
+        """
+        Shows the latency percentiles and the availability of the selected URL
+        for each of the latency_windows.
         """
-        headers = {
-            "User-Agent": "US - Monitor de Sitios - v1.1.0",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        }
-        while not self.stop_event.is_set():
-            try:
-                response = requests.get(url, timeout=tiempo, headers=headers)
-                status = response.status_code
-                fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                tiempo_ms = int(response.elapsed.total_seconds() * 1000)
-                estado = "Ok" if status == 200 else f"{status} {response.reason}"
-                color = "green" if status == 200 else "red"
-
-                self.tree.item(self.tree_items[url], values=(
-                    estado, fecha, f"{tiempo_ms} ms"), tags=(color,))
-                self.update_parent_color(self.tree_items[url])
-                if status != 200:
-                    self.log_error(url, status, response.reason)
-                    self.update_parent_color(self.tree_items[url])
-
-                if status == 200:
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    links = soup.find_all("a", href=True)
-                    base_url = url.rstrip('/')
-                    base_domain = urlparse(base_url).netloc
-                    for link in links:
-                        href = link['href']
-                        if any(s in href for s in ['#', '?']) or href.startswith(('mailto:', 'tel:')):
-                            continue
-
-                        full_url = urljoin(base_url + '/', href)
-                        parsed_url = urlparse(full_url)
-                        if parsed_url.netloc and parsed_url.netloc != base_domain:
-                            continue
-
-                        path = parsed_url.path
-                        if not path.startswith("/"):
-                            continue
-
-                        child_url = base_url + path
-                        if child_url == url:
-                            continue
-
-                        try:
-                            sub_response = requests.get(
-                                child_url, timeout=10, headers=headers)
-                            sub_status = sub_response.status_code
-                            sub_fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            sub_tiempo = int(
-                                sub_response.elapsed.total_seconds() * 1000)
-                            sub_estado = "Ok" if sub_status == 200 else f"{sub_status} {sub_response.reason}"
-                            sub_color = "green" if sub_status == 200 else "red"
-
-                            exists = False
-                            for item in self.tree.get_children(self.tree_items[url]):
-                                if self.tree.item(item, "text") == path:
-                                    exists = True
-                                    self.tree.item(item, values=(
-                                        sub_estado, sub_fecha, f"{sub_tiempo} ms"), tags=(sub_color,))
-                                    self.update_parent_color(
-                                        self.tree_items[url])
-                                    break
-
-                            if not exists:
-                                new_id = self.tree.insert(
-                                    self.tree_items[url],
-                                    tk.END,
-                                    text=path,
-                                    values=(sub_estado, sub_fecha,
-                                            f"{sub_tiempo} ms"),
-                                    tags=(sub_color,)
-                                )
-
-                                children = list(
-                                    self.tree.get_children(self.tree_items[url]))
-                                sorted_children = sorted(
-                                    children, key=lambda c: self.tree.item(c, "text"))
-
-                                for idx, child in enumerate(sorted_children):
-                                    self.tree.move(
-                                        child, self.tree_items[url], idx)
-
-                                self.update_parent_color(self.tree_items[url])
-
-                        except requests.RequestException as e:
-                            error_fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            self.tree.insert(
-                                self.tree_items[url],
-                                tk.END,
-                                text=path,
-                                values=("Error", error_fecha, "N/A"),
-                                tags=("red",)
-                            )
-                            self.log_error(child_url, "Error", str(e))
-                            self.update_parent_color(self.tree_items[url])
-
-            except requests.RequestException as e:
-                fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.tree.item(self.tree_items[url], values=(
-                    str(e), fecha, "N/A"), tags=("red",))
-                self.log_error(url, "Error", str(e))
-                self.update_parent_color(self.tree_items[url])
-
-            for _ in range(tiempo):
-                if self.stop_event.wait(1):
-                    break
+        key = self.selected_key()
+        if key is None:
+            return
+        url, path = key
+        full_url = url if path is None else url.rstrip('/') + path
+        lines = [full_url]
+        for window in self.settings.get("latency_windows"):
+            stats = self.engine.latency.stats(full_url, window)
+            label = format_window(window)
+            if stats is None:
+                lines.append(f"{label}: sin datos")
+                continue
+            lines.append(
+                f"{label}: p50 {format_ms(stats['p50'])} · p95 {format_ms(stats['p95'])} · "
+                f"p99 {format_ms(stats['p99'])} · disponibilidad {stats['availability']}% "
+                f"({stats['checks']} revisiones)")
+        phases = self.engine.phases.get(full_url)
+        if phases:
+            lines.append(
+                f"Última revisión: DNS {format_ms(phases['dns_ms'])} · "
+                f"Conexión {format_ms(phases['connect_ms'])} · TLS {format_ms(phases['tls_ms'])} · "
+                f"TTFB {format_ms(phases['ttfb_ms'])} · Descarga {format_ms(phases['download_ms'])}")
+        self.detail.config(text="\n".join(lines))
 
     def update_tree(self, url, text, color):
         """
@@ -293,7 +316,7 @@ class DomainMonitor:
         item_id = self.tree_items.get(url)
         if item_id:
             self.tree.item(item_id, text=text, tags=(color,))
-            self.update_parent_color(self.tree_items[url])
+            self.update_parent_color(url)
         else:
             print(f"Error: No se encontró el dominio {url} en el Treeview.")
 
@@ -306,7 +329,7 @@ class DomainMonitor:
         This method is called when the user wants to refresh the monitored domains.
         Only call this method in the Main class, not in the DomainMonitor class.
         """
-        self.stop_event.set()
+        self.engine.stop()
         self.parent.after(50, self._finish_reload)
 
     def _finish_reload(self):
@@ -314,18 +337,23 @@ class DomainMonitor:
         Finishes the reload process by clearing the Treeview and reloading the domains.
         This method is called after a short delay to ensure that the threads are stopped before reloading.
         """
-        self.threads.clear()
+        self.updates.clear()
         self.tree_items.clear()
+        self.child_items.clear()
+        self.child_paths.clear()
+        self.item_keys.clear()
+        self.root_colors.clear()
+        self.child_colors.clear()
+        self.child_counts.clear()
         for item in self.tree.get_children():
             self.tree.delete(item)
 
-        self.domains = self.load_domains()
-        for domain in self.domains:
-            url = domain.get("dominio", "Desconocido")
+        self.engine.reload()
+        for url in self.engine.urls():
             iid = self.tree.insert(
-                "", tk.END, text=url, values=("---", "---", "---"), tags=("black",)
+                "", tk.END, text=url, values=("---", "---", "---", "---"), tags=("black",)
             )
             self.tree_items[url] = iid
+            self.item_keys[iid] = (url, None)
 
-        self.stop_event.clear()
-        self.start_monitoring_threads()
+        self.start_engine()
@@ -1,33 +1,43 @@
 import tkinter as tk
-import json
-import os
-import csv
-import xlwt
+from Exporters import ExportCancelled, ExportEmpty, ExportJob
+from ResultStore import ResultStore, to_timestamp
 from utils import IconManager, Tooltip
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 
 
 class ErrorLogWindow(tk.Toplevel):
     """
     A class to create a window that displays the error log of the application.
     This window shows the date, domain, and error message for each entry in the log.
-    The log is loaded from a JSON file named "error.json".
-    The window contains a text widget with horizontal and vertical scrollbars
+    The entries are queried from the ResultStore database one page at a time,
+    newest first, so opening the window does not depend on the size of the log.
+    The window contains filters by domain and date, and paging buttons.
     """
 
-    def __init__(self, master=None):
+    PAGE_SIZE = 200
+
+    def __init__(self, master=None, store=None, domains=None):
         """
         Initializes the ErrorLog window.
         Args:
             master (tk.Tk): The parent window.
+            store (ResultStore): Store to read the errors from; the default database if omitted.
+            domains (list): Monitored domains offered in the domain filter.
         """
 
         super().__init__(master)
+        self.store = store or ResultStore()
         self.title("Registro de Errores")
-        self.geometry("800x400")
+        self.geometry("800x450")
         self.iconbitmap(IconManager.resource_path("favicon.ico"))
         self.resizable(False, False)
 
+        # Cursors of the first row of every page visited, to go back.
+        self.page_cursors = []
+        self.next_cursor = None
+        self.filters = {}
+        self.export_job = None
+
         header = tk.Frame(self)
         header.pack(fill=tk.X, pady=10, padx=10)
 
@@ -47,133 +57,239 @@ class ErrorLogWindow(tk.Toplevel):
         xls_button = tk.Button(header, text="📊", font=("Arial", 14),
                                relief="flat", bd=0, command=self.export_to_xls)
         xls_button.grid(row=0, column=2, padx=5)
-        Tooltip(xls_button, "Exportar a XLS")
+        Tooltip(xls_button, "Exportar a Excel")
+
+        # Filters
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(fill=tk.X, padx=10)
+
+        tk.Label(filter_frame, text="Dominio:").grid(row=0, column=0, padx=5)
+        self.domain_filter = ttk.Combobox(
+            filter_frame, width=35, values=[""] + list(domains or []))
+        self.domain_filter.grid(row=0, column=1, padx=5)
+
+        tk.Label(filter_frame, text="Desde:").grid(row=0, column=2, padx=5)
+        self.start_filter = tk.Entry(filter_frame, width=11)
+        self.start_filter.grid(row=0, column=3, padx=5)
+
+        tk.Label(filter_frame, text="Hasta:").grid(row=0, column=4, padx=5)
+        self.end_filter = tk.Entry(filter_frame, width=11)
+        self.end_filter.grid(row=0, column=5, padx=5)
+        Tooltip(self.start_filter, "AAAA-MM-DD")
+        Tooltip(self.end_filter, "AAAA-MM-DD")
+
+        filter_button = tk.Button(
+            filter_frame, text="🔍", relief="flat", bd=0, command=self.apply_filters)
+        filter_button.grid(row=0, column=6, padx=5)
+        Tooltip(filter_button, "Filtrar")
 
         frame = tk.Frame(self)
         frame.pack(fill="both", expand=True, padx=10, pady=5)
 
-        y_scrollbar = tk.Scrollbar(frame, orient="vertical")
+        y_scrollbar = ttk.Scrollbar(frame, orient="vertical")
         y_scrollbar.pack(side="right", fill="y")
 
-        x_scrollbar = tk.Scrollbar(frame, orient="horizontal")
-        x_scrollbar.pack(side="bottom", fill="x")
-
-        self.text = tk.Text(
+        self.table = ttk.Treeview(
             frame,
-            wrap="none",
+            columns=("fecha", "dominio", "error"),
+            show="headings",
             yscrollcommand=y_scrollbar.set,
-            xscrollcommand=x_scrollbar.set
         )
-        self.text.pack(side="left", fill="both", expand=True)
+        self.table.heading("fecha", text="Fecha y Hora")
+        self.table.heading("dominio", text="Dominio")
+        self.table.heading("error", text="Error")
+        self.table.column("fecha", width=140, anchor="w")
+        self.table.column("dominio", width=330, anchor="w")
+        self.table.column("error", width=300, anchor="w")
+        self.table.pack(side="left", fill="both", expand=True)
+        y_scrollbar.config(command=self.table.yview)
+
+        # Paging
+        pager = tk.Frame(self)
+        pager.pack(fill=tk.X, padx=10, pady=5)
+
+        latest_button = tk.Button(
+            pager, text="⏮", relief="flat", bd=0, command=self.jump_to_latest)
+        latest_button.pack(side="left", padx=5)
+        Tooltip(latest_button, "Ir a lo más reciente")
+
+        self.prev_button = tk.Button(
+            pager, text="◀", relief="flat", bd=0, command=self.previous_page)
+        self.prev_button.pack(side="left", padx=5)
+        Tooltip(self.prev_button, "Página anterior")
+
+        self.next_button = tk.Button(
+            pager, text="▶", relief="flat", bd=0, command=self.next_page)
+        self.next_button.pack(side="left", padx=5)
+        Tooltip(self.next_button, "Página siguiente")
+
+        self.page_label = tk.Label(pager, text="")
+        self.page_label.pack(side="left", padx=10)
+
+        # Shown only while an export is running
+        self.cancel_button = tk.Button(
+            pager, text="✖", relief="flat", bd=0, command=self.cancel_export)
+        Tooltip(self.cancel_button, "Cancelar exportación")
+        self.progress = ttk.Progressbar(
+            pager, orient="horizontal", length=200, mode="determinate", maximum=100)
 
-        y_scrollbar.config(command=self.text.yview)
-        x_scrollbar.config(command=self.text.xview)
+        self.load_errors()
 
+    def apply_filters(self):
+        """
+        Reads the filter fields and shows the first page of the filtered log.
+        """
+        start = self.start_filter.get().strip() or None
+        end = self.end_filter.get().strip() or None
+        if end and " " not in end:
+            end += " 23:59:59"
+        try:
+            to_timestamp(start)
+            to_timestamp(end)
+        except ValueError:
+            messagebox.showerror(
+                "Error", "Fecha inválida. Usa el formato AAAA-MM-DD.", parent=self)
+            return
+        self.filters = {
+            "domain": self.domain_filter.get().strip() or None,
+            "start": start,
+            "end": end,
+        }
+        self.jump_to_latest()
+
+    def jump_to_latest(self):
+        """
+        Shows the page with the most recent errors.
+        """
+        self.page_cursors = []
         self.load_errors()
 
-    def load_errors(self):
+    def next_page(self):
         """
-        Loads the error log from a JSON file and displays it in the text widget.
-        If the file does not exist or is empty, a message is displayed.
-        The text widget is set to read-only mode after loading the content.
+        Shows the next (older) page of errors.
         """
+        if self.next_cursor is None:
+            return
+        self.page_cursors.append(self.next_cursor)
+        self.load_errors()
 
-        if not os.path.exists("error.json"):
-            self.text.insert("1.0", "No hay errores registrados.")
+    def previous_page(self):
+        """
+        Shows the previous (newer) page of errors.
+        """
+        if not self.page_cursors:
             return
+        self.page_cursors.pop()
+        self.load_errors()
+
+    def load_errors(self):
+        """
+        Loads the current page of the error log and displays it in the table.
+        Only PAGE_SIZE rows are read and inserted; one extra row is requested
+        to know whether there is a next page.
+        If there are no errors, a message is displayed in the page label.
+        """
+        for item in self.table.get_children():
+            self.table.delete(item)
 
+        cursor = self.page_cursors[-1] if self.page_cursors else None
         try:
-            with open("error.json", "r", encoding="utf-8") as f:
-                errors = json.load(f)
-            if not errors:
-                self.text.insert("1.0", "No hay errores registrados.")
-                return
-
-            header = f"{'Fecha y Hora':<22} | {'Dominio':<60} | Error\n"
-            self.text.insert("1.0", header)
-            self.text.insert("2.0", "-" * 120 + "\n")
-
-            for entry in errors:
-                line = f"{entry['fecha']:<22} | {entry['dominio']:<60} | {entry['error']}\n"
-                self.text.insert("end", line)
+            rows = self.store.query(
+                errors_only=True, limit=self.PAGE_SIZE + 1, cursor=cursor, **self.filters)
         except Exception as e:
-            self.text.insert("1.0", f"Error leyendo archivo de errores: {e}")
-        self.text.config(state="disabled")
+            self.page_label.config(text=f"Error leyendo errores: {e}")
+            return
+
+        has_next = len(rows) > self.PAGE_SIZE
+        rows = rows[:self.PAGE_SIZE]
+        for entry in rows:
+            self.table.insert("", tk.END, values=(
+                entry["fecha"], entry["url"], entry["error"]))
+
+        self.next_cursor = (rows[-1]["ts"], rows[-1]["id"]) if has_next else None
+        self.prev_button.config(state="normal" if self.page_cursors else "disabled")
+        self.next_button.config(state="normal" if has_next else "disabled")
+        if not rows:
+            self.page_label.config(text="No hay errores registrados.")
+        else:
+            self.page_label.config(text=f"Página {len(self.page_cursors) + 1}")
 
     def export_to_csv(self):
         """
-        Exports the error log to a CSV file.
-        The CSV file is named "error_log.csv" and is saved in the current directory.
+        Exports the filtered error log to a CSV file, optionally gzip-compressed.
         The user is prompted to choose the save location and file name.
-        If the error log file does not exist or is empty, a warning message is displayed.
+        If no error matches the filters, a warning message is displayed.
         """
-        try:
-            if not os.path.exists("error.json"):
-                messagebox.showwarning(
-                    "Advertencia", "No hay registros para exportar.")
-                return
-
-            filepath = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("Archivos CSV", "*.csv")],
-                title="Guardar como..."
-            )
-            if not filepath:
-                return  # El usuario canceló
-
-            with open("error.json", "r", encoding="utf-8") as f:
-                errors = json.load(f)
-
-            with open(filepath, "w", newline="", encoding="utf-8") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Fecha", "Dominio", "Error"])
-                for entry in errors:
-                    writer.writerow(
-                        [entry["fecha"], entry["dominio"], entry["error"]])
-
-            messagebox.showinfo(
-                "Éxito", f"Archivo CSV exportado correctamente:\n{filepath}")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar a CSV:\n{e}")
+        self.export([("Archivos CSV", "*.csv"), ("CSV comprimido", "*.csv.gz")], ".csv")
 
     def export_to_xls(self):
         """
-        Exports the error log to a XLS file.
-        The XLS file is named "error_log.xls" and is saved in the current directory.
+        Exports the filtered error log to an Excel file (XLSX, or XLS for
+        up to 65,535 entries).
         The user is prompted to choose the save location and file name.
-        If the error log file does not exist or is empty, a warning message is displayed.
+        If no error matches the filters, a warning message is displayed.
         """
-        try:
-            if not os.path.exists("error.json"):
-                messagebox.showwarning(
-                    "Advertencia", "No hay registros para exportar.")
-                return
-
-            filepath = filedialog.asksaveasfilename(
-                defaultextension=".xls",
-                filetypes=[("Archivos Excel 97-2003", "*.xls")],
-                title="Guardar como..."
-            )
-            if not filepath:
-                return  # El usuario canceló
-
-            with open("error.json", "r", encoding="utf-8") as f:
-                errors = json.load(f)
-
-            wb = xlwt.Workbook()
-            ws = wb.add_sheet("Errores")
-
-            ws.write(0, 0, "Fecha")
-            ws.write(0, 1, "Dominio")
-            ws.write(0, 2, "Error")
-
-            for i, entry in enumerate(errors, start=1):
-                ws.write(i, 0, entry["fecha"])
-                ws.write(i, 1, entry["dominio"])
-                ws.write(i, 2, entry["error"])
-
-            wb.save(filepath)
+        self.export([("Libro de Excel", "*.xlsx"), ("Excel 97-2003, hasta 65.535 filas", "*.xls")], ".xlsx")
+
+    def export(self, filetypes, extension):
+        """
+        Starts a background export of the errors matching the current filters.
+        Args:
+            filetypes (list): File types offered in the save dialog.
+            extension (str): Default extension of the file.
+        """
+        if self.export_job and not self.export_job.finished:
+            messagebox.showwarning(
+                "Advertencia", "Ya hay una exportación en curso.", parent=self)
+            return
+
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=extension,
+            filetypes=filetypes,
+            title="Guardar como...",
+            parent=self
+        )
+        if not filepath:
+            return  # El usuario canceló
+
+        self.export_job = ExportJob(self.store, filepath, self.filters)
+        self.export_job.start()
+        self.progress.config(value=0)
+        self.progress.pack(side="right", padx=5)
+        self.cancel_button.pack(side="right")
+        self.poll_export()
+
+    def poll_export(self):
+        """
+        Updates the progress bar from the Tk thread until the export finishes.
+        """
+        job = self.export_job
+        if job.total:
+            self.progress.config(value=min(100, job.done * 100 / job.total))
+            self.page_label.config(text=f"Exportando {job.done:,} de {job.total:,}...")
+
+        if not job.finished:
+            self.after(200, self.poll_export)
+            return
+
+        self.progress.pack_forget()
+        self.cancel_button.pack_forget()
+        self.page_label.config(text=f"Página {len(self.page_cursors) + 1}")
+        if isinstance(job.error, ExportEmpty):
+            messagebox.showwarning(
+                "Advertencia", "No hay registros para exportar.", parent=self)
+        elif isinstance(job.error, ExportCancelled):
+            messagebox.showinfo("Exportación", "Exportación cancelada.", parent=self)
+        elif job.error:
+            messagebox.showerror(
+                "Error", f"No se pudo exportar:\n{job.error}", parent=self)
+        else:
             messagebox.showinfo(
-                "Éxito", f"Archivo XLS exportado correctamente:\n{filepath}")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar a XLS:\n{e}")
+                "Éxito", f"Archivo exportado correctamente:\n{job.filepath}", parent=self)
+
+    def cancel_export(self):
+        """
+        Cancels the export in progress.
+        """
+        if self.export_job:
+            self.export_job.cancel()
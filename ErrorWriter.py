@@ -0,0 +1,144 @@
+import json
+import os
+import queue
+import threading
+import time
+
+ERROR_LOG = "error.jsonl"
+LEGACY_ERROR_LOG = "error.json"
+
+
+def migrate_legacy_log(path=ERROR_LOG, legacy_path=LEGACY_ERROR_LOG):
+    """
+    Moves the entries of an old error.json file into the line-delimited log.
+    The legacy entries are placed before any entry already in the new log and
+    the old file is renamed to <name>.migrated, so the migration runs only once.
+    Args:
+        path (str): Path to the line-delimited error log.
+        legacy_path (str): Path to the old JSON array log.
+    """
+    if not os.path.exists(legacy_path):
+        return
+    try:
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error migrando {legacy_path}: {e}")
+        return
+    if not isinstance(entries, list):
+        entries = []
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for entry in entries:
+            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as current:
+                for line in current:
+                    out.write(line)
+    os.replace(tmp_path, path)
+    os.replace(legacy_path, legacy_path + ".migrated")
+
+
+def iter_errors(path=ERROR_LOG):
+    """
+    Reads the error log one entry at a time.
+    Lines that cannot be decoded (e.g. a line being written) are skipped.
+    Args:
+        path (str): Path to the line-delimited error log.
+    Yields:
+        dict: Entries with fecha, dominio and error.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class ErrorWriter:
+    """
+    Class for appending entries to the error log from many threads.
+    Monitor threads only put entries in a queue; a single writer thread appends
+    them to the line-delimited log in batches, so logging an error costs O(1)
+    and concurrent writers cannot overwrite each other.
+    """
+
+    def __init__(self, path=ERROR_LOG, batch_size=500, flush_interval=1.0):
+        """
+        Initializes the ErrorWriter class, migrating error.json if it exists.
+        Args:
+            path (str): Path to the line-delimited error log.
+            batch_size (int): Maximum entries written per flush.
+            flush_interval (float): Seconds to wait for more entries before flushing.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        migrate_legacy_log(path, os.path.join(
+            os.path.dirname(path), LEGACY_ERROR_LOG))
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, entry):
+        """
+        Queues an entry to be appended to the log.
+        Args:
+            entry (dict): Entry with fecha, dominio and error.
+        """
+        self.queue.put(entry)
+
+    def close(self):
+        """
+        Flushes the pending entries and stops the writer thread.
+        """
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def run(self):
+        """
+        Writer loop: waits for an entry, gathers the ones that arrive during the
+        flush interval and appends the whole batch at once.
+        """
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            closing = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+            self.flush(batch)
+            if closing:
+                return
+
+    def flush(self, batch):
+        """
+        Appends a batch of entries to the log.
+        Args:
+            batch (list): Entries to write.
+        """
+        lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            print(f"Error escribiendo el registro de errores: {e}")
@@ -0,0 +1,208 @@
+import csv
+import gzip
+import os
+import threading
+import xlwt
+from HttpPool import PHASES
+from openpyxl import Workbook
+
+HEADER = ["Fecha", "Dominio", "URL", "Error",
+          "DNS (ms)", "Conexión (ms)", "TLS (ms)", "TTFB (ms)", "Descarga (ms)"]
+CHUNK_SIZE = 5000
+# Entries of an .xls export: one sheet of 65,536 rows, header included.
+XLS_MAX_ROWS = 65535
+
+
+class ExportCancelled(Exception):
+    """
+    Raised inside an export when the user cancels it.
+    """
+
+
+class ExportEmpty(Exception):
+    """
+    Raised when no entry matches the filters of an export.
+    """
+
+
+def error_rows(store, filters):
+    """
+    Reads the errors to export lazily, oldest first.
+    Args:
+        store (ResultStore): Store to read the errors from.
+        filters (dict): start, end and domain filters for ResultStore.iter_query.
+    Yields:
+        list: Fecha, Dominio, URL, Error and the latency phases of each entry;
+        phases that were not measured are empty.
+    """
+    for entry in store.iter_query(errors_only=True, newest_first=False, **filters):
+        yield ([entry["fecha"], entry["dominio"], entry["url"], entry["error"]]
+               + ["" if entry[phase] is None else entry[phase] for phase in PHASES])
+
+
+def chunks(rows, size=CHUNK_SIZE):
+    """
+    Groups rows in lists of a fixed size.
+    Args:
+        rows (iterable): Rows to group.
+        size (int): Rows per chunk.
+    Yields:
+        list: Up to size rows.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_csv(rows, filepath, progress):
+    """
+    Writes the rows to a CSV file, gzip-compressed if the name ends in ".gz".
+    Args:
+        rows (iterable): Rows to write.
+        filepath (str): Destination file.
+        progress (callable): Called with the number of rows written after each chunk.
+    """
+    opener = gzip.open if filepath.endswith(".gz") else open
+    with opener(filepath, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        written = 0
+        for chunk in chunks(rows):
+            writer.writerows(chunk)
+            written += len(chunk)
+            progress(written)
+
+
+def export_xlsx(rows, filepath, progress):
+    """
+    Writes the rows to an XLSX file using openpyxl's write-only mode,
+    which streams rows to disk instead of keeping the sheet in memory.
+    Args:
+        rows (iterable): Rows to write.
+        filepath (str): Destination file.
+        progress (callable): Called with the number of rows written after each chunk.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Errores")
+    ws.append(HEADER)
+    written = 0
+    for chunk in chunks(rows):
+        for row in chunk:
+            ws.append(row)
+        written += len(chunk)
+        progress(written)
+    wb.save(filepath)
+
+
+def export_xls(rows, filepath, progress):
+    """
+    Writes the rows to an Excel 97-2003 file.
+    xlwt keeps the whole workbook in memory until it is saved, so this format
+    is limited to a single sheet of XLS_MAX_ROWS entries; ExportJob refuses
+    larger exports before writing anything.
+    Args:
+        rows (iterable): Rows to write.
+        filepath (str): Destination file.
+        progress (callable): Called with the number of rows written after each chunk.
+    """
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet("Errores")
+    for col, value in enumerate(HEADER):
+        ws.write(0, col, value)
+    written = 0
+    for chunk in chunks(rows):
+        for row in chunk:
+            written += 1
+            for col, value in enumerate(row):
+                ws.write(written, col, value)
+        progress(written)
+    wb.save(filepath)
+
+
+EXPORTERS = {
+    ".csv": export_csv,
+    ".gz": export_csv,
+    ".xlsx": export_xlsx,
+    ".xls": export_xls,
+}
+
+
+class ExportJob:
+    """
+    Class for running an export in a background thread.
+    The Tk thread polls done/total/finished/error to show the progress, since
+    widgets must not be touched from the worker thread.
+    """
+
+    def __init__(self, store, filepath, filters=None):
+        """
+        Initializes the ExportJob class.
+        Args:
+            store (ResultStore): Store to read the errors from.
+            filepath (str): Destination file; its extension selects the format.
+            filters (dict): start, end and domain filters.
+        """
+        self.store = store
+        self.filepath = filepath
+        self.filters = filters or {}
+        self.exporter = EXPORTERS.get(
+            "." + filepath.rsplit(".", 1)[-1].lower(), export_csv)
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.finished = False
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """
+        Starts the export thread.
+        """
+        self.thread.start()
+
+    def cancel(self):
+        """
+        Asks the export to stop after the current chunk.
+        """
+        self.cancel_event.set()
+
+    def progress(self, written):
+        """
+        Stores the rows written so far, stopping the export if it was cancelled.
+        Args:
+            written (int): Rows written.
+        """
+        self.done = written
+        if self.cancel_event.is_set():
+            raise ExportCancelled()
+
+    def run(self):
+        """
+        Counts the rows to export and writes them with the selected exporter.
+        """
+        writing = False
+        try:
+            self.total = self.store.count(errors_only=True, **self.filters)
+            if not self.total:
+                raise ExportEmpty()
+            if self.exporter is export_xls and self.total > XLS_MAX_ROWS:
+                raise ValueError(
+                    f"El formato .xls admite hasta {XLS_MAX_ROWS:,} registros y hay "
+                    f"{self.total:,}. Usa .xlsx o .csv.gz.")
+            writing = True
+            self.exporter(error_rows(self.store, self.filters), self.filepath, self.progress)
+        except Exception as e:
+            self.error = e
+            if writing:
+                # A cancelled or failed export leaves no partial file behind.
+                try:
+                    os.remove(self.filepath)
+                except OSError:
+                    pass
+        finally:
+            self.finished = True
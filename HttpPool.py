@@ -0,0 +1,381 @@
+import requests
+import socket
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from urllib3 import PoolManager
+from urllib3.connection import HTTPSConnection
+from urllib3.exceptions import NewConnectionError
+from DnsCache import dns_cache
+
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:
+    # urllib3 1.26 has no NameResolutionError and reports failed lookups
+    # as a NewConnectionError, which requests turns into a ConnectionError.
+    def NameResolutionError(host, conn, reason):
+        return NewConnectionError(conn, f"Failed to resolve '{host}' ({reason})")
+
+# Latency phases of a check, in the order they happen.
+PHASES = ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "download_ms")
+
+# The PhaseTimer of the request running in each thread.
+_local = threading.local()
+
+
+class PhaseTimer:
+    """
+    Per-phase latency of one check: DNS lookup, TCP connect, TLS handshake,
+    time to first byte and body download. The connection phases are recorded by
+    the connections themselves and stay at zero when a pooled connection is
+    reused; TTFB is whatever remains between the request start and the headers.
+    """
+
+    def __init__(self):
+        """
+        Initializes a PhaseTimer starting now.
+        """
+        self.started = time.perf_counter()
+        self.dns = 0.0
+        self.connect = 0.0
+        self.tls = 0.0
+        self.headers_at = None
+        self.done_at = None
+        self.excluded = 0.0
+
+    def add(self, phase, seconds):
+        """
+        Adds time to a connection phase.
+        Args:
+            phase (str): "dns", "connect" or "tls".
+            seconds (float): Time spent.
+        """
+        setattr(self, phase, getattr(self, phase) + max(0.0, seconds))
+
+    def headers_received(self):
+        """
+        Marks the end of the TTFB phase.
+        """
+        self.headers_at = time.perf_counter()
+
+    def body_read(self, excluded=0.0):
+        """
+        Marks the end of the download phase.
+        Args:
+            excluded (float): Seconds spent processing the body while it was
+                read, which are not part of the download.
+        """
+        self.done_at = time.perf_counter()
+        self.excluded = excluded
+
+    def as_dict(self, tls=True):
+        """
+        Returns the phases in milliseconds.
+        Args:
+            tls (bool): False when the TLS handshake is included in connect_ms
+                and cannot be told apart.
+        Returns:
+            dict: One value per name in PHASES; download_ms is 0 if no body was read.
+        """
+        headers_at = self.headers_at or time.perf_counter()
+        ttfb = headers_at - self.started - self.dns - self.connect - self.tls
+        download = self.done_at - headers_at - self.excluded if self.done_at else 0.0
+        return {
+            "dns_ms": int(self.dns * 1000),
+            "connect_ms": int(self.connect * 1000),
+            "tls_ms": int(self.tls * 1000) if tls else None,
+            "ttfb_ms": int(max(0.0, ttfb) * 1000),
+            "download_ms": int(max(0.0, download) * 1000),
+        }
+
+
+def start_phases():
+    """
+    Starts a PhaseTimer for the request about to run in this thread.
+    Returns:
+        PhaseTimer: The new timer.
+    """
+    _local.timer = PhaseTimer()
+    return _local.timer
+
+
+def current_phases():
+    """
+    Returns the PhaseTimer of the request running in this thread, or None.
+    """
+    return getattr(_local, "timer", None)
+
+
+def time_connection(conn):
+    """
+    Makes a urllib3 connection record its DNS, TCP and TLS time in the
+    PhaseTimer of the current thread.
+    The host is resolved through the shared DnsCache and the socket is opened
+    to each address in turn, so the lookup and the TCP connect are timed
+    separately; the TLS time is the rest of connect(). A failed lookup raises
+    the same error as urllib3 would.
+    Args:
+        conn (urllib3.connection.HTTPConnection): A new, unconnected connection.
+    """
+    new_socket = conn._new_conn
+    connect = conn.connect
+
+    def timed_new_conn():
+        timer = current_phases()
+        host = conn._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = dns_cache.resolve(host)
+        except socket.gaierror as e:
+            if timer is not None:
+                timer.add("dns", time.perf_counter() - start)
+            raise NameResolutionError(conn.host, conn, e) from e
+        resolved = time.perf_counter()
+        try:
+            for i, (_, address) in enumerate(addresses):
+                conn._dns_host = address
+                try:
+                    return new_socket()
+                except NewConnectionError:
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            conn._dns_host = host
+            if timer is not None:
+                timer.add("dns", resolved - start)
+                timer.add("connect", time.perf_counter() - resolved)
+
+    def timed_connect():
+        timer = current_phases()
+        if timer is None:
+            return connect()
+        before = timer.dns + timer.connect
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            socket_time = timer.dns + timer.connect - before
+            timer.add("tls", time.perf_counter() - start - socket_time)
+
+    conn._new_conn = timed_new_conn
+    if isinstance(conn, HTTPSConnection):
+        conn.connect = timed_connect
+
+
+class PoolStats:
+    """
+    Thread-safe counters of requests sent and connections opened.
+    A request that did not need a new connection was served from the pool.
+    """
+
+    def __init__(self):
+        """
+        Initializes the PoolStats class with every counter at zero.
+        """
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def count_request(self):
+        """
+        Counts one request sent.
+        """
+        with self.lock:
+            self.requests += 1
+
+    def count_new_connection(self):
+        """
+        Counts one new TCP connection opened.
+        """
+        with self.lock:
+            self.new_connections += 1
+
+    def snapshot(self):
+        """
+        Returns the current counters.
+        Returns:
+            dict: requests, new_connections and pool_hits.
+        """
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "pool_hits": max(0, self.requests - self.new_connections),
+            }
+
+
+class CountingPoolManager(PoolManager):
+    """
+    urllib3 PoolManager that reports every new connection to a PoolStats
+    and times its connection phases.
+    """
+
+    def __init__(self, stats, *args, **kwargs):
+        """
+        Args:
+            stats (PoolStats): Counters to report new connections to.
+        """
+        self.stats = stats
+        super().__init__(*args, **kwargs)
+
+    def _new_pool(self, *args, **kwargs):
+        """
+        Creates a connection pool whose new connections are counted and timed.
+        """
+        pool = super()._new_pool(*args, **kwargs)
+        new_conn = pool._new_conn
+
+        def counting_new_conn():
+            self.stats.count_new_connection()
+            conn = new_conn()
+            time_connection(conn)
+            return conn
+
+        pool._new_conn = counting_new_conn
+        return pool
+
+
+class CountingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that uses a CountingPoolManager.
+    """
+
+    def __init__(self, stats, **kwargs):
+        """
+        Args:
+            stats (PoolStats): Counters to report new connections to.
+        """
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        """
+        Same as HTTPAdapter.init_poolmanager, using a CountingPoolManager.
+        """
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = CountingPoolManager(
+            self.stats, num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+
+class SessionPool:
+    """
+    Class for sharing keep-alive HTTP sessions across checks.
+    One requests.Session is kept per host, so the root page and every child
+    page of a domain reuse the same TCP/TLS connections instead of doing a new
+    handshake per URL. Sessions idle for longer than max_idle are closed.
+    """
+
+    def __init__(self, pool_size=10, max_idle=300):
+        """
+        Initializes the SessionPool class.
+        Args:
+            pool_size (int): Connections kept alive per host.
+            max_idle (int): Seconds a session may stay unused before it is closed.
+        """
+        self.pool_size = pool_size
+        self.max_idle = max_idle
+        self.stats = PoolStats()
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.last_sweep = time.monotonic()
+
+    def configure(self, pool_size, max_idle):
+        """
+        Applies new pool settings. Existing sessions are closed and recreated lazily.
+        Args:
+            pool_size (int): Connections kept alive per host.
+            max_idle (int): Seconds a session may stay unused before it is closed.
+        """
+        with self.lock:
+            if (pool_size, max_idle) == (self.pool_size, self.max_idle):
+                return
+            self.pool_size = pool_size
+            self.max_idle = max_idle
+            sessions = [session for session, _ in self.sessions.values()]
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def session_for(self, url):
+        """
+        Returns the session of the host of a URL, creating it if needed.
+        Args:
+            url (str): Any URL of the host.
+        """
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc.lower())
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            # Sweeping idle sessions on every request would be O(hosts).
+            if now - self.last_sweep > 10:
+                self.last_sweep = now
+                for other, (session, last_used) in list(self.sessions.items()):
+                    if other != key and now - last_used > self.max_idle:
+                        expired.append(session)
+                        del self.sessions[other]
+
+            entry = self.sessions.get(key)
+            if entry is None:
+                session = requests.Session()
+                adapter = CountingAdapter(
+                    self.stats, pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+            else:
+                session = entry[0]
+            self.sessions[key] = (session, now)
+
+        for session_to_close in expired:
+            session_to_close.close()
+        return session
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request through the pooled session of the host.
+        Accepts the same keyword arguments as requests.request. The returned
+        response carries its PhaseTimer as response.phases; callers reading a
+        streamed body call response.phases.body_read() when they are done.
+        Args:
+            method (str): HTTP method.
+            url (str): The URL to request.
+        """
+        self.stats.count_request()
+        timer = start_phases()
+        response = self.session_for(url).request(method, url, **kwargs)
+        timer.headers_received()
+        response.phases = timer
+        return response
+
+    def get(self, url, **kwargs):
+        """
+        Sends a GET request through the pooled session of the host.
+        Args:
+            url (str): The URL to request.
+        """
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        """
+        Sends a HEAD request through the pooled session of the host.
+        Args:
+            url (str): The URL to request.
+        """
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        """
+        Closes every pooled session.
+        """
+        with self.lock:
+            sessions = [session for session, _ in self.sessions.values()]
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+# Shared by the monitor and the update checker.
+session_pool = SessionPool()
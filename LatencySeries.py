@@ -0,0 +1,310 @@
+import math
+import threading
+import time
+from array import array
+
+# Raw samples kept per URL, and size of the minute and hour rollup rings.
+RAW_SAMPLES = 64
+MINUTES = 60
+HOURS = 24
+# Log-scale latency histogram of the hour buckets: bin i holds latencies up to
+# BIN_RATIO ** (i + 1) ms, the last bin everything slower (about 60 s and up).
+BINS = 24
+BIN_RATIO = 1.61
+EMPTY_BINS = array("H", [0]) * BINS
+
+
+def latency_bin(tiempo_ms):
+    """
+    Returns the histogram bin of a latency.
+    Args:
+        tiempo_ms (int): Latency in milliseconds.
+    """
+    if tiempo_ms < 1:
+        return 0
+    return min(BINS - 1, int(math.log(tiempo_ms) / math.log(BIN_RATIO)))
+
+
+def is_available(status):
+    """
+    Whether a status counts as available: any 2xx or 3xx response.
+    Args:
+        status (int): The HTTP status code, or 0 if the request failed.
+    """
+    return 200 <= status < 400
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of a sorted list.
+    Args:
+        values (list): Sorted values.
+        q (float): Percentile, from 0 to 100.
+    """
+    if not values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[rank - 1]
+
+
+class LatencySeries:
+    """
+    Compact in-memory latency history of every checked URL.
+    Each URL owns a fixed slot in a few shared typed arrays: a ring with its last
+    raw samples (timestamp, latency, status), a ring of 1-minute buckets for the
+    last hour and a ring of 1-hour buckets, with a small latency histogram, for
+    the last day. No Python object is created per sample, and memory per URL is
+    bounded (about 2.5 KB) however long the monitor runs. The slots of URLs no
+    longer checked are freed with retain() and discard() and given to new URLs.
+    """
+
+    def __init__(self, samples=RAW_SAMPLES, clock=time.time):
+        """
+        Initializes an empty LatencySeries.
+        Args:
+            samples (int): Raw samples kept per URL.
+            clock (callable): Wall clock, in seconds.
+        """
+        self.samples = max(1, int(samples))
+        self.clock = clock
+        self.slots = {}
+        # Freed slots, reused before the arrays grow
+        self.free = []
+        self.lock = threading.Lock()
+        # Raw ring: next position and samples written, per slot
+        self.raw_next = array("I")
+        self.raw_total = array("I")
+        self.raw_ts = array("I")
+        self.raw_ms = array("I")
+        self.raw_status = array("H")
+        # Minute and hour rings: bucket start, checks and available checks
+        self.minute_start = array("I")
+        self.minute_count = array("H")
+        self.minute_ok = array("H")
+        self.hour_start = array("I")
+        self.hour_count = array("H")
+        self.hour_ok = array("H")
+        self.hour_bins = array("H")
+
+    def arrays(self):
+        """
+        Returns the typed arrays with the size of one slot in each.
+        """
+        return ((self.raw_next, 1), (self.raw_total, 1),
+                (self.raw_ts, self.samples), (self.raw_ms, self.samples),
+                (self.raw_status, self.samples),
+                (self.minute_start, MINUTES), (self.minute_count, MINUTES),
+                (self.minute_ok, MINUTES),
+                (self.hour_start, HOURS), (self.hour_count, HOURS),
+                (self.hour_ok, HOURS), (self.hour_bins, HOURS * BINS))
+
+    def slot(self, url):
+        """
+        Returns the slot of a URL. A new URL takes a freed slot, cleared, or
+        grows the arrays when there is none. Must be called with the lock held.
+        Args:
+            url (str): The checked URL.
+        """
+        slot = self.slots.get(url)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+                for values, size in self.arrays():
+                    values[slot * size:(slot + 1) * size] = array(
+                        values.typecode, bytes(size * values.itemsize))
+            else:
+                slot = len(self.raw_next)
+                for values, size in self.arrays():
+                    values.frombytes(bytes(size * values.itemsize))
+            self.slots[url] = slot
+        return slot
+
+    def discard(self, urls):
+        """
+        Frees the slots of URLs that are no longer checked.
+        Args:
+            urls (iterable): The URLs.
+        """
+        with self.lock:
+            for url in urls:
+                slot = self.slots.pop(url, None)
+                if slot is not None:
+                    self.free.append(slot)
+
+    def retain(self, domains):
+        """
+        Frees the slots of every URL outside the monitored domains. The URL of
+        a domain and the URLs of the pages under it are kept.
+        Args:
+            domains (iterable): The URLs of the domains still being monitored.
+        """
+        bases = {domain.rstrip("/") for domain in domains}
+
+        def kept(url):
+            if url.rstrip("/") in bases:
+                return True
+            position = url.find("/", url.find("//") + 2)
+            while position != -1:
+                if url[:position] in bases:
+                    return True
+                position = url.find("/", position + 1)
+            return False
+
+        with self.lock:
+            dropped = [url for url in self.slots if not kept(url)]
+        self.discard(dropped)
+
+    def record(self, url, tiempo_ms, status, ts=None):
+        """
+        Adds a check result to the history of a URL.
+        Args:
+            url (str): The checked URL.
+            tiempo_ms (int): Latency in milliseconds, or None if the request failed.
+            status (int): The HTTP status code, or None if the request failed.
+            ts (int): Unix time of the check; now when omitted.
+        """
+        ts = int(self.clock() if ts is None else ts)
+        status = int(status or 0)
+        ms = min(int(tiempo_ms or 0), 0xFFFFFFFF)
+        ok = is_available(status)
+        with self.lock:
+            slot = self.slot(url)
+            position = slot * self.samples + self.raw_next[slot]
+            self.raw_ts[position] = ts
+            self.raw_ms[position] = ms
+            self.raw_status[position] = status
+            self.raw_next[slot] = (self.raw_next[slot] + 1) % self.samples
+            self.raw_total[slot] += 1
+
+            minute = ts - ts % 60
+            index = slot * MINUTES + (ts // 60) % MINUTES
+            if self.minute_start[index] != minute:
+                self.minute_start[index] = minute
+                self.minute_count[index] = 0
+                self.minute_ok[index] = 0
+            self.minute_count[index] = min(self.minute_count[index] + 1, 0xFFFF)
+            self.minute_ok[index] = min(self.minute_ok[index] + ok, 0xFFFF)
+
+            hour = ts - ts % 3600
+            index = slot * HOURS + (ts // 3600) % HOURS
+            bins = index * BINS
+            if self.hour_start[index] != hour:
+                self.hour_start[index] = hour
+                self.hour_count[index] = 0
+                self.hour_ok[index] = 0
+                self.hour_bins[bins:bins + BINS] = EMPTY_BINS
+            self.hour_count[index] = min(self.hour_count[index] + 1, 0xFFFF)
+            self.hour_ok[index] = min(self.hour_ok[index] + ok, 0xFFFF)
+            if status:
+                position = bins + latency_bin(ms)
+                self.hour_bins[position] = min(self.hour_bins[position] + 1, 0xFFFF)
+
+    def raw_samples(self, slot, since):
+        """
+        Returns the raw samples of a slot taken at or after since.
+        Must be called with the lock held.
+        Returns:
+            tuple: (samples as (ts, ms, status) tuples, whether the ring covers since)
+        """
+        filled = min(self.raw_total[slot], self.samples)
+        base = slot * self.samples
+        result = []
+        covered = self.raw_total[slot] <= self.samples
+        for i in range(filled):
+            position = base + (self.raw_next[slot] - 1 - i) % self.samples
+            ts = self.raw_ts[position]
+            if ts < since:
+                covered = True
+                break
+            result.append((ts, self.raw_ms[position], self.raw_status[position]))
+        return result, covered
+
+    def stats(self, url, window=3600):
+        """
+        Computes the latency percentiles and the availability of a URL.
+        Percentiles are exact while the raw ring covers the window and come from
+        the hour histograms otherwise. Availability comes from the minute buckets
+        for windows up to an hour and from the hour buckets for longer ones.
+        Args:
+            url (str): The checked URL.
+            window (int): Seconds back from now.
+        Returns:
+            dict: checks, availability (%), p50, p95 and p99 (ms), or None if the
+            URL has no checks in the window.
+        """
+        now = int(self.clock())
+        since = now - window
+        with self.lock:
+            slot = self.slots.get(url)
+            if slot is None:
+                return None
+            samples, covered = self.raw_samples(slot, since)
+            if window <= MINUTES * 60:
+                count, ok = self.bucket_totals(
+                    slot, since, MINUTES, 60, self.minute_start, self.minute_count, self.minute_ok)
+            else:
+                count, ok = self.bucket_totals(
+                    slot, since, HOURS, 3600, self.hour_start, self.hour_count, self.hour_ok)
+            if covered:
+                latencies = sorted(ms for _, ms, status in samples if status)
+                p50, p95, p99 = (percentile(latencies, q) for q in (50, 95, 99))
+            else:
+                p50, p95, p99 = self.histogram_percentiles(slot, since, (50, 95, 99))
+        if not count:
+            return None
+        return {
+            "checks": count,
+            "availability": round(100 * ok / count, 2),
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+        }
+
+    def bucket_totals(self, slot, since, size, seconds, starts, counts, oks):
+        """
+        Sums the checks of the buckets of a slot that overlap the window.
+        Must be called with the lock held.
+        Returns:
+            tuple: (checks, available checks)
+        """
+        count = ok = 0
+        for index in range(slot * size, (slot + 1) * size):
+            if counts[index] and starts[index] + seconds > since:
+                count += counts[index]
+                ok += oks[index]
+        return count, ok
+
+    def histogram_percentiles(self, slot, since, quantiles):
+        """
+        Approximates percentiles from the hour histograms overlapping the window.
+        Each one is reported as the upper edge of its bin. Must be called with the lock held.
+        Returns:
+            list: One latency in ms, or None, per quantile.
+        """
+        totals = [0] * BINS
+        for index in range(slot * HOURS, (slot + 1) * HOURS):
+            if self.hour_count[index] and self.hour_start[index] + 3600 > since:
+                bins = index * BINS
+                for i in range(BINS):
+                    totals[i] += self.hour_bins[bins + i]
+        count = sum(totals)
+        result = []
+        for q in quantiles:
+            if not count:
+                result.append(None)
+                continue
+            rank = max(1, math.ceil(q / 100 * count))
+            seen = 0
+            for i, n in enumerate(totals):
+                seen += n
+                if seen >= rank:
+                    result.append(int(BIN_RATIO ** (i + 1)))
+                    break
+        return result
+
+    def memory(self):
+        """
+        Returns the bytes used by the typed arrays.
+        """
+        with self.lock:
+            return sum(values.itemsize * len(values) for values, _ in self.arrays())
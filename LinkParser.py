@@ -0,0 +1,303 @@
+import codecs
+import hashlib
+import threading
+import time
+from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from UrlCanonicalizer import canonicalizer
+
+
+def extract_child_paths(html, url):
+    """
+    Extracts the internal paths linked from a page, in canonical form.
+    Links to other sites, mailto/tel links and the page itself are skipped.
+    Args:
+        html (str): The HTML of the page.
+        url (str): The URL of the page.
+    Returns:
+        list: The paths found, in document order and without duplicates.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return filter_hrefs((link["href"] for link in soup.find_all("a", href=True)), url)
+
+
+class LinkExtractor(HTMLParser):
+    """
+    Event-based HTML parser that only collects the href of <a> tags.
+    Unlike BeautifulSoup it never builds a document tree, so it can be fed
+    the page incrementally and its memory use does not grow with the page.
+    """
+
+    def __init__(self):
+        """
+        Initializes the LinkExtractor class.
+        """
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        """
+        Stores the href of every <a> tag found.
+        Args:
+            tag (str): Name of the tag, in lowercase.
+            attrs (list): (name, value) pairs of the tag attributes.
+        """
+        if tag != "a":
+            return
+        href = None
+        for name, value in attrs:
+            if name == "href":
+                href = value or ""
+        if href is not None:
+            self.hrefs.append(href)
+
+
+class LinkScan:
+    """
+    Reads the links of a page while its body is being read.
+    Each chunk is added to the fingerprint of the body. A deferred scan keeps
+    the chunks, up to max_bytes, and parses them only when paths() is called,
+    so a page whose fingerprint is already known is never parsed; otherwise
+    the stream parser takes each chunk as it arrives and the body is not
+    kept. The soup parser needs the whole document and always keeps it. The
+    time spent while the body is read is kept in seconds, so it can be told
+    apart from the download itself.
+    """
+
+    def __init__(self, url, encoding=None, parser="stream", max_bytes=None, page_url=None,
+                 deferred=False):
+        """
+        Initializes the LinkScan class.
+        Args:
+            url (str): The URL of the monitored domain.
+            encoding (str): Encoding of the body; may also be set before the
+                first chunk, once the response headers are known. UTF-8 if None.
+            parser (str): "stream" for LinkExtractor or "soup" for BeautifulSoup.
+            max_bytes (int): Maximum number of bytes parsed, or None for no limit.
+            page_url (str): The URL of the page, when it is not the root page.
+            deferred (bool): Whether to keep the body and parse it in paths().
+        """
+        self.url = url
+        self.encoding = encoding
+        self.parser = parser
+        self.max_bytes = max_bytes
+        self.page_url = page_url
+        self.digest = hashlib.blake2b(digest_size=16)
+        self.extractor = LinkExtractor() if parser != "soup" and not deferred else None
+        self.decoder = None
+        self.chunks = []
+        self.read = 0
+        self.seconds = 0.0
+
+    def feed(self, chunk):
+        """
+        Adds the next chunk of the body.
+        Args:
+            chunk (bytes): The chunk.
+        """
+        start = time.perf_counter()
+        if self.max_bytes is not None:
+            chunk = chunk[:max(0, self.max_bytes - self.read)]
+        self.read += len(chunk)
+        self.digest.update(chunk)
+        if self.extractor is None:
+            self.chunks.append(chunk)
+        else:
+            self.parse(chunk)
+        self.seconds += time.perf_counter() - start
+
+    def parse(self, chunk):
+        """
+        Feeds a chunk to the LinkExtractor.
+        Args:
+            chunk (bytes): The chunk.
+        """
+        if self.decoder is None:
+            self.decoder = incremental_decoder(self.encoding or "utf-8")
+        self.extractor.feed(self.decoder.decode(chunk))
+
+    def fingerprint(self):
+        """
+        Returns the fingerprint of the body fed so far.
+        """
+        return self.digest.digest()
+
+    def paths(self):
+        """
+        Finishes the parse and returns the internal paths found.
+        Returns:
+            list: The paths, in document order and without duplicates.
+        """
+        chunks, self.chunks = self.chunks, []
+        if self.parser == "soup":
+            body = b"".join(chunks)
+            try:
+                html = body.decode(self.encoding or "utf-8", "replace")
+            except LookupError:
+                html = body.decode("utf-8", "replace")
+            return extract_child_paths(html, self.url)
+        if self.extractor is None:
+            self.extractor = LinkExtractor()
+            for chunk in chunks:
+                self.parse(chunk)
+        if self.decoder is not None:
+            self.extractor.feed(self.decoder.decode(b"", final=True))
+        self.extractor.close()
+        return filter_hrefs(self.extractor.hrefs, self.url, self.page_url)
+
+
+def incremental_decoder(encoding):
+    """
+    Returns an incremental decoder for an encoding, UTF-8 if it is unknown.
+    Args:
+        encoding (str): Name of the encoding.
+    """
+    try:
+        return codecs.getincrementaldecoder(encoding)("replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")("replace")
+
+
+def stream_child_paths(chunks, url, encoding="utf-8", max_bytes=None, page_url=None):
+    """
+    Extracts the internal paths of a page fed as a stream of byte chunks.
+    Parsing stops once max_bytes have been read. The result follows the same
+    rules as extract_child_paths.
+    Args:
+        chunks (iterable): The body of the page as byte chunks.
+        url (str): The URL of the monitored domain.
+        encoding (str): Encoding of the body.
+        max_bytes (int): Maximum number of bytes to parse, or None for no limit.
+        page_url (str): The URL of the page, when it is not the root page.
+    Returns:
+        list: The paths found, in document order and without duplicates.
+    """
+    scan = LinkScan(url, encoding, max_bytes=max_bytes, page_url=page_url)
+    for chunk in chunks:
+        scan.feed(chunk)
+        if max_bytes is not None and scan.read >= max_bytes:
+            break
+    return scan.paths()
+
+
+def filter_hrefs(hrefs, url, page_url=None):
+    """
+    Applies the monitor rules to a sequence of href values.
+    Every link is reduced to its canonical form, so its variants (case, default
+    port, trailing slash, dot segments, "www.", fragments, query parameters
+    that are not allowed) are kept once. Links to other sites, mailto/tel links
+    and the root page itself are skipped.
+    Args:
+        hrefs (iterable): Raw href attribute values.
+        url (str): The URL of the monitored domain.
+        page_url (str): The URL of the page the links come from, when it is
+            not the root page; relative links are resolved against it.
+    Returns:
+        list: The internal paths, with their allowed query, in order and
+        without duplicates.
+    """
+    paths = []
+    seen = set()
+    raw_seen = set()
+    links = redundant = 0
+    for href in hrefs:
+        path = canonicalizer.child_path(href, url, page_url)
+        if path is None:
+            continue
+        links += 1
+        if path in seen:
+            # The same href twice was never probed twice; a variant would have been.
+            if href not in raw_seen:
+                redundant += 1
+        else:
+            seen.add(path)
+            paths.append(path)
+        raw_seen.add(href)
+    canonicalizer.count(links, len(paths), redundant)
+    return paths
+
+
+class LinkCache:
+    """
+    Class for skipping the parse of root pages that did not change.
+    For each domain it keeps a fingerprint of the last root body and the paths
+    extracted from it. The body is fingerprinted as it is read, by a deferred
+    LinkScan that keeps it up to the byte cap; when its fingerprint matches,
+    the stored paths are reused and only a changed page is parsed.
+    """
+
+    def __init__(self, parser="stream", max_bytes=None):
+        """
+        Initializes an empty LinkCache.
+        Args:
+            parser (str): "stream" for LinkExtractor or "soup" for BeautifulSoup.
+            max_bytes (int): Maximum number of bytes parsed per page, or None.
+        """
+        self.parser = parser
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, parser, max_bytes):
+        """
+        Changes the parser used on cache misses.
+        Args:
+            parser (str): "stream" for LinkExtractor or "soup" for BeautifulSoup.
+            max_bytes (int): Maximum number of bytes parsed per page, or None.
+        """
+        self.parser = parser
+        self.max_bytes = max_bytes
+
+    def scan(self, url, encoding=None):
+        """
+        Returns a deferred LinkScan to feed the root page of a domain as it is read.
+        Args:
+            url (str): The URL of the page.
+            encoding (str): Encoding of the body, if already known.
+        """
+        return LinkScan(url, encoding, self.parser, self.max_bytes, deferred=True)
+
+    def finish(self, scan):
+        """
+        Returns the internal paths of a root page fed to a LinkScan. If the
+        page did not change, the stored paths are reused and the body is not
+        parsed.
+        Args:
+            scan (LinkScan): The scan of the page, fed to the end of the body.
+        Returns:
+            list: The paths found.
+        """
+        fingerprint = scan.fingerprint()
+        with self.lock:
+            entry = self.entries.get(scan.url)
+            if entry is not None and entry[0] == fingerprint:
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+        paths = scan.paths()
+        with self.lock:
+            self.entries[scan.url] = (fingerprint, tuple(paths))
+        return paths
+
+    def retain(self, urls):
+        """
+        Drops the entries of the domains that are no longer monitored.
+        Args:
+            urls (iterable): The URLs still being monitored.
+        """
+        urls = set(urls)
+        with self.lock:
+            for url in list(self.entries):
+                if url not in urls:
+                    del self.entries[url]
+
+    def snapshot(self):
+        """
+        Returns the cache counters.
+        Returns:
+            dict: hits, misses and cached domains.
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
@@ -0,0 +1,615 @@
+import json
+import requests
+import threading
+import time
+from AsyncEngine import AsyncEngine
+from concurrent.futures import ThreadPoolExecutor, wait
+from CrawlFrontier import Discovery
+from ErrorWriter import ERROR_LOG, ErrorWriter
+from DnsCache import dns_cache
+from HttpPool import session_pool
+from LatencySeries import LatencySeries
+from LinkParser import LinkCache
+from Probe import HEADERS, HostLimiter, ValidatorCache, describe_status, now, probe_child, read_chunks
+from ProbeCache import probe_cache, probe_key
+from ResultStore import ResultStore
+from Scheduler import AdaptiveInterval, Scheduler, adaptive_defaults, merge_schedulers
+from Settings import Settings
+from UrlCanonicalizer import canonicalizer
+
+
+class MonitorEngine:
+    """
+    Probe and crawl engine of the monitor, independent of the GUI.
+    Loads the domains from the configuration file, checks them with the threaded
+    or the async engine, writes the results to the error log and the result store,
+    and reports every row update to its listeners. The Tk DomainMonitor is one of
+    those listeners; the headless mode runs the engine without any.
+    """
+
+    def __init__(self, config_path="config.json", error_path=ERROR_LOG, settings=None):
+        """
+        Initializes the MonitorEngine class.
+        Args:
+            config_path (str): Path to the configuration file containing monitored domains.
+            error_path (str): Path to the line-delimited error log.
+            settings (Settings): Advanced settings; loaded from settings.json when omitted.
+        """
+        self.config_path = config_path
+        self.error_path = error_path
+        self.settings = settings or Settings()
+        self.error_writer, self.store = self.open_outputs(error_path)
+        self.domains = self.load_domains()
+        self.listeners = []
+        self.threads = []
+        self.engine_name = None
+        self.async_engine = None
+        self.shard_pool = None
+        self.coordinator = None
+        self.host_limiter = None
+        self.scheduler = None
+        # Adaptive interval of the domains that enable it, and failures of the running checks
+        self.policies = {}
+        self.failures = {}
+        # Body byte cap of the domains that set their own
+        self.byte_caps = {}
+        self.validators = ValidatorCache()
+        # Bodies are already cut to the byte cap of their domain when read.
+        self.link_cache = LinkCache(self.settings.get("link_parser"))
+        self.discovery = Discovery(self.settings, self.forget_pages)
+        self.latency = LatencySeries(self.settings.get("latency_samples"))
+        # Latency phases of the last check of every URL
+        self.phases = {}
+        # Last color of every (domain, path), used by the summaries
+        self.row_colors = {}
+        self.check_count = 0
+        self.started_at = time.monotonic()
+        self.stop_event = threading.Event()
+
+    def open_outputs(self, error_path):
+        """
+        Opens the error log and the result store the results are written to.
+        Args:
+            error_path (str): Path to the line-delimited error log.
+        Returns:
+            tuple: (ErrorWriter, ResultStore).
+        """
+        # The writer migrates the legacy log, which a new store then imports.
+        error_writer = ErrorWriter(error_path)
+        return error_writer, ResultStore(
+            self.settings.get("store_path"), self.settings.get("store_retention_days"),
+            error_path=error_path)
+
+    def load_domains(self):
+        """
+        Loads the monitored domains from the configuration file.
+        Returns:
+            list: A list of dictionaries containing domain information.
+        """
+        try:
+            with open(self.config_path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error cargando dominios: {e}")
+            return []
+
+    def urls(self):
+        """
+        Returns the URLs of the monitored domains, in configuration order.
+        """
+        return [domain.get("dominio", "Desconocido") for domain in self.domains]
+
+    def add_listener(self, listener):
+        """
+        Registers a function to be called on every row update.
+        Listeners are called from the worker threads and must not block.
+        Args:
+            listener (callable): Receives (url, path, values, color); path is None
+                for the root of the domain.
+        """
+        self.listeners.append(listener)
+
+    def notify(self, url, path, values, color):
+        """
+        Reports a row update to the listeners.
+        Args:
+            url (str): The monitored domain.
+            path (str): The path of the child page, or None for the domain itself.
+            values (tuple): Values for the estado, fecha and tiempo columns.
+            color (str): Color of the row.
+        """
+        self.count_failure(url, path, color)
+        for listener in self.listeners:
+            listener(url, path, values, color)
+
+    def count_failure(self, url, path, color):
+        """
+        Records the color of a row and counts a failure of its domain for the
+        adaptive interval: a failed root check, or a child page that turned
+        red. A page that stays broken does not keep the domain on its failure
+        interval forever.
+        Args:
+            url (str): The monitored domain.
+            path (str): The path of the child page, or None for the domain itself.
+            color (str): Color of the row.
+        """
+        previous = self.row_colors.get((url, path))
+        self.row_colors[(url, path)] = color
+        if color == "red" and (path is None or previous != "red"):
+            self.failures[url] = self.failures.get(url, 0) + 1
+
+    def log_error(self, domain, status_code, reason, ts=None):
+        """
+        Logs errors to the error file.
+        The entry is queued and appended by the writer thread.
+        Args:
+            domain (str): The domain that caused the error.
+            status_code (int): The HTTP status code received.
+            reason (str): The reason for the error.
+            ts (float): Unix time of the check; now when omitted.
+        """
+        self.error_writer.write({
+            "fecha": now(ts),
+            "dominio": domain,
+            "error": f"{status_code} - {reason}"
+        })
+
+    def start(self):
+        """
+        Starts monitoring the domains with the configured engine.
+        Both engines take their work from a central Scheduler: the threaded engine
+        runs each due domain on a bounded pool of worker threads, while the async
+        engine runs it as a coroutine on a single event loop. With processes
+        above 1, the domains are split across worker processes instead, each
+        running its own engine, and their results are reported from here. With
+        a coordinator address, the domains are handed out to RemoteWorkers.
+        """
+        # A fresh event per run, so threads of a previous run cannot miss their stop.
+        self.stop_event = threading.Event()
+        self.engine_name = self.settings.get("engine")
+        if self.settings.get("coordinator"):
+            # Imported here: the workers run a subclass of MonitorEngine.
+            from Coordinator import Coordinator
+            self.scheduler = None
+            self.coordinator = Coordinator(
+                self, self.settings.get("coordinator"), int(self.settings.get("cluster_shards")),
+                self.settings.get("sync_interval"), self.settings.get("worker_timeout"),
+                self.settings.get("cluster_token"))
+            self.coordinator.start()
+            return
+        processes = int(self.settings.get("processes"))
+        if processes > 1:
+            # Imported here: the worker processes run a subclass of MonitorEngine.
+            from ShardPool import ShardPool
+            self.scheduler = None
+            self.shard_pool = ShardPool(self, processes)
+            self.shard_pool.start()
+            return
+
+        self.scheduler = Scheduler(
+            self.settings.get("schedule_jitter"),
+            self.settings.get("schedule_stagger"),
+            self.settings.get("max_checks_per_second"))
+        self.policies = {}
+        self.failures = {}
+        self.byte_caps = {}
+        for domain in self.domains:
+            url = domain.get("dominio", "Desconocido")
+            tiempo = int(domain.get("tiempo", 300))
+            self.scheduler.add(url, tiempo)
+            if domain.get("bytes_max"):
+                self.byte_caps[url] = int(domain["bytes_max"])
+            self.discovery.set_domain(
+                url, domain.get("profundidad"), domain.get("sitemap"),
+                self.max_bytes(url), self.read_seconds(10))
+            if domain.get("adaptativo"):
+                tiempo_max, tiempo_fallo = adaptive_defaults(tiempo)
+                self.policies[url] = AdaptiveInterval(
+                    tiempo,
+                    int(domain.get("tiempo_max", tiempo_max)),
+                    int(domain.get("tiempo_fallo", tiempo_fallo)))
+
+        if canonicalizer.configure(
+                self.settings.get("query_allowlist"), self.settings.get("trailing_slash")):
+            # Paths cached from the root pages were extracted with the old rules.
+            self.link_cache.retain(())
+        dns_cache.configure(
+            self.settings.get("dns_ttl"), self.settings.get("dns_negative_ttl"),
+            self.settings.get("dns_pin"))
+        probe_cache.configure(self.settings.get("probe_cache_ttl"))
+        if self.engine_name == "async":
+            self.async_engine = AsyncEngine(self, self.settings)
+            self.async_engine.start(self.scheduler)
+            return
+
+        self.host_limiter = HostLimiter(
+            self.settings.get("per_host_max_in_flight"))
+        session_pool.configure(
+            self.settings.get("pool_size"), self.settings.get("pool_max_idle"))
+        thread = threading.Thread(
+            target=self.dispatch,
+            args=(self.scheduler, self.stop_event),
+            daemon=True
+        )
+        self.threads.append(thread)
+        thread.start()
+
+    def dispatch(self, scheduler, stop_event):
+        """
+        Dispatcher loop of the threaded engine.
+        Takes due domains from the scheduler only while a worker is free, so a
+        saturated pool shows up as queue depth and schedule lag instead of an
+        unbounded backlog of submitted checks.
+        Args:
+            scheduler (Scheduler): The scheduler of this run.
+            stop_event (threading.Event): Set when the run is stopped.
+        """
+        workers = max(1, int(self.settings.get("scheduler_workers")))
+        free = threading.BoundedSemaphore(workers)
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            while not stop_event.is_set():
+                if not free.acquire(timeout=1):
+                    continue
+                url, wait = scheduler.next_job()
+                if url is None:
+                    free.release()
+                    stop_event.wait(min(wait, 1))
+                    continue
+                pool.submit(self.run_check, scheduler, url, free, stop_event)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def run_check(self, scheduler, url, free, stop_event):
+        """
+        Runs one scheduled check and hands the domain back to the scheduler.
+        Args:
+            scheduler (Scheduler): The scheduler of this run.
+            url (str): The domain to check.
+            free (threading.BoundedSemaphore): Released when the worker is free again.
+            stop_event (threading.Event): Set when the run is stopped.
+        """
+        try:
+            self.check_domain(url, scheduler.intervals[url], stop_event)
+        except Exception as e:
+            print(f"Error revisando {url}: {e}")
+        finally:
+            scheduler.done(url, self.next_interval(url))
+            free.release()
+
+    def next_interval(self, url):
+        """
+        Returns the interval until the next check of a domain that just finished one.
+        Args:
+            url (str): The monitored domain.
+        Returns:
+            float: Seconds from its AdaptiveInterval, or None to keep the
+            configured interval.
+        """
+        healthy = not self.failures.pop(url, 0)
+        policy = self.policies.get(url)
+        return policy.next(healthy) if policy else None
+
+    def max_bytes(self, url):
+        """
+        Returns the maximum number of body bytes read from the pages of a domain.
+        Args:
+            url (str): The monitored domain.
+        Returns:
+            int: Its bytes_max, or the max_root_bytes setting when not set.
+        """
+        return self.byte_caps.get(url, self.settings.get("max_root_bytes"))
+
+    def read_seconds(self, timeout):
+        """
+        Returns the seconds allowed for reading a body.
+        Args:
+            timeout (float): Timeout of the request in seconds.
+        Returns:
+            float: The read_deadline setting, never more than the timeout.
+        """
+        return min(self.settings.get("read_deadline"), timeout)
+
+    def stop(self):
+        """
+        Stops the running engine, whichever it is.
+        """
+        self.stop_event.set()
+        if self.shard_pool:
+            self.shard_pool.stop()
+            self.shard_pool = None
+        if self.coordinator:
+            self.coordinator.stop()
+            self.coordinator = None
+        if self.async_engine:
+            self.async_engine.stop()
+            self.async_engine = None
+
+    def reload(self):
+        """
+        Reloads the settings and the monitored domains.
+        The engine must be stopped before and started again afterwards.
+        """
+        self.threads.clear()
+        self.row_colors.clear()
+        self.settings.load()
+        self.link_cache.configure(self.settings.get("link_parser"), None)
+        self.domains = self.load_domains()
+        self.link_cache.retain(self.urls())
+        self.discovery.retain(self.urls())
+        self.latency.retain(self.urls())
+
+    def forget_pages(self, url, paths):
+        """
+        Frees the latency history of pages no longer linked from a domain.
+        Args:
+            url (str): The monitored domain.
+            paths (list): The paths that left its frontier.
+        """
+        child_urls = [url.rstrip('/') + path for path in paths]
+        self.latency.discard(child_urls)
+        for child_url in child_urls:
+            self.phases.pop(child_url, None)
+
+    def close(self):
+        """
+        Stops monitoring and flushes the pending error log entries and results.
+        Called when the application exits.
+        """
+        self.stop()
+        self.discovery.close()
+        self.error_writer.close()
+        self.store.close()
+
+    def stats(self):
+        """
+        Returns basic counters to compare the throughput of both engines.
+        Returns:
+            dict: Engine name, checks done, checks per second, live threads,
+            connection pool, DNS cache, link cache, URL canonicalization, shared
+            probe, discovery and scheduler counters, and the memory of the latency
+            history; with worker processes, also their counters under "shards",
+            and as a coordinator, the state of its workers under "cluster".
+        """
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        pool_stats = self.async_engine.pool_stats if self.async_engine else session_pool.stats
+        stats = {
+            "engine": self.engine_name,
+            "checks": self.check_count,
+            "checks_per_second": round(self.check_count / elapsed, 2),
+            "threads": threading.active_count(),
+            "pool": pool_stats.snapshot(),
+            "dns": dns_cache.snapshot(),
+            "link_cache": self.link_cache.snapshot(),
+            "canonical": canonicalizer.snapshot(),
+            "probes": probe_cache.snapshot(),
+            "discovery": self.discovery.snapshot(),
+            "scheduler": self.scheduler.snapshot() if self.scheduler else None,
+            "latency_bytes": self.latency.memory(),
+        }
+        if self.shard_pool:
+            # The checks run in the worker processes, each with its own scheduler.
+            stats["shards"] = self.shard_pool.snapshot()
+            stats["scheduler"] = merge_schedulers(
+                worker["scheduler"] for worker in stats["shards"]["workers"] if worker)
+        if self.coordinator:
+            stats["cluster"] = self.coordinator.snapshot()
+            stats["scheduler"] = self.coordinator.scheduler()
+        return stats
+
+    def summary(self):
+        """
+        Summarizes the last known state of every URL.
+        Returns:
+            dict: urls, ok and checks counters, and the list of failing URLs.
+        """
+        rows = list(self.row_colors.items())
+        failing = [url if path is None else url.rstrip('/') + path
+                   for (url, path), color in rows if color == "red"]
+        return {
+            "urls": len(rows),
+            "ok": sum(1 for _, color in rows if color == "green"),
+            "checks": self.check_count,
+            "failing": sorted(failing),
+        }
+
+    def show_root_result(self, url, status, reason, tiempo_ms, phases=None, truncated=False,
+                         ts=None):
+        """
+        Reports the result of a root check and logs it when it failed.
+        Args:
+            url (str): The monitored domain.
+            status (int): The HTTP status code received.
+            reason (str): The reason phrase of the response.
+            tiempo_ms (int): Response time in milliseconds.
+            phases (dict): Latency per phase, as returned by PhaseTimer.as_dict().
+            truncated (bool): Whether the body was cut at the byte cap or the read deadline.
+            ts (float): Unix time of the check; now when omitted. Results
+                reported by worker processes carry the time they were taken.
+        """
+        ts = time.time() if ts is None else ts
+        self.check_count += 1
+        estado, color = describe_status(status, reason, truncated)
+        self.latency.record(url, tiempo_ms, status, ts)
+        self.phases[url] = phases
+        self.notify(url, None, (estado, now(ts), f"{tiempo_ms} ms"), color)
+        if status != 200:
+            self.log_error(url, status, reason, ts)
+        self.store.record(url, url, status, tiempo_ms,
+                          None if status == 200 else f"{status} - {reason}", phases, truncated, ts)
+
+    def show_root_error(self, url, error, ts=None):
+        """
+        Reports a root check that could not be completed and logs it.
+        Args:
+            url (str): The monitored domain.
+            error (str): Description of the error.
+            ts (float): Unix time of the check; now when omitted.
+        """
+        ts = time.time() if ts is None else ts
+        self.check_count += 1
+        self.latency.record(url, None, None, ts)
+        self.phases.pop(url, None)
+        self.notify(url, None, (error, now(ts), "N/A"), "red")
+        self.log_error(url, "Error", error, ts)
+        self.store.record(url, url, None, error=f"Error - {error}", ts=ts)
+
+    def show_child_result(self, url, path, status, reason, tiempo_ms, phases=None, truncated=False,
+                          ts=None):
+        """
+        Reports the result of a child page check.
+        Args:
+            url (str): The monitored domain.
+            path (str): The path of the child page.
+            status (int): The HTTP status code received.
+            reason (str): The reason phrase of the response.
+            tiempo_ms (int): Response time in milliseconds.
+            phases (dict): Latency per phase, as returned by PhaseTimer.as_dict().
+            truncated (bool): Whether the body was cut at the byte cap or the read deadline.
+            ts (float): Unix time of the check; now when omitted.
+        """
+        ts = time.time() if ts is None else ts
+        self.check_count += 1
+        estado, color = describe_status(status, reason, truncated)
+        child_url = url.rstrip('/') + path
+        self.latency.record(child_url, tiempo_ms, status, ts)
+        self.phases[child_url] = phases
+        self.notify(url, path, (estado, now(ts), f"{tiempo_ms} ms"), color)
+        self.store.record(url, child_url, status, tiempo_ms, phases=phases, truncated=truncated,
+                          ts=ts)
+
+    def show_child_error(self, url, path, child_url, error, ts=None):
+        """
+        Reports a child page check that could not be completed and logs it.
+        Args:
+            url (str): The monitored domain.
+            path (str): The path of the child page.
+            child_url (str): The full URL of the child page.
+            error (str): Description of the error.
+            ts (float): Unix time of the check; now when omitted.
+        """
+        ts = time.time() if ts is None else ts
+        self.check_count += 1
+        self.latency.record(child_url, None, None, ts)
+        self.phases.pop(child_url, None)
+        self.notify(url, path, ("Error", now(ts), "N/A"), "red")
+        self.log_error(child_url, "Error", error, ts)
+        self.store.record(url, child_url, None, error=f"Error - {error}", ts=ts)
+
+    def check_children(self, url, paths, tiempo, stop_event):
+        """
+        Checks the child pages of a domain in parallel.
+        A small worker pool per domain fetches the paths, the per-host limiter
+        caps the requests in flight against the origin and the cycle deadline
+        drops whatever could not be started in time.
+        Args:
+            url (str): The monitored domain.
+            paths (list): The paths of the child pages.
+            tiempo (int): The time interval for monitoring the domain.
+            stop_event (threading.Event): Set when the run is stopped.
+        Returns:
+            int: Number of paths checked before the deadline.
+        """
+        if not paths:
+            return 0
+        deadline = time.monotonic() + min(self.settings.get("cycle_deadline"), tiempo)
+        workers = max(1, min(int(self.settings.get("child_workers")), len(paths)))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(self.check_child, url, path, deadline, stop_event)
+                       for path in paths]
+            wait(futures, timeout=max(0, deadline - time.monotonic()))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return sum(1 for future in futures
+                   if not future.cancelled() and future.exception() is None and future.result())
+
+    def check_child(self, url, path, deadline, stop_event):
+        """
+        Checks one child page, unless the cycle deadline has passed.
+        Args:
+            url (str): The monitored domain.
+            path (str): The path of the child page.
+            deadline (float): time.monotonic() value at which the cycle ends.
+            stop_event (threading.Event): Set when the run is stopped.
+        Returns:
+            bool: Whether the page was checked.
+        """
+        child_url = url.rstrip('/') + path
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or stop_event.is_set():
+            return False
+
+        try:
+            # Shared with the other domains linking to the same page.
+            result, ts = probe_cache.probe(
+                probe_key(child_url), lambda: self.probe_limited(url, child_url, deadline), url)
+        except requests.RequestException as e:
+            self.show_child_error(url, path, child_url, str(e))
+            return True
+        if result is None:
+            return False
+        self.show_child_result(url, path, *result, ts=ts)
+        return True
+
+    def probe_limited(self, url, child_url, deadline):
+        """
+        Probes a child page once the per-host limit allows it.
+        Args:
+            url (str): The monitored domain.
+            child_url (str): The URL of the child page.
+            deadline (float): time.monotonic() value at which the cycle ends.
+        Returns:
+            tuple: (status, reason, ms, phases, truncated), or None if the
+            deadline passed while waiting for the host.
+        """
+        remaining = deadline - time.monotonic()
+        semaphore = self.host_limiter.get(child_url)
+        if remaining <= 0 or not semaphore.acquire(timeout=remaining):
+            return None
+        try:
+            timeout = min(10, max(remaining, 1))
+            return probe_child(
+                child_url, timeout, self.settings.get("child_probe"), self.validators,
+                self.max_bytes(url), self.read_seconds(timeout))
+        finally:
+            semaphore.release()
+
+    def check_domain(self, url, tiempo, stop_event):
+        """
+        Checks a domain once: its root page and then its known child pages,
+        the ones linked from the root page and those found by Discovery.
+        Used by the threaded engine when the scheduler finds the domain due.
+        Args:
+            url (str): The domain to check.
+            tiempo (int): The time interval for monitoring the domain.
+            stop_event (threading.Event): Set when the run is stopped.
+        """
+        try:
+            response = session_pool.get(
+                url, timeout=tiempo, headers=HEADERS, stream=True)
+            truncated = False
+            try:
+                status = response.status_code
+                tiempo_ms = int(response.elapsed.total_seconds() * 1000)
+                if status == 200:
+                    # The body is fingerprinted as it arrives and only parsed
+                    # if the page changed since the last check.
+                    scan = self.link_cache.scan(url, response.encoding or "utf-8")
+                    _, truncated = read_chunks(
+                        response, self.max_bytes(url), self.read_seconds(tiempo),
+                        keep=False, consume=scan.feed)
+                    response.phases.body_read(scan.seconds)
+            finally:
+                response.close()
+            self.show_root_result(url, status, response.reason, tiempo_ms,
+                                  response.phases.as_dict(), truncated)
+
+            if status == 200:
+                root_paths = self.link_cache.finish(scan)
+                paths = self.discovery.child_paths(url, root_paths, stop_event)
+                self.discovery.advance(
+                    url, self.check_children(url, paths, tiempo, stop_event))
+
+        except requests.RequestException as e:
+            self.show_root_error(url, str(e))
@@ -0,0 +1,334 @@
+import heapq
+import socket
+import threading
+import time
+from datetime import datetime
+from HttpPool import session_pool
+from urllib.parse import urlparse
+
+HEADERS = {
+    "User-Agent": "US - Monitor de Sitios - v1.1.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+# Status codes returned by servers that do not accept HEAD requests.
+HEAD_REFUSED = (405, 501)
+
+
+def now(ts=None):
+    """
+    Returns the current date and time formatted for the Treeview and the log.
+    Args:
+        ts (float): Unix time to format instead of the current time.
+    """
+    moment = datetime.now() if ts is None else datetime.fromtimestamp(ts)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def describe_status(status, reason, truncated=False):
+    """
+    Translates an HTTP status into the text and color shown in the Treeview.
+    Args:
+        status (int): The HTTP status code received.
+        reason (str): The reason phrase of the response.
+        truncated (bool): Whether the body was cut at the byte cap or the read deadline.
+    Returns:
+        tuple: (estado, color)
+    """
+    if status == 200:
+        return ("Truncado", "yellow") if truncated else ("Ok", "green")
+    if status == 304:
+        return "Sin cambios", "green"
+    return f"{status} {reason}", "red"
+
+
+class ReadWatchdog:
+    """
+    Cuts the body reads that outlive their deadline.
+    iter_content() blocks until a whole chunk has arrived and the socket
+    timeout starts over on every recv, so a body trickling in would outlast
+    both the read deadline and the timeout of the request. One thread keeps
+    the deadline of every read in progress and shuts the connection of an
+    expired one down, which makes its blocked read return at once.
+    """
+
+    def __init__(self):
+        """
+        Initializes the ReadWatchdog class. Its thread starts with the first read.
+        """
+        # (deadline, sequence number, reader), cancelled readers included
+        self.deadlines = []
+        self.active = set()
+        self.sequence = 0
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def watch(self, reader, seconds):
+        """
+        Starts watching a read.
+        Args:
+            reader (BodyReader): The read; its expired flag is set when it is cut.
+            seconds (float): Seconds from now to its deadline.
+        """
+        with self.condition:
+            self.sequence += 1
+            heapq.heappush(self.deadlines, (time.monotonic() + seconds, self.sequence, reader))
+            self.active.add(reader)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="read-watchdog", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def cancel(self, reader):
+        """
+        Stops watching a read that ended before its deadline.
+        Args:
+            reader (BodyReader): The read.
+        """
+        with self.condition:
+            self.active.discard(reader)
+
+    def run(self):
+        """
+        Watchdog loop: cuts every read whose deadline has passed.
+        """
+        with self.condition:
+            while True:
+                while self.deadlines and self.deadlines[0][2] not in self.active:
+                    heapq.heappop(self.deadlines)
+                if not self.deadlines:
+                    self.condition.wait()
+                    continue
+                delay = self.deadlines[0][0] - time.monotonic()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                _, _, reader = heapq.heappop(self.deadlines)
+                self.active.discard(reader)
+                reader.expired = True
+                reader.abort()
+
+
+class BodyReader:
+    """
+    Iterates over the body of a streamed response up to a size cap and a
+    deadline. The deadline holds whatever the chunk size: a read still
+    blocked when it passes is cut by the ReadWatchdog. The truncated flag
+    tells, once the iteration ends, whether the body was read to the end.
+    """
+
+    def __init__(self, response, max_bytes, seconds=None, chunk_size=65536):
+        """
+        Initializes the BodyReader class.
+        Args:
+            response (requests.Response): A response requested with stream=True.
+            max_bytes (int): Maximum number of bytes to read, or None for no cap.
+            seconds (float): Seconds allowed for reading the body, or None for no limit.
+            chunk_size (int): Size of each read.
+        """
+        self.response = response
+        self.max_bytes = float("inf") if max_bytes is None else max_bytes
+        self.seconds = seconds
+        self.chunk_size = chunk_size
+        self.truncated = False
+        self.expired = False
+
+    def __iter__(self):
+        """
+        Yields the body as byte chunks.
+        """
+        if self.seconds is not None:
+            read_watchdog.watch(self, self.seconds)
+        total = 0
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                if total + len(chunk) > self.max_bytes:
+                    chunk = chunk[:self.max_bytes - total]
+                    self.truncated = True
+                total += len(chunk)
+                if chunk:
+                    yield chunk
+                if self.truncated or self.expired:
+                    break
+        except Exception:
+            # Whatever the cut connection raised; a read cut at the deadline
+            # is only truncated.
+            if not self.expired:
+                raise
+        finally:
+            read_watchdog.cancel(self)
+        self.truncated = self.truncated or self.expired
+
+    def abort(self):
+        """
+        Shuts the connection of the response down, ending a blocked read.
+        Called by the ReadWatchdog.
+        """
+        connection = getattr(self.response.raw, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+# Shared by the body reads of every engine and thread.
+read_watchdog = ReadWatchdog()
+
+
+def read_chunks(response, max_bytes, seconds=None, keep=True, chunk_size=65536, consume=None):
+    """
+    Reads the body of a streamed response up to a size cap and a deadline.
+    Args:
+        response (requests.Response): A response requested with stream=True.
+        max_bytes (int): Maximum number of bytes to read.
+        seconds (float): Seconds allowed for reading the body, or None for no limit.
+        keep (bool): Whether to keep the body or only read it.
+        chunk_size (int): Size of each read.
+        consume (callable): Called with each chunk as soon as it is read, so
+            the body can be processed without keeping it.
+    Returns:
+        tuple: (chunks, truncated). chunks is the body as byte chunks, empty if
+        keep is False; truncated is True if the body was not read to the end.
+    """
+    reader = BodyReader(response, max_bytes, seconds, chunk_size)
+    chunks = []
+    for chunk in reader:
+        if keep:
+            chunks.append(chunk)
+        if consume is not None:
+            consume(chunk)
+    return chunks, reader.truncated
+
+
+def probe_child(url, timeout, mode="head", validators=None, max_bytes=None, read_seconds=None):
+    """
+    Checks a child page without downloading its body when possible.
+    In "head" mode a HEAD request is sent, falling back to a streamed GET that
+    is closed right after the headers when the server refuses HEAD. In "get"
+    mode the page is downloaded and discarded, as the monitor originally did,
+    up to max_bytes and the read deadline. Both modes send the cached
+    ETag/Last-Modified so unchanged pages answer 304.
+    Args:
+        url (str): The URL of the child page.
+        timeout (float): Timeout of the request in seconds.
+        mode (str): "head" or "get".
+        validators (ValidatorCache): Cache of ETag/Last-Modified values, optional.
+        max_bytes (int): Maximum number of bytes read in "get" mode, or None for no cap.
+        read_seconds (float): Seconds allowed for reading the body in "get" mode, or None.
+    Returns:
+        tuple: (status, reason, elapsed_ms, phases, truncated), phases being the
+        dict of PhaseTimer.as_dict() for the request that answered and truncated
+        whether the body was cut.
+    """
+    headers = dict(HEADERS)
+    if validators is not None:
+        headers.update(validators.headers_for(url))
+
+    truncated = False
+    if mode == "head":
+        response = session_pool.head(
+            url, timeout=timeout, headers=headers, allow_redirects=True)
+        if response.status_code in HEAD_REFUSED:
+            response = session_pool.get(
+                url, timeout=timeout, headers=headers, stream=True)
+            response.close()
+    else:
+        response = session_pool.get(url, timeout=timeout, headers=headers, stream=True)
+        try:
+            # Read (and discard) the page, timing the download.
+            _, truncated = read_chunks(
+                response, float("inf") if max_bytes is None else max_bytes, read_seconds, keep=False)
+            response.phases.body_read()
+        finally:
+            response.close()
+
+    if validators is not None:
+        validators.update(url, response.status_code, response.headers)
+    return (response.status_code, response.reason,
+            int(response.elapsed.total_seconds() * 1000), response.phases.as_dict(), truncated)
+
+
+class ValidatorCache:
+    """
+    Class for remembering the ETag and Last-Modified values of each URL.
+    They are sent back as If-None-Match / If-Modified-Since on the next check.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty ValidatorCache.
+        """
+        self.validators = {}
+        self.lock = threading.Lock()
+
+    def headers_for(self, url):
+        """
+        Returns the conditional request headers for a URL.
+        Args:
+            url (str): The URL to check.
+        Returns:
+            dict: If-None-Match and/or If-Modified-Since, empty if nothing is cached.
+        """
+        with self.lock:
+            etag, last_modified = self.validators.get(url, (None, None))
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def update(self, url, status, headers):
+        """
+        Stores the validators of a response.
+        Args:
+            url (str): The URL that was checked.
+            status (int): The HTTP status code received.
+            headers (Mapping): The response headers.
+        """
+        if status == 304:
+            return
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        with self.lock:
+            if status == 200 and (etag or last_modified):
+                self.validators[url] = (etag, last_modified)
+            else:
+                self.validators.pop(url, None)
+
+
+class HostLimiter:
+    """
+    Class for capping the number of requests in flight against each host.
+    One semaphore is created lazily per host and shared by every domain that
+    points to it, so a fan-out never hammers a single origin.
+    """
+
+    def __init__(self, max_in_flight, factory=threading.BoundedSemaphore):
+        """
+        Initializes the HostLimiter class.
+        Args:
+            max_in_flight (int): Maximum concurrent requests per host.
+            factory (callable): Semaphore class to use (threading or asyncio).
+        """
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.factory = factory
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Returns the semaphore of the host of a URL.
+        Args:
+            url (str): Any URL of the host.
+        """
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            semaphore = self.semaphores.get(host)
+            if semaphore is None:
+                semaphore = self.factory(self.max_in_flight)
+                self.semaphores[host] = semaphore
+        return semaphore
@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from UrlCanonicalizer import canonicalizer
+
+
+def probe_key(url):
+    """
+    Returns the cache key of a URL: its canonical form, so the variants of a
+    page reached from different domains share one entry.
+    Args:
+        url (str): The probed URL.
+    """
+    return canonicalizer.canonical(url) or url
+
+
+class ProbeCache:
+    """
+    Results of the child probes shared by every monitored domain.
+    A result, or the error of a failed probe, is reused for ttl seconds by the
+    other domains, and a probe still running is awaited instead of sent again,
+    so a page linked from several monitored sites is requested once. A domain
+    never reuses a result of its own: on its next cycle, or the quick retry of
+    a failure, the page is probed again. Reused results come with the time of
+    the probe that produced them. Both engines use it: threads through probe()
+    and coroutines through probe_async().
+    """
+
+    def __init__(self, ttl=10, clock=time.monotonic):
+        """
+        Initializes an empty ProbeCache.
+        Args:
+            ttl (float): Seconds a result is reused; 0 only coalesces probes in flight.
+            clock (callable): Monotonic clock, in seconds.
+        """
+        self.ttl = ttl
+        self.clock = clock
+        # key -> (expires, result, error, owner, Unix time of the probe)
+        self.entries = {}
+        self.pending = {}
+        self.tasks = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.probes = 0
+        self.hits = 0
+        self.coalesced = 0
+        self.last_sweep = clock()
+
+    def configure(self, ttl):
+        """
+        Changes the time results are reused.
+        Args:
+            ttl (float): Seconds a result is reused.
+        """
+        self.ttl = ttl
+
+    def fresh(self, key, owner):
+        """
+        Returns the fresh entry of a key, counting the request. An entry saved
+        by the same owner is not fresh for it. Must be called with the lock held.
+        Args:
+            key: The key of the URL.
+            owner (str): The domain asking.
+        Returns:
+            tuple: (result, error, ts), or None if there is no fresh entry.
+        """
+        self.requests += 1
+        now = self.clock()
+        if now - self.last_sweep > 60:
+            self.last_sweep = now
+            for other in [k for k, entry in self.entries.items() if entry[0] <= now]:
+                del self.entries[other]
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= now or entry[3] == owner:
+            return None
+        self.hits += 1
+        return entry[1], entry[2], entry[4]
+
+    def save(self, key, result, error, owner):
+        """
+        Stores the outcome of a probe. A probe that was not sent (result None
+        and no error) is not stored. Must be called with the lock held.
+        """
+        if result is not None or error is not None:
+            self.entries[key] = (self.clock() + self.ttl, result, error, owner, time.time())
+
+    @staticmethod
+    def unwrap(result, error, ts):
+        """
+        Returns a cached result and its time, or raises its cached error.
+        """
+        if error is not None:
+            raise error
+        return result, ts
+
+    def probe(self, key, probe, owner=None):
+        """
+        Returns the result of a probe, sending it only if no fresh result of
+        another owner and no probe in flight exist for the key.
+        Args:
+            key: The key of the URL, from probe_key().
+            probe (callable): Sends the probe and returns its result, or None if
+                it could not be sent. Its exceptions are cached as results.
+            owner (str): The domain asking, which never gets its own results back.
+        Returns:
+            tuple: (result, ts). result is None if the probe was not sent; ts is
+            the Unix time of a result probed by another domain, None for a
+            probe sent for this call.
+        """
+        with self.lock:
+            cached = self.fresh(key, owner)
+            if cached is None:
+                event = self.pending.get(key)
+                sender = event is None
+                if sender:
+                    event = threading.Event()
+                    self.pending[key] = event
+                    self.probes += 1
+                else:
+                    self.coalesced += 1
+        if cached is not None:
+            return self.unwrap(*cached)
+        if not sender:
+            event.wait()
+            with self.lock:
+                entry = self.entries.get(key)
+            return self.unwrap(entry[1], entry[2], entry[4]) if entry else (None, None)
+
+        result = error = None
+        try:
+            result = probe()
+            return result, None
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self.lock:
+                self.save(key, result, error, owner)
+                self.pending.pop(key, None)
+            event.set()
+
+    async def probe_async(self, key, probe, owner=None):
+        """
+        Coroutine counterpart of probe().
+        The shared probe runs as its own task, so a domain whose check is
+        cancelled does not cancel it for the other domains awaiting it.
+        Args:
+            key: The key of the URL, from probe_key().
+            probe (callable): Returns a coroutine that sends the probe.
+            owner (str): The domain asking, which never gets its own results back.
+        Returns:
+            tuple: (result, ts), as returned by probe().
+        """
+        with self.lock:
+            cached = self.fresh(key, owner)
+            task = self.tasks.get(key) if cached is None else None
+            if task is not None:
+                self.coalesced += 1
+            elif cached is None:
+                self.probes += 1
+        if cached is not None:
+            return self.unwrap(*cached)
+        if task is None:
+            task = asyncio.ensure_future(probe())
+            task.owner = owner
+            self.tasks[key] = task
+            task.add_done_callback(lambda done: self.finished(key, done))
+        result = await asyncio.shield(task)
+        if task.owner == owner:
+            return result, None
+        with self.lock:
+            entry = self.entries.get(key)
+        return result, entry[4] if entry else None
+
+    def finished(self, key, task):
+        """
+        Stores the outcome of a probe task once it is done.
+        Args:
+            key: The key of the URL.
+            task (asyncio.Task): The finished probe.
+        """
+        self.tasks.pop(key, None)
+        if task.cancelled():
+            return
+        with self.lock:
+            error = task.exception()
+            self.save(key, None if error else task.result(), error, task.owner)
+
+    def snapshot(self):
+        """
+        Returns the cache counters.
+        Returns:
+            dict: requests, probes sent, hits, coalesced and dedupe_ratio, the
+            share of requests answered without a probe of their own.
+        """
+        with self.lock:
+            saved = self.hits + self.coalesced
+            return {
+                "requests": self.requests,
+                "probes": self.probes,
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "dedupe_ratio": round(saved / self.requests, 3) if self.requests else 0.0,
+            }
+
+
+# Shared by the child probes of every domain, whatever the engine.
+probe_cache = ProbeCache()
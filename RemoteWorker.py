@@ -0,0 +1,126 @@
+import copy
+import os
+import requests
+import socket
+import threading
+from Probe import now
+from ShardPool import ShardEngine
+
+# Records kept while the coordinator cannot be reached; older ones are dropped.
+MAX_OUTBOX = 50000
+
+
+class RemoteWorker:
+    """
+    Worker of a Coordinator, possibly on another host.
+    Syncs with the coordinator every few seconds: sends the records of its
+    checks and its counters, and gets its domains whenever its assignment
+    changes. The domains run on a ShardEngine, so the checks are the same as
+    in the other modes. While the coordinator is unreachable the records are
+    kept, up to MAX_OUTBOX, and sent on the next sync that succeeds.
+    """
+
+    def __init__(self, url, settings, name=None):
+        """
+        Initializes the RemoteWorker class.
+        Args:
+            url (str): Base URL of the coordinator, like "http://10.0.0.1:8750".
+            settings (Settings): Advanced settings of the checks.
+            name (str): Name of the worker; host name and process id when omitted.
+        """
+        self.url = url.rstrip("/") + "/sync"
+        self.settings = copy.deepcopy(settings)
+        # A worker runs its domains itself, in this process.
+        self.settings.values.update(processes=1, coordinator="")
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.session = requests.Session()
+        token = settings.get("cluster_token")
+        if token:
+            self.session.headers["X-Monitor-Token"] = token
+        self.engine = None
+        self.version = None
+        self.interval = settings.get("sync_interval")
+        self.outbox = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def collect(self, batch):
+        """
+        Keeps a batch of records of the engine until the next sync.
+        Args:
+            batch (list): (method, args) records.
+        """
+        with self.lock:
+            self.outbox.extend(batch)
+            del self.outbox[:-MAX_OUTBOX]
+
+    def run(self):
+        """
+        Syncs with the coordinator until stop() is called, then stops the
+        checks and sends their last records.
+        """
+        try:
+            while True:
+                self.sync()
+                if self.stop_event.wait(self.interval):
+                    break
+        finally:
+            if self.engine:
+                self.engine.close()
+                self.engine = None
+            self.sync(final=True)
+
+    def stop(self):
+        """
+        Asks run() to return.
+        """
+        self.stop_event.set()
+
+    def sync(self, final=False):
+        """
+        Sends the pending records and applies the assignment in the reply.
+        Args:
+            final (bool): Whether this is the last sync: the coordinator
+                reassigns the shards of the worker and the reply is ignored.
+        """
+        if self.engine:
+            self.engine.flush()
+        with self.lock:
+            batch, self.outbox = self.outbox, []
+        body = {
+            "worker": self.name,
+            "version": self.version,
+            "records": batch,
+            "stats": self.engine.stats() if self.engine else None,
+            "leaving": final,
+        }
+        try:
+            response = self.session.post(self.url, json=body, timeout=10)
+            response.raise_for_status()
+            reply = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error sincronizando con el coordinador {self.url}: {e}")
+            with self.lock:
+                self.outbox = (batch + self.outbox)[-MAX_OUTBOX:]
+            return
+        if final:
+            return
+        self.interval = reply.get("interval", self.interval)
+        if reply.get("domains") is not None:
+            self.assign(reply["version"], reply["domains"])
+
+    def assign(self, version, domains):
+        """
+        Replaces the running checks with a new set of domains.
+        Args:
+            version (str): Version of the assignment.
+            domains (list): Domain dictionaries to check.
+        """
+        if self.engine:
+            self.engine.close()
+            self.engine = None
+        self.version = version
+        print(f"[{now()}] {len(domains)} dominios asignados por el coordinador", flush=True)
+        if domains:
+            self.engine = ShardEngine(domains, self.settings, self.collect)
+            self.engine.start()
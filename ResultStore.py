@@ -0,0 +1,354 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from ErrorWriter import ERROR_LOG, iter_errors
+from HttpPool import PHASES
+
+STORE_FILE = "monitor.db"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    dominio TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER,
+    status_class TEXT NOT NULL,
+    tiempo_ms INTEGER,
+    error TEXT,
+    dns_ms INTEGER,
+    connect_ms INTEGER,
+    tls_ms INTEGER,
+    ttfb_ms INTEGER,
+    download_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_results_ts ON results (ts);
+CREATE INDEX IF NOT EXISTS idx_results_dominio_ts ON results (dominio, ts);
+CREATE INDEX IF NOT EXISTS idx_results_url_ts ON results (url, ts);
+CREATE INDEX IF NOT EXISTS idx_results_errors_ts ON results (ts) WHERE error IS NOT NULL;
+"""
+
+COLUMNS = ("id", "ts", "fecha", "dominio", "url", "status", "status_class", "tiempo_ms", "error") + PHASES
+INSERT = ("INSERT INTO results (ts, dominio, url, status, status_class, tiempo_ms, error, "
+          + ", ".join(PHASES) + ") VALUES (" + ", ".join("?" * (7 + len(PHASES))) + ")")
+
+
+def status_class(status, truncated=False):
+    """
+    Groups an HTTP status in its class.
+    Args:
+        status (int): The HTTP status code, or None if the request failed.
+        truncated (bool): Whether the body was cut at the byte cap or the read deadline.
+    Returns:
+        str: "2xx", "3xx", "4xx", "5xx"..., "truncated" for a 200 whose body
+        was cut, or "error".
+    """
+    if not status:
+        return "error"
+    if truncated and status == 200:
+        return "truncated"
+    return f"{int(status) // 100}xx"
+
+
+def to_timestamp(value):
+    """
+    Converts a date filter to a Unix timestamp.
+    Args:
+        value (str | datetime | int | float): "YYYY-MM-DD", "YYYY-MM-DD HH:MM:SS",
+            a datetime or a timestamp.
+    Returns:
+        int: The timestamp, or None if value is None.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    value = value.strip()
+    fmt = DATE_FORMAT if " " in value else "%Y-%m-%d"
+    return int(datetime.strptime(value, fmt).timestamp())
+
+
+class ResultStore:
+    """
+    Class for keeping the history of checks and errors in an SQLite database.
+    Rows are indexed by domain, URL and time, so the error window, exporters and
+    reports can query any range without loading the whole history. Writes are
+    queued and committed in batches by a single writer thread.
+    """
+
+    def __init__(self, path=STORE_FILE, retention_days=365, batch_size=500, flush_interval=1.0,
+                 error_path=ERROR_LOG):
+        """
+        Initializes the ResultStore class, creating the database if needed.
+        When the database is new, the entries of the error log are imported.
+        Args:
+            path (str): Path to the SQLite database.
+            retention_days (int): Days of history kept; 0 keeps everything.
+            batch_size (int): Maximum rows committed per transaction.
+            flush_interval (float): Seconds to wait for more rows before committing.
+            error_path (str): Path to the error log imported into a new database.
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.last_purge = 0
+
+        is_new = not os.path.exists(path)
+        with self.transaction() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self.migrate(conn)
+        if is_new:
+            self.import_error_log(error_path)
+
+    def connect(self):
+        """
+        Opens a new connection to the database.
+        SQLite connections cannot be shared between threads, so each query opens its own.
+        """
+        return sqlite3.connect(self.path, timeout=10)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Opens a connection, commits on success and always closes it.
+        """
+        conn = self.connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def migrate(self, conn):
+        """
+        Adds the columns of newer versions to a database created by an older one.
+        Args:
+            conn (sqlite3.Connection): Open connection to the database.
+        """
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+        for column in PHASES:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE results ADD COLUMN {column} INTEGER")
+
+    def import_error_log(self, path=ERROR_LOG):
+        """
+        Imports the entries of the line-delimited error log.
+        Args:
+            path (str): Path to the error log.
+        """
+        rows = []
+        for entry in iter_errors(path):
+            try:
+                ts = to_timestamp(entry["fecha"])
+            except (KeyError, ValueError):
+                continue
+            error = entry.get("error", "")
+            code = error.split(" - ", 1)[0]
+            status = int(code) if code.isdigit() else None
+            url = entry.get("dominio", "")
+            rows.append((ts, url, url, status, status_class(status), None, error)
+                        + (None,) * len(PHASES))
+        if rows:
+            self.insert(rows)
+
+    def record(self, dominio, url, status, tiempo_ms=None, error=None, phases=None, truncated=False,
+               ts=None):
+        """
+        Queues the result of a check.
+        Args:
+            dominio (str): The monitored domain.
+            url (str): The URL that was checked.
+            status (int): The HTTP status code, or None if the request failed.
+            tiempo_ms (int): Response time in milliseconds, if known.
+            error (str): Error description when the check is an error entry.
+            phases (dict): Latency per phase (dns_ms, connect_ms, tls_ms, ttfb_ms,
+                download_ms), if known.
+            truncated (bool): Whether the body was cut at the byte cap or the read deadline.
+            ts (float): Unix time of the check; now when omitted.
+        """
+        phases = phases or {}
+        self.start()
+        self.queue.put((int(time.time() if ts is None else ts), dominio, url, status,
+                        status_class(status, truncated), tiempo_ms, error)
+                       + tuple(phases.get(phase) for phase in PHASES))
+
+    def start(self):
+        """
+        Starts the writer thread the first time a result is recorded.
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def close(self):
+        """
+        Commits the pending rows and stops the writer thread.
+        """
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout=5)
+
+    def run(self):
+        """
+        Writer loop: gathers the rows queued during the flush interval and
+        commits them in a single transaction.
+        """
+        while True:
+            row = self.queue.get()
+            if row is None:
+                return
+            batch = [row]
+            closing = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    closing = True
+                    break
+                batch.append(row)
+            self.insert(batch)
+            self.purge()
+            if closing:
+                return
+
+    def insert(self, rows):
+        """
+        Inserts rows in a single transaction.
+        Args:
+            rows (list): Tuples of (ts, dominio, url, status, status_class, tiempo_ms,
+                error) followed by one value per latency phase.
+        """
+        try:
+            with self.transaction() as conn:
+                conn.executemany(INSERT, rows)
+        except sqlite3.Error as e:
+            print(f"Error guardando resultados: {e}")
+
+    def purge(self):
+        """
+        Deletes the rows older than the retention period, at most once a day.
+        """
+        if not self.retention_days or time.time() - self.last_purge < 86400:
+            return
+        self.last_purge = time.time()
+        try:
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM results WHERE ts < ?",
+                             (int(time.time()) - self.retention_days * 86400,))
+        except sqlite3.Error as e:
+            print(f"Error depurando resultados: {e}")
+
+    def where(self, start=None, end=None, domain=None, url=None, status_class=None, errors_only=False):
+        """
+        Builds the WHERE clause shared by query, count and iter_query.
+        Returns:
+            tuple: (sql, params)
+        """
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(to_timestamp(start))
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(to_timestamp(end))
+        if domain:
+            clauses.append("dominio = ?")
+            params.append(domain)
+        if url:
+            clauses.append("url = ?")
+            params.append(url)
+        if status_class:
+            clauses.append("status_class = ?")
+            params.append(status_class)
+        if errors_only:
+            clauses.append("error IS NOT NULL")
+        sql = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return sql, params
+
+    def iter_query(self, start=None, end=None, domain=None, url=None, status_class=None,
+                   errors_only=False, limit=None, offset=0, newest_first=True, cursor=None):
+        """
+        Yields the results matching the filters, reading them lazily from the database.
+        Args:
+            start (str | datetime): Only results at or after this date.
+            end (str | datetime): Only results at or before this date.
+            domain (str): Only results of this monitored domain.
+            url (str): Only results of this URL.
+            status_class (str): Only results of this class ("2xx", "4xx", "error"...).
+            errors_only (bool): Only results logged as errors.
+            limit (int): Maximum number of results, or None for all.
+            offset (int): Number of results to skip.
+            newest_first (bool): Order of the results.
+            cursor (tuple): (ts, id) of the last result of the previous page. Only
+                the results after it are returned, which keeps deep pages as fast
+                as the first one, unlike offset.
+        Yields:
+            dict: id, ts, fecha, dominio, url, status, status_class, tiempo_ms, error
+            and the latency phases.
+        """
+        sql, params = self.where(start, end, domain, url, status_class, errors_only)
+        if cursor is not None:
+            sql += " AND " if sql else " WHERE "
+            sql += "(ts, id) < (?, ?)" if newest_first else "(ts, id) > (?, ?)"
+            params += list(cursor)
+        order = "DESC" if newest_first else "ASC"
+        sql = ("SELECT id, ts, dominio, url, status, status_class, tiempo_ms, error, "
+               f"{', '.join(PHASES)} FROM results"
+               f"{sql} ORDER BY ts {order}, id {order} LIMIT ? OFFSET ?")
+        params += [-1 if limit is None else limit, offset]
+        conn = self.connect()
+        try:
+            for row in conn.execute(sql, params):
+                fecha = datetime.fromtimestamp(row[1]).strftime(DATE_FORMAT)
+                yield dict(zip(COLUMNS, row[:2] + (fecha,) + row[2:]))
+        finally:
+            conn.close()
+
+    def query(self, **filters):
+        """
+        Returns the results matching the filters as a list.
+        Accepts the same keyword arguments as iter_query; limit defaults to 100.
+        """
+        filters.setdefault("limit", 100)
+        return list(self.iter_query(**filters))
+
+    def count(self, start=None, end=None, domain=None, url=None, status_class=None, errors_only=False):
+        """
+        Counts the results matching the filters.
+        Returns:
+            int: The number of results.
+        """
+        sql, params = self.where(start, end, domain, url, status_class, errors_only)
+        with self.transaction() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM results{sql}", params).fetchone()[0]
+
+    def domains(self):
+        """
+        Returns the domains that have results stored.
+        Returns:
+            list: Domains in alphabetical order.
+        """
+        with self.transaction() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT DISTINCT dominio FROM results ORDER BY dominio")]
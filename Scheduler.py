@@ -0,0 +1,230 @@
+import heapq
+import random
+import threading
+import time
+import zlib
+
+# Growth of the interval after every healthy check of an adaptive domain.
+BACKOFF_FACTOR = 1.5
+
+
+def adaptive_defaults(tiempo):
+    """
+    Default limits of an adaptive domain that does not set them in config.json.
+    Args:
+        tiempo (int): Base interval of the domain, in seconds.
+    Returns:
+        tuple: (tiempo_max, tiempo_fallo) in seconds; tiempo_fallo never
+        exceeds the base interval.
+    """
+    return tiempo * 4, max(1, min(tiempo, max(10, min(60, tiempo // 5))))
+
+
+def merge_schedulers(snapshots):
+    """
+    Combines the metrics of several schedulers, such as those of the worker
+    processes of a ShardPool.
+    Args:
+        snapshots (iterable): Scheduler.snapshot() dictionaries.
+    Returns:
+        dict: The same keys as Scheduler.snapshot(), or None without snapshots.
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    if not snapshots:
+        return None
+    dispatched = sum(snapshot["dispatched"] for snapshot in snapshots)
+    total_lag = sum(snapshot["lag_mean"] * snapshot["dispatched"] for snapshot in snapshots)
+    return {
+        "scheduled": sum(snapshot["scheduled"] for snapshot in snapshots),
+        "running": sum(snapshot["running"] for snapshot in snapshots),
+        "queue_depth": sum(snapshot["queue_depth"] for snapshot in snapshots),
+        "dispatched": dispatched,
+        "lag_last": max(snapshot["lag_last"] for snapshot in snapshots),
+        "lag_mean": round(total_lag / dispatched, 3) if dispatched else 0.0,
+        "lag_max": max(snapshot["lag_max"] for snapshot in snapshots),
+    }
+
+
+class AdaptiveInterval:
+    """
+    Adaptive check interval of one domain.
+    While the domain stays healthy the interval grows by BACKOFF_FACTOR after
+    every check, up to max_interval. A new failure is rechecked after
+    retry_interval, so it is confirmed or cleared quickly; a confirmed failure
+    and the first healthy check after it go back to the base interval.
+    """
+
+    def __init__(self, base, max_interval, retry_interval, factor=BACKOFF_FACTOR):
+        """
+        Initializes the AdaptiveInterval class.
+        Args:
+            base (int): Interval configured for the domain, in seconds.
+            max_interval (int): Longest interval for a stable domain.
+            retry_interval (int): Interval used right after a failure.
+            factor (float): Growth of the interval after every healthy check.
+        """
+        self.base = base
+        self.max_interval = max(base, max_interval)
+        self.retry_interval = max(1, min(base, retry_interval))
+        self.factor = factor
+        self.current = base
+        self.healthy = True
+
+    def next(self, healthy):
+        """
+        Returns the interval until the next check.
+        Args:
+            healthy (bool): Whether the last check found no errors.
+        Returns:
+            float: Seconds until the next check.
+        """
+        if not healthy:
+            confirmed = not self.healthy
+            self.healthy = False
+            self.current = self.base
+            return self.base if confirmed else self.retry_interval
+        if self.healthy:
+            self.current = min(self.max_interval, self.current * self.factor)
+        self.healthy = True
+        return self.current
+
+
+class Scheduler:
+    """
+    Central scheduler of the domain checks.
+    Keeps a min-heap of next-due times instead of one sleeping loop per domain.
+    First runs are spread over each domain's interval, or a shorter stagger
+    window, by a stable hash of the domain, every later run gets a random
+    jitter, and a token bucket caps the checks dispatched per second, so
+    domains sharing an interval do not all fire at the same moment. Shared by the threaded and the async engines; thread-safe.
+    """
+
+    def __init__(self, jitter=0.1, stagger=None, max_per_second=0, clock=time.monotonic):
+        """
+        Initializes an empty Scheduler.
+        Args:
+            jitter (float): Fraction of the interval added or removed at random
+                from every next-due time (0.1 = ±10%).
+            stagger (float): Seconds over which first runs are spread, capped at
+                each domain's interval; None spreads them over the whole interval.
+            max_per_second (float): Maximum checks dispatched per second; 0 disables the cap.
+            clock (callable): Monotonic clock, in seconds.
+        """
+        self.jitter = max(0.0, min(float(jitter), 0.9))
+        self.stagger = None if stagger is None else max(0.0, float(stagger))
+        self.max_per_second = max(0.0, float(max_per_second))
+        self.clock = clock
+        self.heap = []
+        self.intervals = {}
+        self.running = set()
+        self.sequence = 0
+        self.lock = threading.Lock()
+        self.tokens = max(1.0, self.max_per_second)
+        self.refilled_at = clock()
+        self.dispatched = 0
+        self.total_lag = 0.0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def push(self, key, due):
+        """
+        Adds an entry to the heap. Must be called with the lock held.
+        The sequence number keeps the order of entries due at the same time.
+        """
+        self.sequence += 1
+        heapq.heappush(self.heap, (due, self.sequence, key))
+
+    def add(self, key, interval):
+        """
+        Schedules the first run of a domain within the stagger window.
+        The offset depends only on the key, so a domain keeps its phase across reloads.
+        Args:
+            key (str): The monitored domain.
+            interval (float): Seconds between checks.
+        """
+        window = interval if self.stagger is None else min(self.stagger, interval)
+        offset = (zlib.crc32(key.encode("utf-8")) / 0xFFFFFFFF) * window
+        with self.lock:
+            self.intervals[key] = interval
+            self.push(key, self.clock() + offset)
+
+    def take_token(self, now):
+        """
+        Takes a token from the rate limiter. Must be called with the lock held.
+        Args:
+            now (float): Current clock value.
+        Returns:
+            float: 0 if a token was taken, or seconds until the next one.
+        """
+        if not self.max_per_second:
+            return 0
+        capacity = max(1.0, self.max_per_second)
+        self.tokens = min(capacity, self.tokens + (now - self.refilled_at) * self.max_per_second)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.max_per_second
+
+    def next_job(self):
+        """
+        Takes the next due domain, if the rate limit allows it.
+        Returns:
+            tuple: (key, 0) when a domain must be checked now, or (None, seconds)
+            to wait before asking again.
+        """
+        with self.lock:
+            if not self.heap:
+                return None, 1.0
+            due, _, key = self.heap[0]
+            now = self.clock()
+            if due > now:
+                return None, due - now
+            wait = self.take_token(now)
+            if wait:
+                return None, wait
+            heapq.heappop(self.heap)
+            lag = now - due
+            self.dispatched += 1
+            self.total_lag += lag
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.running.add(key)
+            return key, 0
+
+    def done(self, key, interval=None):
+        """
+        Schedules the next run of a domain once its check has finished.
+        Args:
+            key (str): The monitored domain.
+            interval (float): Seconds until the next run only, e.g. from an
+                AdaptiveInterval; the configured interval is used when omitted.
+        """
+        with self.lock:
+            self.running.discard(key)
+            if key not in self.intervals:
+                return
+            if interval is None:
+                interval = self.intervals[key]
+            factor = 1 + random.uniform(-self.jitter, self.jitter)
+            self.push(key, self.clock() + interval * factor)
+
+    def snapshot(self):
+        """
+        Returns the scheduler metrics.
+        Returns:
+            dict: scheduled and running domains, queue_depth (domains already due
+            and waiting to be dispatched), dispatched checks and schedule lag
+            (seconds between the due time and the dispatch) as last, mean and max.
+        """
+        with self.lock:
+            now = self.clock()
+            return {
+                "scheduled": len(self.heap),
+                "running": len(self.running),
+                "queue_depth": sum(1 for due, _, _ in self.heap if due <= now),
+                "dispatched": self.dispatched,
+                "lag_last": round(self.last_lag, 3),
+                "lag_mean": round(self.total_lag / self.dispatched, 3) if self.dispatched else 0.0,
+                "lag_max": round(self.max_lag, 3),
+            }
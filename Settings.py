@@ -0,0 +1,86 @@
+import json
+
+SETTINGS_FILE = "settings.json"
+
+# Advanced options. Any key missing from settings.json falls back to these values.
+DEFAULTS = {
+    "engine": "threaded",
+    "max_concurrency": 100,
+    "child_workers": 8,
+    "per_host_max_in_flight": 4,
+    "cycle_deadline": 30,
+    "pool_size": 10,
+    "pool_max_idle": 300,
+    "child_probe": "head",
+    "link_parser": "stream",
+    "max_root_bytes": 5000000,
+    "read_deadline": 15,
+    "store_path": "monitor.db",
+    "store_retention_days": 365,
+    "ui_tick_ms": 100,
+    "ui_max_updates_per_tick": 500,
+    "scheduler_workers": 32,
+    "schedule_stagger": None,
+    "schedule_jitter": 0.1,
+    "max_checks_per_second": 10,
+    "latency_samples": 64,
+    "latency_windows": [300, 3600, 86400],
+    "dns_ttl": 300,
+    "dns_negative_ttl": 30,
+    "dns_pin": False,
+    "crawl_depth": 1,
+    "use_sitemap": False,
+    "discovery_interval": 3600,
+    "max_pages": 10000,
+    "discovery_workers": 2,
+    "query_allowlist": ["page", "p", "id"],
+    "trailing_slash": "strip",
+    "probe_cache_ttl": 10,
+    "processes": 1,
+    "coordinator": "",
+    "cluster_shards": 64,
+    "sync_interval": 2,
+    "worker_timeout": 15,
+    "cluster_token": "",
+}
+
+
+class Settings:
+    """
+    Class for loading the advanced settings of the monitor.
+    Settings are read from an optional JSON file and merged over DEFAULTS,
+    so the application works without the file being present.
+    """
+
+    def __init__(self, path=SETTINGS_FILE):
+        """
+        Initializes the Settings class.
+        Args:
+            path (str): Path to the JSON file with the advanced settings.
+        """
+        self.path = path
+        self.values = dict(DEFAULTS)
+        self.load()
+
+    def load(self):
+        """
+        Loads the settings file, keeping the defaults for missing keys.
+        """
+        self.values = dict(DEFAULTS)
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.values.update(data)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError as e:
+            print(f"Error cargando configuración avanzada: {e}")
+
+    def get(self, key):
+        """
+        Returns the value of a setting.
+        Args:
+            key (str): Name of the setting.
+        """
+        return self.values.get(key, DEFAULTS.get(key))
@@ -0,0 +1,370 @@
+import multiprocessing
+import multiprocessing.connection
+import signal
+import threading
+import time
+from urllib.parse import urlsplit
+from MonitorEngine import MonitorEngine
+from Probe import describe_status
+from UrlCanonicalizer import site_host
+
+# Seconds between two batches of records sent by a worker.
+FLUSH_INTERVAL = 0.5
+# Seconds between two reports of the counters of a worker.
+STATS_INTERVAL = 5
+# Seconds before restarting a worker that died, doubled on every restart in a
+# row up to the maximum; a worker that ran for that long starts over.
+RESTART_DELAY = 1
+MAX_RESTART_DELAY = 60
+# Restarts in a row after which the shard of a worker is given up.
+MAX_RESTARTS = 8
+# Engine methods the records of a worker may replay.
+RESULTS = frozenset(
+    ("show_root_result", "show_root_error", "show_child_result", "show_child_error",
+     "forget_pages"))
+
+
+def partition(domains, shards):
+    """
+    Splits the domains into balanced shards.
+    The domains of the same site stay in the same shard, so they keep sharing
+    the DNS cache, the connections and the probe results of one process.
+    Args:
+        domains (list): Domain dictionaries from config.json.
+        shards (int): Number of shards.
+    Returns:
+        list: Lists of domain dictionaries; empty shards are left out.
+    """
+    sites = {}
+    for domain in domains:
+        url = domain.get("dominio", "")
+        host = (urlsplit(url).hostname or url).lower()
+        sites.setdefault(site_host(host), []).append(domain)
+
+    buckets = [[] for _ in range(max(1, shards))]
+    for group in sorted(sites.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(group)
+    return [bucket for bucket in buckets if bucket]
+
+
+class ShardEngine(MonitorEngine):
+    """
+    MonitorEngine of a worker process, checking one shard of the domains.
+    It schedules and probes its domains like any engine, but does not show or
+    store the results: each one becomes a compact record, (method, args), sent
+    in batches to the engine that owns the log, the store and the listeners,
+    which replays it. The last argument of every record is the time of the
+    check, so results are not dated when the batch arrives.
+    """
+
+    def __init__(self, domains, settings, send):
+        """
+        Initializes the ShardEngine class.
+        Args:
+            domains (list): Domain dictionaries of the shard.
+            settings (Settings): Advanced settings.
+            send (callable): Sends a list of records to the parent engine.
+        """
+        self.shard = domains
+        self.send = send
+        self.records = []
+        self.records_lock = threading.Lock()
+        super().__init__(None, None, settings)
+
+    def open_outputs(self, error_path):
+        """
+        A shard has no log nor store of its own.
+        """
+        return None, None
+
+    def load_domains(self):
+        """
+        Returns the domains of the shard.
+        """
+        return list(self.shard)
+
+    def report(self, url, color, name, ts, *args):
+        """
+        Queues the record of a result.
+        Args:
+            url (str): The monitored domain.
+            color (str): Color of the result, to adapt the interval of the domain.
+            name (str): The engine method that replays the record.
+            ts (float): Unix time of the check; now when None.
+            *args: The other arguments of the method.
+        """
+        with self.records_lock:
+            self.records.append((name, args + (time.time() if ts is None else ts,)))
+        self.check_count += 1
+        self.count_failure(url, args[1] if name.startswith("show_child") else None, color)
+
+    def show_root_result(self, url, status, reason, tiempo_ms, phases=None, truncated=False,
+                         ts=None):
+        """
+        Sends the result of a root check to the parent engine.
+        """
+        self.report(url, describe_status(status, reason, truncated)[1], "show_root_result", ts,
+                    url, status, reason, tiempo_ms, phases, truncated)
+
+    def show_root_error(self, url, error, ts=None):
+        """
+        Sends a failed root check to the parent engine.
+        """
+        self.report(url, "red", "show_root_error", ts, url, error)
+
+    def show_child_result(self, url, path, status, reason, tiempo_ms, phases=None, truncated=False,
+                          ts=None):
+        """
+        Sends the result of a child page check to the parent engine.
+        """
+        self.report(url, describe_status(status, reason, truncated)[1], "show_child_result", ts,
+                    url, path, status, reason, tiempo_ms, phases, truncated)
+
+    def show_child_error(self, url, path, child_url, error, ts=None):
+        """
+        Sends a failed child page check to the parent engine.
+        """
+        self.report(url, "red", "show_child_error", ts, url, path, child_url, error)
+
+    def forget_pages(self, url, paths):
+        """
+        Sends the pages that left the frontier of a domain to the parent
+        engine, which holds their latency history.
+        """
+        super().forget_pages(url, paths)
+        with self.records_lock:
+            self.records.append(("forget_pages", (url, list(paths))))
+
+    def flush(self):
+        """
+        Sends the queued records as one batch.
+        """
+        with self.records_lock:
+            batch, self.records = self.records, []
+        if batch:
+            self.send(batch)
+
+    def close(self):
+        """
+        Stops the checks and sends the last records.
+        """
+        self.stop()
+        self.discovery.close()
+        self.flush()
+
+
+def run_shard(index, domains, settings, connection):
+    """
+    Entry point of a worker process.
+    Runs a ShardEngine until the parent asks it to stop or exits, sending its
+    records and, every few seconds, its counters through the connection.
+    Args:
+        index (int): Number of the shard.
+        domains (list): Domain dictionaries of the shard.
+        settings (Settings): Advanced settings.
+        connection (multiprocessing.connection.Connection): Pipe to the parent.
+    """
+    # Signals sent to the whole process group are left to the parent, which
+    # stops the workers once it has decided to stop itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    settings.values["processes"] = 1
+    engine = ShardEngine(domains, settings, connection.send)
+    engine.start()
+    last_stats = 0
+    try:
+        # Any message from the parent, or its end of the pipe closing, means stop.
+        while not connection.poll(FLUSH_INTERVAL):
+            engine.flush()
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                last_stats = time.monotonic()
+                connection.send([("stats", (index, engine.stats()))])
+    finally:
+        try:
+            engine.close()
+        except OSError:
+            pass  # The parent is gone, and so are the last records.
+        connection.close()
+
+
+class ShardPool:
+    """
+    Runs the domains of an engine on several worker processes.
+    HTML parsing and result handling hold the GIL, so with many large pages a
+    single process saturates one core and the measured latencies include the
+    wait for it. Each worker checks its shard with its own engine and streams
+    the results back through its own pipe; a collector thread replays them on
+    the parent engine, which keeps writing the log and the store and notifying
+    its listeners. A worker that dies is started again with the same shard,
+    after a delay that grows while it keeps dying; a worker that cannot stay
+    up after MAX_RESTARTS tries is given up.
+    """
+
+    def __init__(self, engine, processes):
+        """
+        Initializes the ShardPool class.
+        Args:
+            engine (MonitorEngine): The engine the results are reported to.
+            processes (int): Number of worker processes.
+        """
+        self.engine = engine
+        self.shards = partition(engine.domains, processes)
+        # Spawned, not forked: the parent runs threads and maybe Tk.
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = threading.Event()
+        # index -> (process, connection)
+        self.workers = {}
+        # index -> (restarts in a row, start time) of every worker
+        self.attempts = {}
+        # index -> monotonic time a dead worker is due to restart
+        self.pending = {}
+        self.abandoned = set()
+        # Held while a worker starts, so none starts once stop() has begun.
+        self.lock = threading.Lock()
+        self.shard_stats = {}
+        self.received = 0
+        self.restarts = 0
+        self.collector = None
+
+    def start(self):
+        """
+        Starts one worker process per shard and the collector thread.
+        """
+        for index in range(len(self.shards)):
+            self.spawn(index)
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def spawn(self, index):
+        """
+        Starts the worker process of a shard, unless the pool is stopping.
+        Args:
+            index (int): Number of the shard.
+        """
+        with self.lock:
+            if self.stop_event.is_set():
+                return
+            connection, child_connection = self.context.Pipe()
+            process = self.context.Process(
+                target=run_shard, name=f"shard-{index}", daemon=True,
+                args=(index, self.shards[index], self.engine.settings, child_connection))
+            process.start()
+            child_connection.close()
+            self.workers[index] = (process, connection)
+            self.attempts[index] = (self.attempts.get(index, (0, 0))[0], time.monotonic())
+
+    def collect(self):
+        """
+        Collector loop: replays the records of the workers on the engine.
+        A pipe that closes while the pool runs means its worker died, and it is
+        started again once its delay is over; once the pool is stopped, the
+        loop ends when every worker has closed its pipe.
+        """
+        while True:
+            if self.stop_event.is_set():
+                self.pending.clear()
+            current = time.monotonic()
+            for index in [index for index, due in self.pending.items() if due <= current]:
+                del self.pending[index]
+                self.spawn(index)
+            connections = {connection: index for index, (_, connection) in self.workers.items()
+                           if not connection.closed}
+            if not connections and not self.pending:
+                return
+            if not connections:
+                self.stop_event.wait(0.5)
+                continue
+            for connection in multiprocessing.connection.wait(list(connections), timeout=0.5):
+                try:
+                    batch = connection.recv()
+                except (EOFError, OSError):
+                    connection.close()
+                    if not self.stop_event.is_set():
+                        self.revive(connections[connection])
+                    continue
+                self.apply(batch)
+
+    def apply(self, batch):
+        """
+        Replays a batch of records on the engine.
+        Args:
+            batch (list): (name, args) records.
+        """
+        for name, args in batch:
+            if name == "stats":
+                index, stats = args
+                self.shard_stats[index] = stats
+                continue
+            if name not in RESULTS:
+                continue
+            self.received += 1
+            try:
+                getattr(self.engine, name)(*args)
+            except Exception as e:
+                print(f"Error registrando resultado de {args[0]}: {e}")
+
+    def revive(self, index):
+        """
+        Schedules the restart of the worker of a shard that exited on its own.
+        The delay doubles with every restart in a row, and the shard is given
+        up after MAX_RESTARTS of them.
+        Args:
+            index (int): Number of the shard.
+        """
+        process, _ = self.workers[index]
+        process.join(1)
+        attempts, started = self.attempts[index]
+        if time.monotonic() - started >= MAX_RESTART_DELAY:
+            attempts = 0
+        if attempts >= MAX_RESTARTS:
+            print(f"Error: el proceso {process.name} terminó (código {process.exitcode}) "
+                  f"{attempts + 1} veces seguidas; sus {len(self.shards[index])} dominios "
+                  f"dejan de comprobarse")
+            self.abandoned.add(index)
+            return
+        delay = min(MAX_RESTART_DELAY, RESTART_DELAY * 2 ** attempts)
+        print(f"Error: el proceso {process.name} terminó "
+              f"(código {process.exitcode}), reiniciándolo en {delay} s")
+        self.attempts[index] = (attempts + 1, started)
+        self.restarts += 1
+        self.pending[index] = time.monotonic() + delay
+
+    def stop(self, timeout=10):
+        """
+        Stops the workers, waiting for their last records.
+        Args:
+            timeout (float): Seconds to wait before terminating a worker.
+        """
+        with self.lock:
+            self.stop_event.set()
+            workers = list(self.workers.values())
+        for _, connection in workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        for process, _ in workers:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        if self.collector:
+            self.collector.join(timeout=5)
+
+    def snapshot(self):
+        """
+        Returns the counters of the pool.
+        Returns:
+            dict: processes alive, shards, records received, restarts, shards
+            given up, the domains of each shard and the last counters each
+            worker reported.
+        """
+        return {
+            "processes": sum(1 for process, _ in self.workers.values() if process.is_alive()),
+            "shards": len(self.shards),
+            "records": self.received,
+            "restarts": self.restarts,
+            "abandoned": len(self.abandoned),
+            "domains": [len(shard) for shard in self.shards],
+            "workers": [self.shard_stats.get(index) for index in range(len(self.shards))],
+        }
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+
+class UpdateQueue:
+    """
+    Coalescing queue of row updates from worker threads to the Tk thread.
+    Workers put the latest values of a row under its key; if the row already
+    has a pending update it is replaced in place, so the Tk thread only applies
+    the newest state of each row and a busy row cannot starve the others.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty UpdateQueue.
+        """
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        self.received = 0
+        self.merged = 0
+
+    def put(self, key, update):
+        """
+        Queues the new state of a row.
+        Args:
+            key (hashable): Identifies the row, e.g. (domain, path).
+            update (tuple): The values to apply to the row.
+        """
+        with self.lock:
+            self.received += 1
+            if key in self.pending:
+                self.merged += 1
+            self.pending[key] = update
+
+    def drain(self, budget):
+        """
+        Takes up to budget pending updates, oldest first.
+        Args:
+            budget (int): Maximum number of updates to return.
+        Returns:
+            list: (key, update) pairs.
+        """
+        items = []
+        with self.lock:
+            while self.pending and len(items) < budget:
+                items.append(self.pending.popitem(last=False))
+        return items
+
+    def clear(self):
+        """
+        Drops every pending update.
+        """
+        with self.lock:
+            self.pending.clear()
+
+    def snapshot(self):
+        """
+        Returns the queue counters.
+        Returns:
+            dict: received, merged and pending updates.
+        """
+        with self.lock:
+            return {"received": self.received, "merged": self.merged, "pending": len(self.pending)}
@@ -0,0 +1,171 @@
+import re
+import threading
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+UNRESERVED = re.compile(r"%([0-9A-Fa-f]{2})")
+UNRESERVED_CHARS = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def remove_dot_segments(path):
+    """
+    Resolves the "." and ".." segments of a path (RFC 3986, section 5.2.4).
+    Args:
+        path (str): An absolute path.
+    Returns:
+        str: The path without dot segments.
+    """
+    output = []
+    for segment in path.split("/")[1:]:
+        if segment == "..":
+            if output:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if path.endswith(("/.", "/..")):
+        output.append("")
+    return "/" + "/".join(output)
+
+
+def normalize_percent(value):
+    """
+    Uppercases percent escapes and decodes the ones of unreserved characters,
+    so "%7e", "%7E" and "~" compare equal.
+    Args:
+        value (str): A path or query.
+    """
+    def replace(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in UNRESERVED_CHARS else "%" + match.group(1).upper()
+    return UNRESERVED.sub(replace, value)
+
+
+def site_host(host):
+    """
+    Returns a host name without its "www." prefix, to compare sites.
+    Args:
+        host (str): Lowercase host name.
+    """
+    return host[4:] if host.startswith("www.") else host
+
+
+class UrlCanonicalizer:
+    """
+    Class for reducing the URLs found on a page to one canonical form, so the
+    variants of a page are probed once. Scheme and host are lowercased, default
+    ports, user info and fragments dropped, dot segments resolved, percent
+    escapes normalized, the trailing slash removed and the query reduced to the
+    allowed parameters, sorted. "www." and bare hosts count as the same site.
+    """
+
+    def __init__(self, query_allowlist=(), trailing_slash="strip"):
+        """
+        Initializes the UrlCanonicalizer class.
+        Args:
+            query_allowlist (iterable): Query parameters kept; any other is dropped.
+            trailing_slash (str): "strip" to remove it, "keep" to leave paths as found.
+        """
+        self.query_allowlist = frozenset(query_allowlist)
+        self.trailing_slash = trailing_slash
+        self.lock = threading.Lock()
+        self.links = 0
+        self.unique = 0
+        self.redundant = 0
+
+    def configure(self, query_allowlist, trailing_slash):
+        """
+        Applies new canonicalization settings.
+        Args:
+            query_allowlist (iterable): Query parameters kept; any other is dropped.
+            trailing_slash (str): "strip" or "keep".
+        Returns:
+            bool: Whether the settings changed.
+        """
+        query_allowlist = frozenset(query_allowlist)
+        changed = (query_allowlist, trailing_slash) != (self.query_allowlist, self.trailing_slash)
+        self.query_allowlist = query_allowlist
+        self.trailing_slash = trailing_slash
+        return changed
+
+    def canonical(self, url):
+        """
+        Returns the canonical form of an absolute URL.
+        Args:
+            url (str): An absolute URL.
+        Returns:
+            tuple: (scheme, host, port, path_and_query), or None if it is not an
+            http(s) URL.
+        """
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+        if port == DEFAULT_PORTS[scheme]:
+            port = None
+
+        path = normalize_percent(remove_dot_segments(parts.path or "/"))
+        if self.trailing_slash == "strip" and len(path) > 1:
+            path = path.rstrip("/") or "/"
+        query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                 if key in self.query_allowlist]
+        if query:
+            path += "?" + urlencode(sorted(query))
+        return scheme, parts.hostname, port, path
+
+    def child_path(self, href, url, page_url=None):
+        """
+        Returns the canonical path (and query) of a link, if it stays on the site.
+        Args:
+            href (str): Raw href attribute value.
+            url (str): The URL of the monitored domain.
+            page_url (str): The URL of the page the link comes from, when it is
+                not the root page.
+        Returns:
+            str: The path relative to the domain, or None for links to other
+            sites, other schemes, or the root page itself.
+        """
+        base = self.canonical(url)
+        if base is None:
+            return None
+        joined = urljoin(url.rstrip("/") + "/" if page_url is None else page_url, href.strip())
+        link = self.canonical(joined)
+        if link is None:
+            return None
+        scheme, host, port, path = link
+        if site_host(host) != site_host(base[1]) or port != base[2]:
+            return None
+        if path == base[3]:
+            return None
+        return path
+
+    def count(self, links, unique, redundant):
+        """
+        Adds the results of one page to the counters.
+        Args:
+            links (int): Internal links examined.
+            unique (int): Distinct canonical paths kept.
+            redundant (int): Links dropped only because their canonical form
+                matched a path already kept, each a probe saved.
+        """
+        with self.lock:
+            self.links += links
+            self.unique += unique
+            self.redundant += redundant
+
+    def snapshot(self):
+        """
+        Returns the canonicalization counters.
+        Returns:
+            dict: links, unique and redundant.
+        """
+        with self.lock:
+            return {"links": self.links, "unique": self.unique, "redundant": self.redundant}
+
+
+# Shared by the link extraction of every domain.
+canonicalizer = UrlCanonicalizer()
@@ -0,0 +1,52 @@
+"""
+Benchmark of the in-memory latency history.
+Records a day of checks for URLS URLs in LatencySeries and reports the memory
+of its typed arrays, the traced Python memory, and the cost of recording and
+of computing the statistics. Run from the project root:
+    python -m benchmarks.bench_latency_series
+"""
+import random
+import time
+import tracemalloc
+from LatencySeries import LatencySeries
+
+URLS = 50000
+CHECKS_PER_URL = 24
+START = 1700000000
+
+
+def main():
+    """
+    Fills the history and prints the memory and timings.
+    """
+    clock = [START]
+    rng = random.Random(1)
+    urls = [f"https://site-{i % 1000}.example/page-{i}" for i in range(URLS)]
+
+    tracemalloc.start()
+    series = LatencySeries(clock=lambda: clock[0])
+    start = time.perf_counter()
+    for check in range(CHECKS_PER_URL):
+        clock[0] = START + check * 3600  # hourly checks, a day of history
+        for url in urls:
+            status = 200 if rng.random() > 0.01 else 503
+            series.record(url, rng.randint(40, 400), status)
+    record_seconds = time.perf_counter() - start
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for url in urls[:1000]:
+        for window in (300, 3600, 86400):
+            series.stats(url, window)
+    stats_ms = (time.perf_counter() - start) * 1000 / 3000
+
+    print(f"{URLS} URLs, {CHECKS_PER_URL} checks each")
+    print(f"Typed arrays:       {series.memory() / 1e6:8.1f} MB")
+    print(f"Traced (total):     {traced / 1e6:8.1f} MB")
+    print(f"Record:             {record_seconds * 1e6 / (URLS * CHECKS_PER_URL):8.2f} µs/check")
+    print(f"Stats:              {stats_ms:8.3f} ms/window")
+
+
+if __name__ == "__main__":
+    main()
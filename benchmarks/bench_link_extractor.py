@@ -0,0 +1,105 @@
+"""
+Benchmark of the link extraction of root pages.
+Compares the BeautifulSoup extractor with the streaming LinkExtractor on
+synthetic HTML fixtures of growing size, checking that both return the same
+paths.
+
+Run from the project root:
+    python -m benchmarks.bench_link_extractor
+"""
+import random
+import time
+import tracemalloc
+from LinkParser import extract_child_paths, stream_child_paths
+
+URL = "https://example.com"
+SIZES = (1000, 10000, 50000)
+CHUNK_SIZE = 65536
+
+
+def build_fixture(links, seed=1):
+    """
+    Builds an HTML page with a mix of internal, external and skipped links.
+    Args:
+        links (int): Number of <a> tags in the page.
+        seed (int): Seed of the random generator, so runs are comparable.
+    Returns:
+        bytes: The page encoded as UTF-8.
+    """
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><title>Fixture</title>",
+             "<script>var s = '<a href=\"/in-script\">';</script></head><body>"]
+    for i in range(links):
+        kind = rng.randint(0, 9)
+        if kind == 0:
+            href = f"https://other.example.org/page-{i}"
+        elif kind == 1:
+            href = f"/search?q={i}"
+        elif kind == 2:
+            href = f"#section-{i}"
+        elif kind == 3:
+            href = f"mailto:user{i}@example.com"
+        elif kind == 4:
+            href = f"section-{i % 50}/page-{i}"
+        else:
+            href = f"/section-{i % 50}/page-{i}"
+        parts.append(
+            f'<div class="card"><p>Item &amp; {i}</p><a class="link" href="{href}">'
+            f'<span>Enlace {i}</span></a></div>\n')
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def chunked(data):
+    """
+    Splits a body in chunks, as read from a streamed response.
+    Args:
+        data (bytes): The body.
+    """
+    for i in range(0, len(data), CHUNK_SIZE):
+        yield data[i:i + CHUNK_SIZE]
+
+
+def measure(func):
+    """
+    Runs a function measuring wall time and, in a second run, peak memory.
+    Memory is traced separately because tracemalloc slows the code down.
+    Args:
+        func (callable): Function without arguments.
+    Returns:
+        tuple: (result, seconds, peak_bytes)
+    """
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    """
+    Runs both extractors on every fixture size and prints a comparison table.
+    """
+    print(f"{'Links':>8} | {'Size':>9} | {'Parser':<8} | {'Time (ms)':>10} | {'Peak (KB)':>10} | Paths")
+    print("-" * 70)
+    for links in SIZES:
+        data = build_fixture(links)
+        soup_paths, soup_time, soup_peak = measure(
+            lambda: extract_child_paths(data.decode("utf-8"), URL))
+        stream_paths, stream_time, stream_peak = measure(
+            lambda: stream_child_paths(chunked(data), URL))
+        if soup_paths != stream_paths:
+            raise SystemExit(f"Different results with {links} links")
+
+        size = f"{len(data) // 1024} KB"
+        print(f"{links:>8} | {size:>9} | {'soup':<8} | {soup_time * 1000:>10.1f} | "
+              f"{soup_peak // 1024:>10} | {len(soup_paths)}")
+        print(f"{links:>8} | {size:>9} | {'stream':<8} | {stream_time * 1000:>10.1f} | "
+              f"{stream_peak // 1024:>10} | {len(stream_paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark of the child rows of a domain in the Treeview.
+Compares the previous strategy (scan the children to find a row, re-sort and
+move every child on insert) with DomainMonitor.set_child, which uses a
+(domain, path) index and inserts new rows at their sorted position.
+
+Needs a display, since it creates a real (hidden) Tk window; on a server,
+run it under Xvfb. The legacy insert cycle is quadratic and can take a
+minute. Run from the project root:
+    python -m benchmarks.bench_tree_updates
+    xvfb-run python -m benchmarks.bench_tree_updates
+"""
+import random
+import time
+import tkinter as tk
+from tkinter import ttk
+from DomainMonitor import DomainMonitor
+
+URL = "https://example.com"
+LINKS = 2000
+VALUES = ("Ok", "2025-01-01 00:00:00", "120 ms")
+
+
+def legacy_set_child(tree, parent_id, path, values, color):
+    """
+    The child update used before the index: O(n) Tk calls to find a row and
+    O(n log n) calls plus n moves on every insert.
+    """
+    for item in tree.get_children(parent_id):
+        if tree.item(item, "text") == path:
+            tree.item(item, values=values, tags=(color,))
+            return
+
+    tree.insert(parent_id, tk.END, text=path, values=values, tags=(color,))
+    children = list(tree.get_children(parent_id))
+    sorted_children = sorted(children, key=lambda c: tree.item(c, "text"))
+    for idx, child in enumerate(sorted_children):
+        tree.move(child, parent_id, idx)
+
+
+def indexed_monitor(tree, parent_id):
+    """
+    Builds a DomainMonitor with only the Treeview state used by set_child.
+    """
+    monitor = DomainMonitor.__new__(DomainMonitor)
+    monitor.tree = tree
+    monitor.tree_items = {URL: parent_id}
+    monitor.child_items = {}
+    monitor.child_paths = {}
+    monitor.item_keys = {}
+    return monitor
+
+
+def run_cycles(update, paths):
+    """
+    Runs a first cycle (every row inserted) and a second one (every row updated).
+    Args:
+        update (callable): Function receiving (path, values, color).
+        paths (list): Paths of the child pages, in discovery order.
+    Returns:
+        tuple: Seconds of the first and second cycles.
+    """
+    start = time.perf_counter()
+    for path in paths:
+        update(path, VALUES, "green")
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in paths:
+        update(path, VALUES, "red")
+    second = time.perf_counter() - start
+    return first, second
+
+
+def main():
+    """
+    Runs both strategies on a site with LINKS child pages and prints the cost per cycle.
+    """
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"No display ({e}); run it under xvfb-run")
+    root.withdraw()
+    tree = ttk.Treeview(root, columns=("estado", "fecha", "tiempo"))
+
+    paths = [f"/section-{i % 40}/page-{i}" for i in range(LINKS)]
+    random.Random(1).shuffle(paths)
+
+    parent_id = tree.insert("", tk.END, text=URL)
+    legacy = run_cycles(
+        lambda path, values, color: legacy_set_child(tree, parent_id, path, values, color),
+        paths)
+    legacy_order = [tree.item(c, "text") for c in tree.get_children(parent_id)]
+
+    parent_id = tree.insert("", tk.END, text=URL)
+    monitor = indexed_monitor(tree, parent_id)
+    indexed = run_cycles(
+        lambda path, values, color: monitor.set_child(URL, path, values, color),
+        paths)
+    indexed_order = [tree.item(c, "text") for c in tree.get_children(parent_id)]
+    root.destroy()
+
+    if legacy_order != indexed_order:
+        raise SystemExit("The rows are not in the same order")
+
+    print(f"{LINKS} child pages")
+    print(f"{'Strategy':<10} | {'Insert cycle (ms)':>18} | {'Update cycle (ms)':>18}")
+    print("-" * 52)
+    print(f"{'legacy':<10} | {legacy[0] * 1000:>18.1f} | {legacy[1] * 1000:>18.1f}")
+    print(f"{'indexed':<10} | {indexed[0] * 1000:>18.1f} | {indexed[1] * 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
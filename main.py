@@ -1,5 +1,4 @@
 import multiprocessing
-import threading
 import tkinter as tk
 from About import AboutWindow
 from ConfigWindow import ConfigWindow
@@ -40,6 +39,7 @@ class App:
         This method is called when the user selects "Quit" from the tray icon menu.
         """
         self.tray.stop_tray_icon()
+        self.domain_monitor.close()
         self.root.destroy()
 
     def reload_monitor(self):
@@ -47,8 +47,8 @@ class App:
         Reloads the domain monitor when the user clicks the refresh button.
         This method is called when the user clicks the refresh button in the main window.
         """
-        threading.Thread(target=self.domain_monitor.reload,
-                         daemon=True).start()
+        # reload() only schedules work with after(), so it must run on the Tk thread.
+        self.domain_monitor.reload()
 
     def open_config(self):
         """
@@ -69,7 +69,8 @@ class App:
         Opens the error log window when the user clicks the error log button.
         This method is called when the user clicks the error log button in the main window.
         """
-        ErrorLogWindow(self.root)
+        ErrorLogWindow(self.root, self.domain_monitor.store,
+                       list(self.domain_monitor.tree_items))
 
     def hide_window(self):
         """
@@ -137,7 +138,7 @@ class App:
         UpdateChecker(__version__)
 
 
-if __name__ == "__main__":
+def run():
     """
     Main function to run the application.
     This function creates the main Tkinter window and starts the application.
@@ -148,3 +149,7 @@ if __name__ == "__main__":
     root.iconbitmap(IconManager.resource_path("favicon.ico"))
     app = App(root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,141 @@
+"""
+Command line entry point of the monitor.
+Without arguments it opens the desktop application. With --headless it runs
+the MonitorEngine without Tk, writing to the error log and the result store and
+printing a summary every few seconds, which suits servers and systemd:
+    python -m monitor --headless --config config.json
+To spread the checks over several hosts, one coordinator owns config.json and
+any number of workers check the domains it hands out:
+    python -m monitor --coordinator 127.0.0.1:8750 --config config.json
+    python -m monitor --worker http://127.0.0.1:8750
+A coordinator reachable from other hosts requires a cluster_token.
+"""
+import argparse
+import signal
+import sys
+import threading
+from ErrorWriter import ERROR_LOG
+from MonitorEngine import MonitorEngine
+from Probe import now
+from Settings import SETTINGS_FILE, Settings
+
+# Failing URLs listed in each summary; the rest are only counted.
+MAX_FAILING_SHOWN = 20
+
+
+def print_summary(engine):
+    """
+    Prints the state of the monitored URLs.
+    Args:
+        engine (MonitorEngine): The running engine.
+    """
+    summary = engine.summary()
+    failing = summary["failing"]
+    stats = engine.stats()
+    scheduler = stats["scheduler"] or {}
+    print(f"[{now()}] {summary['urls']} URLs | {summary['ok']} OK | "
+          f"{len(failing)} con error | {summary['checks']} revisiones | "
+          f"cola {scheduler.get('queue_depth', 0)} | "
+          f"retraso medio {scheduler.get('lag_mean', 0)} s", flush=True)
+    for url in failing[:MAX_FAILING_SHOWN]:
+        print(f"    ✗ {url}", flush=True)
+    if len(failing) > MAX_FAILING_SHOWN:
+        print(f"    ... y {len(failing) - MAX_FAILING_SHOWN} más", flush=True)
+    cluster = stats.get("cluster")
+    if cluster:
+        # A worker failing much more than the others points to its host, not the sites.
+        for name, worker in sorted(cluster["workers"].items()):
+            print(f"    worker {name}: {worker['domains']} dominios | "
+                  f"{worker['records']} revisiones | "
+                  f"{worker['failure_ratio'] * 100:.1f}% con error", flush=True)
+        if cluster["unowned"]:
+            print(f"    {cluster['unowned']} grupos de dominios sin worker", flush=True)
+
+
+def run_headless(args):
+    """
+    Runs the engine until SIGINT or SIGTERM, then flushes the log and the store.
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    settings = Settings(args.settings)
+    if args.coordinator:
+        settings.values["coordinator"] = args.coordinator
+    engine = MonitorEngine(args.config, args.errors, settings)
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    if settings.get("coordinator"):
+        print(f"[{now()}] Coordinando {len(engine.domains)} dominios "
+              f"en {settings.get('coordinator')}", flush=True)
+    else:
+        print(f"[{now()}] Monitorizando {len(engine.domains)} dominios "
+              f"(motor {engine.settings.get('engine')})", flush=True)
+    try:
+        engine.start()
+    except ValueError as e:
+        print(f"Error: {e}")
+        engine.close()
+        sys.exit(1)
+    try:
+        while not stop_event.wait(args.summary_interval):
+            print_summary(engine)
+    finally:
+        engine.close()
+        print_summary(engine)
+
+
+def run_worker(args):
+    """
+    Checks the domains handed out by a coordinator until SIGINT or SIGTERM.
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+    """
+    # Imported here: only a worker needs it.
+    from RemoteWorker import RemoteWorker
+    worker = RemoteWorker(args.worker, Settings(args.settings), args.name)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop())
+    print(f"[{now()}] Worker {worker.name} conectando con {args.worker}", flush=True)
+    worker.run()
+
+
+def main(argv=None):
+    """
+    Parses the command line and starts the selected mode.
+    Args:
+        argv (list): Arguments; sys.argv[1:] when omitted.
+    """
+    parser = argparse.ArgumentParser(
+        prog="monitor", description="US - Monitor de Sitios")
+    parser.add_argument("--headless", action="store_true",
+                        help="ejecuta el monitor sin interfaz gráfica")
+    parser.add_argument("--config", default="config.json",
+                        help="archivo de dominios (modo sin interfaz)")
+    parser.add_argument("--settings", default=SETTINGS_FILE,
+                        help="archivo de configuración avanzada (modo sin interfaz)")
+    parser.add_argument("--errors", default=ERROR_LOG,
+                        help="registro de errores (modo sin interfaz)")
+    parser.add_argument("--summary-interval", type=int, default=60,
+                        help="segundos entre resúmenes (modo sin interfaz)")
+    parser.add_argument("--coordinator", metavar="HOST:PUERTO",
+                        help="reparte los dominios entre workers, escuchando en esta dirección")
+    parser.add_argument("--worker", metavar="URL",
+                        help="revisa los dominios que asigna el coordinador en esta URL")
+    parser.add_argument("--name",
+                        help="nombre del worker (por defecto, host y número de proceso)")
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args)
+    elif args.headless or args.coordinator:
+        run_headless(args)
+    else:
+        # Tk is only imported by the desktop viewer.
+        import main as app
+        app.run()
+
+
+if __name__ == "__main__":
+    main()
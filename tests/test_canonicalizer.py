@@ -0,0 +1,86 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LinkParser
+from UrlCanonicalizer import UrlCanonicalizer
+
+SITE = "https://example.com"
+
+
+class CanonicalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.canonicalizer = UrlCanonicalizer(query_allowlist=("page", "p", "id"))
+
+    def path(self, href):
+        return self.canonicalizer.child_path(href, SITE)
+
+    def test_trailing_slash(self):
+        self.assertEqual(self.path("/about/"), "/about")
+        self.assertEqual(self.path("/about"), "/about")
+
+    def test_trailing_slash_kept(self):
+        canonicalizer = UrlCanonicalizer(trailing_slash="keep")
+        self.assertEqual(canonicalizer.child_path("/about/", SITE), "/about/")
+
+    def test_default_port(self):
+        self.assertEqual(self.canonicalizer.canonical("HTTPS://Example.com:443/a"),
+                         ("https", "example.com", None, "/a"))
+        self.assertEqual(self.path("https://example.com:443/a"), "/a")
+        self.assertIsNone(self.path("https://example.com:8443/a"))
+
+    def test_fragment(self):
+        self.assertEqual(self.path("/a#section"), "/a")
+        self.assertIsNone(self.path("#top"))
+
+    def test_tracking_params_dropped(self):
+        self.assertEqual(self.path("/a?utm_source=news&utm_medium=mail&fbclid=x"), "/a")
+
+    def test_pagination_kept(self):
+        self.assertEqual(self.path("/list?page=2"), "/list?page=2")
+        self.assertEqual(self.path("/list?utm_source=x&page=2"), "/list?page=2")
+        self.assertNotEqual(self.path("/list?page=2"), self.path("/list?page=3"))
+
+    def test_query_sorted(self):
+        self.assertEqual(self.path("/a?p=1&id=7"), self.path("/a?id=7&p=1"))
+
+    def test_dot_segments_and_escapes(self):
+        self.assertEqual(self.path("/a/./b/../c"), "/a/c")
+        self.assertEqual(self.path("/%7euser"), "/~user")
+
+    def test_same_site(self):
+        self.assertEqual(self.path("https://www.example.com/a"), "/a")
+        self.assertIsNone(self.path("https://other.com/a"))
+        self.assertIsNone(self.path("mailto:info@example.com"))
+        self.assertIsNone(self.path("/"))
+
+
+class CounterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.canonicalizer = UrlCanonicalizer(query_allowlist=("page",))
+        patcher = mock.patch.object(LinkParser, "canonicalizer", self.canonicalizer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_variants_counted_once(self):
+        hrefs = ["/a", "/a/", "/a#x", "/a?utm_source=y", "/a", "/b?page=2", "/b?page=2",
+                 "https://other.com/a"]
+        self.assertEqual(LinkParser.filter_hrefs(hrefs, SITE), ["/a", "/b?page=2"])
+        # Repeating the exact same href saves nothing; each variant saves a probe.
+        self.assertEqual(self.canonicalizer.snapshot(),
+                         {"links": 7, "unique": 2, "redundant": 3})
+
+    def test_counters_add_up(self):
+        LinkParser.filter_hrefs(["/a", "/a/"], SITE)
+        LinkParser.filter_hrefs(["/c", "/d"], SITE)
+        self.assertEqual(self.canonicalizer.snapshot(),
+                         {"links": 4, "unique": 3, "redundant": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
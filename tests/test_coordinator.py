@@ -0,0 +1,145 @@
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Coordinator import Coordinator, is_loopback
+from ShardPool import partition
+
+
+def domains(*hosts):
+    """
+    Returns config.json entries for a list of hosts.
+    """
+    return [{"dominio": f"https://{host}", "tiempo": 60} for host in hosts]
+
+
+class FakeEngine:
+    """
+    The only part of a MonitorEngine the assignment needs.
+    """
+
+    def __init__(self, entries):
+        self.domains = entries
+
+
+class PartitionTest(unittest.TestCase):
+
+    def test_sites_stay_together(self):
+        shards = partition(domains("a.com", "www.a.com", "b.com", "c.com"), 3)
+        urls = [sorted(entry["dominio"] for entry in shard) for shard in shards]
+        self.assertIn(["https://a.com", "https://www.a.com"], urls)
+
+    def test_balanced(self):
+        shards = partition(domains(*(f"site{i}.com" for i in range(10))), 3)
+        self.assertEqual(sorted(len(shard) for shard in shards), [3, 3, 4])
+        self.assertEqual(sum(len(shard) for shard in shards), 10)
+
+    def test_empty_shards_left_out(self):
+        self.assertEqual(len(partition(domains("a.com", "b.com"), 8)), 2)
+        self.assertEqual(partition([], 4), [])
+
+
+class RebalanceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = 1000.0
+        for patcher in (mock.patch("Coordinator.time.monotonic", lambda: self.clock),
+                        mock.patch("sys.stdout", new_callable=io.StringIO)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        entries = domains(*(f"site{i}.com" for i in range(12)))
+        self.coordinator = Coordinator(FakeEngine(entries), "127.0.0.1:0", shards=6,
+                                       worker_timeout=15)
+
+    def sync(self, name, leaving=False):
+        worker = self.coordinator.workers.get(name)
+        return self.coordinator.sync(
+            name, worker["version"] if worker else None, [], None, leaving)
+
+    def loads(self):
+        shards = self.coordinator.shards
+        return {name: sum(len(shards[index]) for index in worker["shards"])
+                for name, worker in self.coordinator.workers.items()}
+
+    def assert_every_shard_owned_once(self):
+        owned = [index for worker in self.coordinator.workers.values()
+                 for index in worker["shards"]]
+        self.assertEqual(sorted(owned), list(range(len(self.coordinator.shards))))
+
+    def test_first_worker_gets_everything(self):
+        reply = self.sync("a")
+        self.assertEqual(len(reply["domains"]), 12)
+        self.assert_every_shard_owned_once()
+
+    def test_join_takes_from_the_busiest(self):
+        self.sync("a")
+        version = self.coordinator.workers["a"]["version"]
+        reply = self.sync("b")
+        self.assertEqual(self.loads(), {"a": 6, "b": 6})
+        self.assertEqual(len(reply["domains"]), 6)
+        self.assertNotEqual(self.coordinator.workers["a"]["version"], version)
+        self.assert_every_shard_owned_once()
+
+    def test_unchanged_assignment_keeps_its_version(self):
+        self.sync("a")
+        self.sync("b")
+        version = self.coordinator.workers["a"]["version"]
+        reply = self.sync("a")
+        self.assertIsNone(reply["domains"])
+        self.assertEqual(self.coordinator.workers["a"]["version"], version)
+
+    def test_balanced_across_three(self):
+        for name in ("a", "b", "c"):
+            self.sync(name)
+        self.assertEqual(sorted(self.loads().values()), [4, 4, 4])
+        self.assert_every_shard_owned_once()
+
+    def test_timeout_reassigns(self):
+        self.sync("a")
+        self.sync("b")
+        self.clock += 10
+        self.sync("a")
+        self.clock += 10
+        reply = self.sync("a")
+        self.assertNotIn("b", self.coordinator.workers)
+        self.assertEqual(len(reply["domains"]), 12)
+        self.assertEqual(self.coordinator.reassigned, 3)
+        self.assert_every_shard_owned_once()
+
+    def test_leave_reassigns_at_once(self):
+        self.sync("a")
+        self.sync("b")
+        reply = self.sync("b", leaving=True)
+        self.assertIsNone(reply["version"])
+        self.assertNotIn("b", self.coordinator.workers)
+        self.assertEqual(self.loads(), {"a": 12})
+        self.assert_every_shard_owned_once()
+
+    def test_last_worker_leaving(self):
+        self.sync("a")
+        self.sync("a", leaving=True)
+        self.assertEqual(self.coordinator.workers, {})
+        self.assertEqual(self.coordinator.snapshot()["unowned"], 6)
+
+
+class LoopbackTest(unittest.TestCase):
+
+    def test_addresses(self):
+        for host in ("127.0.0.1", "::1", "localhost"):
+            self.assertTrue(is_loopback(host), host)
+        for host in ("", "0.0.0.0", "10.0.0.1", "monitor.example"):
+            self.assertFalse(is_loopback(host), host)
+
+    def test_refuses_public_address_without_token(self):
+        coordinator = Coordinator(FakeEngine([]), "0.0.0.0:0")
+        with self.assertRaises(ValueError):
+            coordinator.start()
+        self.assertIsNone(coordinator.server)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DnsCache import DnsCache
+
+ADDRESS = [(socket.AF_INET, "192.0.2.1")]
+OTHER = [(socket.AF_INET, "192.0.2.2")]
+
+
+class FakeClock:
+    """
+    A monotonic clock moved by hand.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResolver:
+    """
+    Resolver returning the addresses it is given, or failing, and counting its calls.
+    """
+
+    def __init__(self, addresses=ADDRESS):
+        self.addresses = addresses
+        self.calls = 0
+
+    def __call__(self, host):
+        self.calls += 1
+        if self.addresses is None:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return list(self.addresses)
+
+
+def wait_refreshed(cache):
+    """
+    Waits for the background refreshes of a cache to finish.
+    """
+    deadline = time.monotonic() + 5
+    while cache.refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class DnsCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.resolver = FakeResolver()
+
+    def cache(self, pin=False):
+        return DnsCache(ttl=300, negative_ttl=30, pin=pin, resolver=self.resolver, clock=self.clock)
+
+    def test_cached_until_ttl(self):
+        cache = self.cache()
+        self.assertEqual(cache.resolve("Example.com"), ADDRESS)
+        self.clock.now += 299
+        self.assertEqual(cache.resolve("example.com"), ADDRESS)
+        self.assertEqual(cache.cached("example.com"), ADDRESS)
+        self.assertEqual(self.resolver.calls, 1)
+        self.clock.now += 1
+        self.assertIsNone(cache.cached("example.com"))
+        self.resolver.addresses = OTHER
+        self.assertEqual(cache.resolve("example.com"), OTHER)
+        self.assertEqual(self.resolver.calls, 2)
+        snapshot = cache.snapshot()
+        self.assertEqual((snapshot["hits"], snapshot["misses"]), (2, 2))
+
+    def test_ip_literal(self):
+        cache = self.cache()
+        self.assertEqual(cache.resolve("192.0.2.7"), [(socket.AF_INET, "192.0.2.7")])
+        self.assertEqual(cache.cached("[::1]"), [(socket.AF_INET6, "::1")])
+        self.assertEqual(self.resolver.calls, 0)
+
+    def test_negative_caching(self):
+        self.resolver.addresses = None
+        cache = self.cache()
+        with self.assertRaises(socket.gaierror):
+            cache.resolve("missing.example")
+        self.clock.now += 29
+        with self.assertRaises(socket.gaierror):
+            cache.resolve("missing.example")
+        self.assertIsNone(cache.cached("missing.example"))
+        self.assertEqual(self.resolver.calls, 1)
+        self.assertEqual(cache.snapshot()["negative_hits"], 1)
+        self.clock.now += 1
+        self.resolver.addresses = ADDRESS
+        self.assertEqual(cache.resolve("missing.example"), ADDRESS)
+        self.assertEqual(self.resolver.calls, 2)
+
+    def test_pin_serves_stale_and_refreshes(self):
+        cache = self.cache(pin=True)
+        cache.resolve("example.com")
+        self.clock.now += 301
+        self.resolver.addresses = OTHER
+        # The expired addresses are served at once, while a refresh runs.
+        self.assertEqual(cache.resolve("example.com"), ADDRESS)
+        wait_refreshed(cache)
+        self.assertEqual(self.resolver.calls, 2)
+        self.assertEqual(cache.resolve("example.com"), OTHER)
+        self.assertEqual(cache.snapshot()["stale_hits"], 1)
+
+    def test_pin_keeps_addresses_when_refresh_fails(self):
+        cache = self.cache(pin=True)
+        cache.resolve("example.com")
+        self.clock.now += 301
+        self.resolver.addresses = None
+        self.assertEqual(cache.resolve("example.com"), ADDRESS)
+        wait_refreshed(cache)
+        self.assertEqual(cache.snapshot()["refresh_failures"], 1)
+        # The pinned addresses are retried only after negative_ttl.
+        self.clock.now += 29
+        self.assertEqual(cache.resolve("example.com"), ADDRESS)
+        self.assertEqual(self.resolver.calls, 2)
+
+    def test_without_pin_expired_entry_resolves(self):
+        cache = self.cache()
+        cache.resolve("example.com")
+        self.clock.now += 301
+        self.resolver.addresses = None
+        with self.assertRaises(socket.gaierror):
+            cache.resolve("example.com")
+
+    def test_concurrent_lookups_coalesced(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow_resolver(host):
+            started.set()
+            release.wait(5)
+            return self.resolver(host)
+
+        cache = DnsCache(resolver=slow_resolver, clock=self.clock)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.resolve("example.com")))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, [ADDRESS] * 5)
+        self.assertEqual(self.resolver.calls, 1)
+        self.assertEqual(cache.snapshot()["misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
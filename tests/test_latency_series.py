@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LatencySeries import BIN_RATIO, LatencySeries, latency_bin, percentile
+
+NOW = 1700000040
+URL = "https://example.com"
+
+
+class LatencySeriesTest(unittest.TestCase):
+
+    def series(self, samples=128):
+        return LatencySeries(samples, clock=lambda: NOW)
+
+    def test_percentiles(self):
+        series = self.series()
+        for ms in range(1, 101):
+            series.record(URL, ms, 200, ts=NOW)
+        stats = series.stats(URL, 300)
+        self.assertEqual(stats["checks"], 100)
+        self.assertEqual((stats["p50"], stats["p95"], stats["p99"]), (50, 95, 99))
+
+    def test_percentile_nearest_rank(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+
+    def test_availability(self):
+        series = self.series()
+        for status in (200, 301, 200, 500, None):
+            series.record(URL, 100 if status else None, status, ts=NOW)
+        stats = series.stats(URL, 300)
+        self.assertEqual(stats["checks"], 5)
+        self.assertEqual(stats["availability"], 60.0)
+        # Failed requests have no latency and stay out of the percentiles.
+        self.assertEqual(stats["p99"], 100)
+
+    def test_ring_wraparound(self):
+        series = self.series(samples=4)
+        for i in range(10):
+            series.record(URL, 10 * (i + 1), 200, ts=NOW - 9 + i)
+        slot = series.slots[URL]
+        samples, covered = series.raw_samples(slot, NOW - 100)
+        self.assertEqual([ms for _, ms, _ in samples], [100, 90, 80, 70])
+        self.assertFalse(covered)
+        # Samples inside the window: exact percentiles from the ring.
+        self.assertEqual(series.stats(URL, 2)["p50"], 90)
+        # The ring no longer reaches back: the hour histogram is used instead.
+        stats = series.stats(URL, 3600)
+        self.assertEqual(stats["checks"], 10)
+        self.assertEqual(stats["p99"], int(BIN_RATIO ** (latency_bin(100) + 1)))
+        self.assertGreaterEqual(stats["p99"], 100)
+
+    def test_window(self):
+        series = self.series()
+        series.record(URL, 100, 200, ts=NOW - 7200)
+        self.assertIsNone(series.stats(URL, 3600))
+        self.assertEqual(series.stats(URL, 86400)["checks"], 1)
+        self.assertIsNone(series.stats("https://other.com", 3600))
+
+    def test_discard_reuses_slot(self):
+        series = self.series()
+        series.record(URL + "/old", 500, 500, ts=NOW)
+        series.record(URL, 100, 200, ts=NOW)
+        size = series.memory()
+        series.discard([URL + "/old"])
+        self.assertIsNone(series.stats(URL + "/old", 300))
+        series.record(URL + "/new", 20, 200, ts=NOW)
+        self.assertEqual(series.memory(), size)
+        stats = series.stats(URL + "/new", 300)
+        self.assertEqual((stats["checks"], stats["availability"], stats["p50"]), (1, 100.0, 20))
+        self.assertEqual(series.stats(URL, 300)["p50"], 100)
+
+    def test_retain(self):
+        series = self.series()
+        for url in ("https://a.com", "https://a.com/x", "https://a.com/x/y",
+                    "https://ab.com/x", "https://b.com"):
+            series.record(url, 10, 200, ts=NOW)
+        series.retain(["https://a.com/"])
+        self.assertEqual(sorted(series.slots),
+                         ["https://a.com", "https://a.com/x", "https://a.com/x/y"])
+        self.assertEqual(len(series.free), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ProbeCache import ProbeCache, probe_key
+
+
+class FakeClock:
+    """
+    A monotonic clock moved by hand.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Counter:
+    """
+    A probe returning its call number.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+class ProbeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ProbeCache(ttl=10, clock=self.clock)
+        self.probe = Counter()
+
+    def test_reused_by_other_domain_with_probe_time(self):
+        before = time.time()
+        result, ts = self.cache.probe("key", self.probe, "https://a.com")
+        self.assertEqual((result, ts), (1, None))
+        result, ts = self.cache.probe("key", self.probe, "https://b.com")
+        self.assertEqual(result, 1)
+        self.assertGreaterEqual(ts, before)
+        self.assertLessEqual(ts, time.time())
+        self.assertEqual(self.probe.calls, 1)
+        self.assertEqual(self.cache.snapshot()["hits"], 1)
+
+    def test_same_domain_probes_again(self):
+        self.cache.probe("key", self.probe, "https://a.com")
+        self.assertEqual(self.cache.probe("key", self.probe, "https://a.com"), (2, None))
+        self.assertEqual(self.probe.calls, 2)
+        self.assertEqual(self.cache.snapshot()["hits"], 0)
+
+    def test_ttl(self):
+        self.cache.probe("key", self.probe, "https://a.com")
+        self.clock.now += 9
+        self.assertEqual(self.cache.probe("key", self.probe, "https://b.com")[0], 1)
+        self.clock.now += 1
+        self.assertEqual(self.cache.probe("key", self.probe, "https://b.com"), (2, None))
+
+    def test_errors_cached(self):
+        def failing():
+            self.probe()
+            raise ValueError("timeout")
+
+        with self.assertRaises(ValueError):
+            self.cache.probe("key", failing, "https://a.com")
+        with self.assertRaises(ValueError):
+            self.cache.probe("key", failing, "https://b.com")
+        self.assertEqual(self.probe.calls, 1)
+
+    def test_unsent_probe_not_cached(self):
+        self.assertEqual(self.cache.probe("key", lambda: None, "https://a.com"), (None, None))
+        self.assertEqual(self.cache.probe("key", self.probe, "https://b.com"), (1, None))
+
+    def test_concurrent_probes_coalesced(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return self.probe()
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(
+            self.cache.probe("key", slow, "https://a.com")))
+        first.start()
+        started.wait(5)
+        others = [threading.Thread(target=lambda i=i: results.append(
+            self.cache.probe("key", slow, f"https://site{i}.com"))) for i in range(4)]
+        for thread in others:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in [first] + others:
+            thread.join(5)
+        self.assertEqual([result for result, _ in results], [1] * 5)
+        self.assertEqual(self.probe.calls, 1)
+        snapshot = self.cache.snapshot()
+        self.assertEqual((snapshot["probes"], snapshot["coalesced"]), (1, 4))
+        self.assertEqual(snapshot["dedupe_ratio"], 0.8)
+
+    def test_async_coalesced(self):
+        async def slow():
+            await asyncio.sleep(0.05)
+            return self.probe()
+
+        async def run():
+            return await asyncio.gather(
+                self.cache.probe_async("key", slow, "https://a.com"),
+                self.cache.probe_async("key", slow, "https://b.com"),
+                self.cache.probe_async("key", slow, "https://c.com"))
+
+        results = asyncio.run(run())
+        self.assertEqual([result for result, _ in results], [1, 1, 1])
+        self.assertIsNone(results[0][1])
+        self.assertIsNotNone(results[1][1])
+        self.assertEqual(self.probe.calls, 1)
+        self.assertEqual(self.cache.snapshot()["coalesced"], 2)
+
+    def test_async_same_domain_probes_again(self):
+        async def probe():
+            return self.probe()
+
+        async def run():
+            await self.cache.probe_async("key", probe, "https://a.com")
+            return await self.cache.probe_async("key", probe, "https://a.com")
+
+        self.assertEqual(asyncio.run(run()), (2, None))
+
+    def test_key_canonical(self):
+        self.assertEqual(probe_key("https://Example.com:443/a/"), probe_key("https://example.com/a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
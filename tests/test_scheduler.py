@@ -0,0 +1,163 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Scheduler import AdaptiveInterval, Scheduler, adaptive_defaults
+
+
+class FakeClock:
+    """
+    A monotonic clock moved by hand.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain(scheduler):
+    """
+    Returns the domains due now, in the order they are dispatched.
+    """
+    keys = []
+    while True:
+        key, wait = scheduler.next_job()
+        if key is None:
+            return keys
+        keys.append(key)
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_heap_order(self):
+        scheduler = Scheduler(jitter=0, stagger=0, clock=self.clock)
+        for key in ("a", "b", "c"):
+            scheduler.add(key, 60)
+        # Entries due at the same time keep the order they were added in.
+        self.assertEqual(drain(scheduler), ["a", "b", "c"])
+        scheduler.done("a", 30)
+        scheduler.done("b", 10)
+        scheduler.done("c", 20)
+        key, wait = scheduler.next_job()
+        self.assertIsNone(key)
+        self.assertEqual(wait, 10)
+        self.clock.now += 30
+        self.assertEqual(drain(scheduler), ["b", "c", "a"])
+
+    def test_not_due(self):
+        scheduler = Scheduler(jitter=0, stagger=0, clock=self.clock)
+        self.assertEqual(scheduler.next_job(), (None, 1.0))
+        scheduler.add("a", 60)
+        drain(scheduler)
+        scheduler.done("a")
+        self.assertEqual(scheduler.next_job(), (None, 60))
+        self.assertEqual(scheduler.snapshot()["scheduled"], 1)
+
+    def test_stagger_spreads_over_interval(self):
+        scheduler = Scheduler(jitter=0, clock=self.clock)
+        for i in range(200):
+            scheduler.add(f"https://site{i}.com", 60)
+        offsets = [due - self.clock.now for due, _, _ in scheduler.heap]
+        self.assertTrue(all(0 <= offset <= 60 for offset in offsets))
+        # Every tenth of the interval gets some of the first runs.
+        self.assertEqual({int(offset // 6) for offset in offsets if offset < 60}, set(range(10)))
+
+    def test_stagger_window(self):
+        scheduler = Scheduler(jitter=0, stagger=5, clock=self.clock)
+        for i in range(50):
+            scheduler.add(f"https://site{i}.com", 60)
+        offsets = [due - self.clock.now for due, _, _ in scheduler.heap]
+        self.assertTrue(all(0 <= offset <= 5 for offset in offsets))
+        self.assertGreater(max(offsets) - min(offsets), 2.5)
+
+    def test_stagger_stable(self):
+        first = Scheduler(clock=self.clock)
+        second = Scheduler(clock=self.clock)
+        first.add("https://a.com", 300)
+        second.add("https://a.com", 300)
+        self.assertEqual(first.heap[0][0], second.heap[0][0])
+
+    def test_jitter(self):
+        random.seed(1)
+        scheduler = Scheduler(jitter=0.1, stagger=0, clock=self.clock)
+        for i in range(100):
+            scheduler.add(f"https://site{i}.com", 100)
+        drain(scheduler)
+        for i in range(100):
+            scheduler.done(f"https://site{i}.com")
+        dues = [due - self.clock.now for due, _, _ in scheduler.heap]
+        self.assertTrue(all(90 <= due <= 110 for due in dues))
+        self.assertLess(min(dues), 95)
+        self.assertGreater(max(dues), 105)
+
+    def test_rate_limit(self):
+        scheduler = Scheduler(jitter=0, stagger=0, max_per_second=2, clock=self.clock)
+        for i in range(10):
+            scheduler.add(f"https://site{i}.com", 60)
+        self.assertEqual(len(drain(scheduler)), 2)
+        key, wait = scheduler.next_job()
+        self.assertIsNone(key)
+        self.assertAlmostEqual(wait, 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(len(drain(scheduler)), 1)
+        # Tokens do not pile up beyond one second of checks.
+        self.clock.now += 60
+        self.assertEqual(len(drain(scheduler)), 2)
+        self.assertEqual(scheduler.snapshot()["queue_depth"], 5)
+
+    def test_lag(self):
+        scheduler = Scheduler(jitter=0, stagger=0, clock=self.clock)
+        scheduler.add("a", 60)
+        self.clock.now += 3
+        drain(scheduler)
+        snapshot = scheduler.snapshot()
+        self.assertEqual(snapshot["dispatched"], 1)
+        self.assertEqual(snapshot["lag_max"], 3)
+
+
+class AdaptiveIntervalTest(unittest.TestCase):
+
+    def test_grows_while_healthy(self):
+        interval = AdaptiveInterval(60, 200, 12)
+        self.assertEqual([interval.next(True) for _ in range(5)], [90, 135, 200, 200, 200])
+
+    def test_failure_rechecked_then_confirmed(self):
+        interval = AdaptiveInterval(60, 240, 12)
+        interval.next(True)
+        self.assertEqual(interval.next(False), 12)
+        # A confirmed failure goes back to the base interval, not the retry one.
+        self.assertEqual(interval.next(False), 60)
+        self.assertEqual(interval.next(False), 60)
+
+    def test_recovery(self):
+        interval = AdaptiveInterval(60, 240, 12)
+        interval.next(False)
+        self.assertEqual(interval.next(True), 60)
+        self.assertEqual(interval.next(True), 90)
+
+    def test_limits(self):
+        interval = AdaptiveInterval(60, 30, 120)
+        self.assertEqual(interval.max_interval, 60)
+        self.assertEqual(interval.retry_interval, 60)
+        self.assertEqual(AdaptiveInterval(60, 240, 0).retry_interval, 1)
+
+    def test_defaults(self):
+        self.assertEqual(adaptive_defaults(300), (1200, 60))
+        self.assertEqual(adaptive_defaults(3600), (14400, 60))
+        self.assertEqual(adaptive_defaults(60), (240, 12))
+        self.assertEqual(adaptive_defaults(30), (120, 10))
+        # Short intervals never get a retry interval longer than themselves.
+        self.assertEqual(adaptive_defaults(5), (20, 5))
+        self.assertEqual(adaptive_defaults(0), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,8 @@
 import os
-import requests
 import sys
 import tkinter as tk
 import webbrowser
+from HttpPool import session_pool
 from tkinter import messagebox
 
 
@@ -25,7 +25,7 @@ class UpdateChecker:
         try:
             version_url = "https://monitor.urasweb.com/version.json"
 
-            response = requests.get(version_url, timeout=5)
+            response = session_pool.get(version_url, timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 latest = data.get("latest_version", "")